@@ -0,0 +1,390 @@
+import argparse
+import importlib.util
+import sys
+from pathlib import Path
+
+from ._harness import compare_results, format_table, save_results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for catching performance regressions before deploy."
+    )
+    subparsers = parser.add_subparsers(
+        title="subcommands", dest="command", required=True
+    )
+
+    parsers = subparsers.add_parser(
+        "parsers", help="Benchmark CHUNITHM-NET HTML parsers over the test fixtures"
+    )
+    parsers.add_argument(
+        "--backend",
+        action="append",
+        choices=["bs4", "lxml"],
+        help="Parser backend to benchmark. Can be repeated. Defaults to all installed backends.",
+    )
+    parsers.add_argument(
+        "--scale",
+        type=int,
+        default=100,
+        help="Also benchmark synthetic pages with this many times the records of the fixtures.",
+    )
+
+    render = subparsers.add_parser(
+        "render",
+        help="Benchmark rendering the c>generate image with and without cached "
+        "assets, and encoding it in different formats",
+    )
+    render.add_argument(
+        "--font-dir",
+        type=Path,
+        help="Directory containing the fonts used for rendering. Defaults to ./fonts.",
+    )
+
+    search = subparsers.add_parser(
+        "search",
+        help="Benchmark fuzzy song search, linear scan against the search index",
+    )
+    search.add_argument(
+        "--songs",
+        type=int,
+        default=1500,
+        help="Number of songs in the synthetic song and alias set.",
+    )
+
+    catalog = subparsers.add_parser(
+        "catalog",
+        help="Benchmark looking up chart data for a folder page, database query "
+        "against the in-memory chart catalog",
+    )
+    catalog.add_argument(
+        "--songs",
+        type=int,
+        default=1500,
+        help="Number of songs in the synthetic song database.",
+    )
+    catalog.add_argument(
+        "--records", type=int, default=300, help="Number of records on the page."
+    )
+
+    load = subparsers.add_parser(
+        "load",
+        help="Run bot commands at a fixed rate against a fake CHUNITHM-NET and "
+        "report their latency. Needs a bot.ini, like running the bot.",
+    )
+    load.add_argument(
+        "--commands",
+        action="append",
+        choices=["best30", "recent10", "top"],
+        help="Command to run. Can be repeated. Defaults to all of them.",
+    )
+    load.add_argument(
+        "--rate", type=float, default=10, help="Commands started per second."
+    )
+    load.add_argument(
+        "--duration",
+        type=float,
+        default=30,
+        help="How long to keep starting commands, in seconds.",
+    )
+    load.add_argument(
+        "--users", type=int, default=200, help="Number of logged in users."
+    )
+    load.add_argument("--seed", type=int, help="Seed for picking commands and users.")
+
+    fake_server = subparsers.add_parser(
+        "fake-server",
+        help="Serve the fake CHUNITHM-NET, to point a development bot at.",
+    )
+    fake_server.add_argument("--host", default="127.0.0.1")
+    fake_server.add_argument("--port", type=int, default=8080)
+
+    for subparser in [load, fake_server]:
+        subparser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Seconds the fake server takes to answer a request.",
+        )
+        subparser.add_argument(
+            "--bandwidth",
+            type=int,
+            help="Bytes per second the fake server sends pages at. Unlimited by default.",
+        )
+        subparser.add_argument(
+            "--maintenance-rate",
+            type=float,
+            default=0.0,
+            help="Chance of a request being answered with maintenance.",
+        )
+        subparser.add_argument(
+            "--session-error-rate",
+            type=float,
+            default=0.0,
+            help="Chance of a request dropping the session, forcing a new login.",
+        )
+        subparser.add_argument(
+            "--session-ttl",
+            type=float,
+            help="Seconds after which sessions expire. Never by default.",
+        )
+        subparser.add_argument(
+            "--folder-scale",
+            type=int,
+            default=1,
+            help="Serve folder pages with this many times the records of the fixture.",
+        )
+
+    for subparser in [parsers, render, search, catalog]:
+        subparser.add_argument(
+            "--filter", help="Only run cases whose name contains this string."
+        )
+        subparser.add_argument("-n", "--iterations", type=int, default=20)
+        subparser.add_argument(
+            "--no-isolate",
+            action="store_true",
+            help="Run every case in the same process. Faster, but peak RSS becomes meaningless.",
+        )
+
+    for subparser in [parsers, render, search, catalog, load]:
+        subparser.add_argument(
+            "--save", type=Path, help="Save results as JSON to this path."
+        )
+        subparser.add_argument(
+            "--compare",
+            type=Path,
+            help="Compare against results previously saved with --save, exiting with "
+            "a non-zero status if anything regressed.",
+        )
+        subparser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.2,
+            help="How much slower (0.2 = 20%%) a benchmark may get before --compare fails.",
+        )
+
+    args = parser.parse_args()
+
+    if args.command in ("load", "fake-server"):
+        from .fake_chuninet import FakeChuniNetOptions
+
+        options = FakeChuniNetOptions(
+            latency=args.latency,
+            bandwidth=args.bandwidth,
+            maintenance_rate=args.maintenance_rate,
+            session_error_rate=args.session_error_rate,
+            session_ttl=args.session_ttl,
+            folder_scale=args.folder_scale,
+        )
+
+    if args.command == "fake-server":
+        from aiohttp import web
+
+        from .fake_chuninet import create_app
+
+        web.run_app(create_app(options), host=args.host, port=args.port)
+        return
+
+    if args.command == "parsers":
+        from .parsers import run
+
+        backends = args.backend or [
+            b for b in ["bs4", "lxml"] if b == "bs4" or importlib.util.find_spec(b)
+        ]
+        results = run(
+            backends,
+            iterations=args.iterations,
+            scale=args.scale,
+            isolate=not args.no_isolate,
+            filter=args.filter,
+        )
+        headers = [
+            "case",
+            "records",
+            "build ms",
+            "parse ms",
+            "total ms",
+            "tree KiB",
+            "blocks",
+            "peak KiB",
+            "RSS KiB",
+        ]
+        rows = [
+            [
+                r.name,
+                str(r.extras["records"]),
+                f"{r.measurements['build'].median * 1000:.3f}",
+                f"{r.measurements['parse'].median * 1000:.3f}",
+                f"{r.total_median * 1000:.3f}",
+                f"{r.measurements['build'].retained / 1024:.1f}",
+                str(r.measurements["build"].retained_blocks),
+                f"{max(m.peak for m in r.measurements.values()) / 1024:.1f}",
+                "-" if r.peak_rss is None else str(r.peak_rss),
+            ]
+            for r in results
+        ]
+    elif args.command == "render":
+        from .render import run
+
+        results = run(
+            iterations=args.iterations,
+            isolate=not args.no_isolate,
+            filter=args.filter,
+            **({"font_dir": args.font_dir} if args.font_dir is not None else {}),
+        )
+        headers = [
+            "case",
+            "assets ms",
+            "jackets ms",
+            "render ms",
+            "encode ms",
+            "total ms",
+            "size KiB",
+            "peak KiB",
+            "RSS KiB",
+        ]
+        rows = [
+            [
+                r.name,
+                *(
+                    f"{r.measurements[k].median * 1000:.3f}"
+                    if k in r.measurements
+                    else "-"
+                    for k in ["assets", "jackets", "render", "encode"]
+                ),
+                f"{r.total_median * 1000:.3f}",
+                f"{r.extras['size'] / 1024:.1f}" if "size" in r.extras else "-",
+                f"{max(m.peak for m in r.measurements.values()) / 1024:.1f}",
+                "-" if r.peak_rss is None else str(r.peak_rss),
+            ]
+            for r in results
+        ]
+
+        if any(r.extras["substitute_fonts"] for r in results):
+            print(
+                "Fonts not found, using Pillow's built-in font instead. "
+                "Asset loading times are underestimated.\n"
+            )
+    elif args.command == "search":
+        from .search import run
+
+        results = run(
+            iterations=args.iterations,
+            isolate=not args.no_isolate,
+            songs=args.songs,
+            filter=args.filter,
+        )
+        headers = [
+            "case",
+            "choices",
+            "queries",
+            "total ms",
+            "p50 us",
+            "p99 us",
+            "peak KiB",
+            "RSS KiB",
+        ]
+        rows = [
+            [
+                r.name,
+                str(r.extras["choices"]),
+                str(r.extras.get("queries", "-")),
+                f"{r.total_median * 1000:.3f}",
+                *(
+                    f"{r.extras[k] * 1_000_000:.1f}" if k in r.extras else "-"
+                    for k in ["p50", "p99"]
+                ),
+                f"{max(m.peak for m in r.measurements.values()) / 1024:.1f}",
+                "-" if r.peak_rss is None else str(r.peak_rss),
+            ]
+            for r in results
+        ]
+    elif args.command == "catalog":
+        from .catalog import run
+
+        results = run(
+            iterations=args.iterations,
+            isolate=not args.no_isolate,
+            songs=args.songs,
+            records=args.records,
+            filter=args.filter,
+        )
+        headers = ["case", "songs", "records", "total ms", "peak KiB", "RSS KiB"]
+        rows = [
+            [
+                r.name,
+                str(r.extras["songs"]),
+                str(r.extras["records"]),
+                f"{r.total_median * 1000:.3f}",
+                f"{max(m.peak for m in r.measurements.values()) / 1024:.1f}",
+                "-" if r.peak_rss is None else str(r.peak_rss),
+            ]
+            for r in results
+        ]
+    elif args.command == "load":
+        if not (Path(__file__).parent.parent / "bot.ini").exists():
+            print("The load test loads the bot's cogs, which need a bot.ini.")
+            sys.exit(1)
+
+        from .load import COMMANDS, run
+
+        results, server_stats = run(
+            commands=args.commands or list(COMMANDS),
+            rate=args.rate,
+            duration=args.duration,
+            users=args.users,
+            options=options,
+            seed=args.seed,
+        )
+        headers = [
+            "command",
+            "runs",
+            "errors",
+            "requests",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+            "max ms",
+        ]
+        rows = [
+            [
+                r.name,
+                str(r.extras["runs"]),
+                str(sum(r.extras["errors"].values())),
+                f"{r.extras['requests']:.1f}",
+                *(f"{r.extras[k] * 1000:.1f}" for k in ["p50", "p95", "p99"]),
+                f"{max(r.measurements['latency'].timings) * 1000:.1f}",
+            ]
+            for r in results
+        ]
+
+        print(
+            "Fake CHUNITHM-NET: "
+            + ", ".join(f"{v} {k.replace('_', ' ')}" for k, v in server_stats.items())
+            + "\n"
+        )
+
+        for r in results:
+            for error, count in r.extras["errors"].items():
+                print(f"{r.name}: {count}x {error}")
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+    print(format_table(headers, rows))
+
+    if args.save is not None:
+        save_results(args.save, results)
+
+    if args.compare is not None:
+        regressions = compare_results(
+            args.compare, results, max_regression=args.max_regression
+        )
+
+        if regressions:
+            print("\nRegressions:", *regressions, sep="\n")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
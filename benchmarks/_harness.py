@@ -0,0 +1,175 @@
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from utils import json_dumps, json_loads
+
+try:
+    import resource
+except ModuleNotFoundError:  # Windows
+    resource = None
+
+
+@dataclass
+class Measurement:
+    # Wall time of each iteration, in seconds.
+    timings: list[float]
+
+    # Bytes still held by the Python allocator after the call, while its return
+    # value is kept alive. Memory allocated by C libraries that bypass the Python
+    # allocator (for example libxml2) is not counted here, see `peak_rss`.
+    retained: int = 0
+    # Number of memory blocks still held after the call.
+    retained_blocks: int = 0
+    # Highest amount of memory held by the Python allocator during the call.
+    peak: int = 0
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.timings)
+
+    @property
+    def best(self) -> float:
+        return min(self.timings)
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    measurements: dict[str, Measurement]
+
+    # Growth of the process' peak resident set size while running the benchmark,
+    # in KiB. Only meaningful when each benchmark runs in a fresh process.
+    peak_rss: Optional[int] = None
+
+    extras: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def total_median(self) -> float:
+        return sum(m.median for m in self.measurements.values())
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of the current process, in KiB."""
+    if resource is None:
+        return None
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+
+def measure(
+    fn: Callable[[], Any],
+    *,
+    iterations: int,
+    warmup: int = 1,
+) -> tuple[Any, Measurement]:
+    """Times `fn` over a number of iterations, then calls it once more under
+    tracemalloc to find out how much memory it allocates and how much its return
+    value holds on to.
+
+    Returns the return value of the traced call along with the measurement, so
+    that it can be fed into the next phase of a benchmark.
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        result = fn()
+
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    retained_blocks = sum(
+        stat.count_diff
+        for stat in after.compare_to(before, "filename")
+        if stat.count_diff > 0
+    )
+
+    return result, Measurement(
+        timings=timings,
+        retained=max(current - baseline, 0),
+        retained_blocks=retained_blocks,
+        peak=max(peak - baseline, 0),
+    )
+
+
+def format_table(headers: list[str], rows: list[list[str]]) -> str:
+    widths = [
+        max(len(headers[i]), *(len(row[i]) for row in rows))
+        for i in range(len(headers))
+    ]
+    lines = [
+        " | ".join(h.ljust(w) for h, w in zip(headers, widths)),
+        "-+-".join("-" * w for w in widths),
+    ]
+    lines.extend(
+        " | ".join(
+            cell.ljust(w) if i == 0 else cell.rjust(w)
+            for i, (cell, w) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )
+    return "\n".join(lines)
+
+
+def save_results(path: Path, results: list[BenchmarkResult]) -> None:
+    data = {
+        result.name: {
+            "total_median": result.total_median,
+            "peak_rss": result.peak_rss,
+            "measurements": {k: asdict(v) for k, v in result.measurements.items()},
+            "extras": result.extras,
+        }
+        for result in results
+    }
+    path.write_text(json_dumps(data))
+
+
+def compare_results(
+    path: Path,
+    results: list[BenchmarkResult],
+    *,
+    max_regression: float,
+) -> list[str]:
+    """Compares results against a file written by `save_results`.
+
+    Returns a description of every benchmark whose median time grew by more than
+    `max_regression` (0.2 = 20%) compared to the saved baseline.
+    """
+    baseline = json_loads(path.read_text())
+    regressions = []
+
+    for result in results:
+        if (previous := baseline.get(result.name)) is None:
+            continue
+
+        before = previous["total_median"]
+        after = result.total_median
+        if before > 0 and (after - before) / before > max_regression:
+            regressions.append(
+                f"{result.name}: {before * 1000:.2f}ms -> {after * 1000:.2f}ms "
+                f"(+{(after - before) / before * 100:.1f}%)"
+            )
+
+    return regressions
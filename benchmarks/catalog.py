@@ -0,0 +1,191 @@
+import asyncio
+import multiprocessing
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from chunithm_net.consts import KEY_SONG_ID
+from chunithm_net.models.enums import ClearType, ComboType, Difficulty, Rank
+from chunithm_net.models.record import MusicRecord
+from database.models import Base, Chart, Song
+from utils.catalog import ChartCatalog
+
+from ._harness import BenchmarkResult, measure, peak_rss
+
+CASES = ["load", "database", "catalog"]
+
+DIFFICULTIES = [
+    Difficulty.BASIC,
+    Difficulty.ADVANCED,
+    Difficulty.EXPERT,
+    Difficulty.MASTER,
+    Difficulty.ULTIMA,
+]
+
+
+def make_songs(count: int, rng: random.Random) -> list[Song]:
+    songs = []
+
+    for song_id in range(1, count + 1):
+        song = Song(
+            id=song_id,
+            title=f"Song {song_id}",
+            chunithm_catcode=0,
+            genre="POPS & ANIME",
+            artist="Artist",
+            version="CHUNITHM",
+            jacket=f"{song_id:016x}.jpg",
+            available=True,
+            removed=False,
+        )
+        song.charts = [
+            Chart(
+                song_id=song_id,
+                difficulty=difficulty.short_form(),
+                level=str(rng.randint(1, 15)),
+                const=round(rng.uniform(1, 15.4), 1),
+                maxcombo=rng.randint(200, 4000),
+            )
+            for difficulty in DIFFICULTIES[: rng.randint(4, 5)]
+        ]
+        songs.append(song)
+
+    return songs
+
+
+def make_records(count: int, songs: int, rng: random.Random) -> list[MusicRecord]:
+    """A level folder page: every record carries the song ID from its form."""
+    records = []
+
+    for song_id in rng.sample(range(1, songs + 1), count):
+        record = MusicRecord(
+            title=f"Song {song_id}",
+            difficulty=rng.choice(DIFFICULTIES[:4]),
+            score=rng.randint(900_000, 1_010_000),
+            rank=Rank.D,
+            clear_lamp=ClearType.CLEAR,
+            combo_lamp=ComboType.NONE,
+        )
+        record.extras[KEY_SONG_ID] = song_id
+        records.append(record)
+
+    return records
+
+
+async def lookup_database(session_factory: async_sessionmaker, records):
+    """How `UtilsCog.hydrate_records` used to find chart data."""
+    song_ids = {record.extras[KEY_SONG_ID] for record in records}
+
+    async with session_factory() as session:
+        stmt = (
+            select(Song).where(Song.id.in_(song_ids)).options(joinedload(Song.charts))
+        )
+        songs = {
+            song.id: song for song in (await session.execute(stmt)).scalars().unique()
+        }
+
+    return [
+        next(
+            (
+                c
+                for c in songs[record.extras[KEY_SONG_ID]].charts
+                if c.difficulty == record.difficulty.short_form()
+            ),
+            None,
+        )
+        for record in records
+    ]
+
+
+def lookup_catalog(catalog: ChartCatalog, records):
+    result = []
+
+    for record in records:
+        song = catalog.song(record.extras[KEY_SONG_ID], record.jacket)
+        result.append(
+            None if song is None else song.charts.get(record.difficulty.short_form())
+        )
+
+    return result
+
+
+def run_case(case: str, iterations: int, songs: int, records: int) -> BenchmarkResult:
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as tmp, asyncio.Runner() as runner:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def setup():
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+            async with session_factory() as session, session.begin():
+                session.add_all(make_songs(songs, rng))
+
+        async def load():
+            async with session_factory() as session:
+                return await ChartCatalog.load(session)
+
+        runner.run(setup())
+        page = make_records(records, songs, rng)
+
+        rss_before = peak_rss()
+
+        if case == "load":
+            _, measurement = measure(lambda: runner.run(load()), iterations=iterations)
+        elif case == "database":
+            _, measurement = measure(
+                lambda: runner.run(lookup_database(session_factory, page)),
+                iterations=iterations,
+            )
+        else:
+            catalog = runner.run(load())
+            _, measurement = measure(
+                lambda: lookup_catalog(catalog, page), iterations=iterations
+            )
+
+        rss_after = peak_rss()
+        runner.run(engine.dispose())
+
+    return BenchmarkResult(
+        name=case,
+        measurements={case: measurement},
+        peak_rss=(
+            rss_after - rss_before
+            if rss_before is not None and rss_after is not None
+            else None
+        ),
+        extras={"songs": songs, "records": 0 if case == "load" else records},
+    )
+
+
+def run(
+    *,
+    iterations: int,
+    isolate: bool,
+    songs: int = 1500,
+    records: int = 300,
+    filter: Optional[str] = None,
+) -> list[BenchmarkResult]:
+    cases = [c for c in CASES if filter is None or filter in c]
+
+    if not isolate:
+        return [run_case(case, iterations, songs, records) for case in cases]
+
+    results = []
+    for case in cases:
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            results.append(
+                executor.submit(run_case, case, iterations, songs, records).result()
+            )
+
+    return results
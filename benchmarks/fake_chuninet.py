@@ -0,0 +1,254 @@
+"""A local stand-in for CHUNITHM-NET, serving the test fixtures.
+
+The server understands just enough of the login flow for `ChuniNet` to log in
+with any `clal` cookie, and can be told to be slow, to go into maintenance or
+to drop sessions, so that the bot can be exercised offline under load.
+
+`FakeHostTransport` sends every request `ChuniNet` makes, to whichever host, to
+the fake server instead.
+"""
+
+import asyncio
+import random
+import re
+import secrets
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+from aiohttp import web
+
+from chunithm_net.transport import SharedTransport
+
+from .parsers import FIXTURES_DIR, PLAYLOG_RECORD, RATING_RECORD, scale_records
+
+__all__ = ["FakeChuniNetOptions", "FakeHostTransport", "create_app"]
+
+# Pages are keyed by method and path. Anything else is a 404.
+PAGES = {
+    ("GET", "/mobile/home/"): "logged_in_homepage.html",
+    ("GET", "/mobile/home/playerData"): "player_data.html",
+    ("GET", "/mobile/home/playerData/ratingDetailBest/"): "best30.html",
+    ("GET", "/mobile/home/playerData/ratingDetailRecent/"): "recent10.html",
+    ("GET", "/mobile/record/playlog"): "playlog.html",
+    ("POST", "/mobile/record/playlog/sendPlaylogDetail/"): "playlog_detail.html",
+    ("POST", "/mobile/record/musicGenre/sendMusicDetail/"): "music_record.html",
+    (
+        "POST",
+        "/mobile/record/worldsEndList/sendWorldsEndDetail/",
+    ): "worlds_end_music_record.html",
+    ("GET", "/mobile/record/worldsEndList"): "music_record_by_level_folder.html",
+    (
+        "POST",
+        "/mobile/record/musicLevel/sendSearch/",
+    ): "music_record_by_level_folder.html",
+}
+FOLDER_PATH = re.compile(r"^/mobile/record/music(Genre|Rank)/send[A-Za-z]+$")
+FOLDER_PAGE = "music_record_by_level_folder.html"
+
+LOGIN_PATH = "/common_auth/login"
+LANDING_PATH = "/mobile/"
+ERROR_PATH = "/mobile/error/"
+BASE_URL = "https://chunithm-net-eng.com"
+
+
+@dataclass
+class FakeChuniNetOptions:
+    # Time taken to answer every request, in seconds, give or take `jitter`
+    # (0.5 = 50%).
+    latency: float = 0.05
+    jitter: float = 0.5
+    # If set, bodies are sent in 16 KiB chunks at this many bytes per second.
+    bandwidth: Optional[int] = None
+
+    # Chance of answering any request with a maintenance 503.
+    maintenance_rate: float = 0.0
+    # Chance of dropping the session of a request, which then gets error 200004.
+    session_error_rate: float = 0.0
+    # Sessions expire this many seconds after logging in.
+    session_ttl: Optional[float] = None
+
+    # Folder pages hold this many times as many records as the fixture.
+    folder_scale: int = 1
+    # Same for the playlog. CHUNITHM-NET never shows more than 50 plays, but
+    # bigger pages are useful for benchmarking.
+    playlog_scale: int = 1
+
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeChuniNetStats:
+    requests: Counter[str] = field(default_factory=Counter)
+    logins: int = 0
+    maintenance: int = 0
+    session_errors: int = 0
+    expired_sessions: int = 0
+
+
+class _FakeChuniNet:
+    def __init__(self, options: FakeChuniNetOptions) -> None:
+        self.options = options
+        self.stats = FakeChuniNetStats()
+
+        self._rng = random.Random(options.seed)
+        self._sessions: dict[str, float] = {}
+        # Sessions that have not loaded a page since logging in. These are never
+        # dropped, otherwise a login could fail on its own redirect.
+        self._fresh_sessions: set[str] = set()
+        self._pages = {
+            name: self._load(name) for name in {*PAGES.values(), "200004.html"}
+        }
+        self._pages[FOLDER_PAGE] = self._load(
+            FOLDER_PAGE, RATING_RECORD, options.folder_scale
+        )
+        self._pages["playlog.html"] = self._load(
+            "playlog.html", PLAYLOG_RECORD, options.playlog_scale
+        )
+
+    @staticmethod
+    def _load(name: str, selector: Optional[str] = None, scale: int = 1) -> bytes:
+        text = (FIXTURES_DIR / name).read_text(encoding="utf-8")
+
+        if selector is not None and scale > 1:
+            text = scale_records(text, selector, scale)
+
+        return text.encode("utf-8")
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        options = self.options
+        self.stats.requests[request.path] += 1
+
+        await asyncio.sleep(
+            options.latency * self._rng.uniform(1 - options.jitter, 1 + options.jitter)
+        )
+
+        if self._rng.random() < options.maintenance_rate:
+            self.stats.maintenance += 1
+            return web.Response(status=503, text="Under maintenance")
+
+        if request.path == LOGIN_PATH:
+            return self._login(request)
+        if request.path == LANDING_PATH:
+            return self._landing(request)
+        if request.path == ERROR_PATH:
+            return await self._send(request, self._pages["200004.html"])
+
+        if (page := self._page_for(request)) is None:
+            raise web.HTTPNotFound
+
+        token = request.cookies.get("_t")
+        logged_in_at = self._sessions.get(token) if token is not None else None
+
+        if logged_in_at is None:
+            raise web.HTTPFound(LANDING_PATH)
+
+        if (
+            options.session_ttl is not None
+            and time.monotonic() - logged_in_at > options.session_ttl
+        ):
+            self.stats.expired_sessions += 1
+            del self._sessions[token]  # type: ignore[reportArgumentType]
+            self._fresh_sessions.discard(token)  # type: ignore[reportArgumentType]
+            raise web.HTTPFound(LANDING_PATH)
+
+        if token in self._fresh_sessions:
+            self._fresh_sessions.discard(token)  # type: ignore[reportArgumentType]
+        elif self._rng.random() < options.session_error_rate:
+            self.stats.session_errors += 1
+            del self._sessions[token]  # type: ignore[reportArgumentType]
+            raise web.HTTPFound(ERROR_PATH)
+
+        return await self._send(request, self._pages[page])
+
+    def _page_for(self, request: web.Request) -> Optional[str]:
+        if (page := PAGES.get((request.method, request.path))) is not None:
+            return page
+
+        if request.method == "POST" and FOLDER_PATH.match(request.path):
+            return FOLDER_PAGE
+
+        return None
+
+    def _login(self, request: web.Request) -> web.Response:
+        if "clal" not in request.cookies:
+            # CHUNITHM-NET stays on the login page, which `ChuniNet` takes as an
+            # invalid token.
+            return web.Response(text="Log in with your SEGA ID")
+
+        self.stats.logins += 1
+
+        token = secrets.token_hex(16)
+        self._sessions[token] = time.monotonic()
+        self._fresh_sessions.add(token)
+
+        location = f"{BASE_URL}{LANDING_PATH}?ssid={token}"
+        raise web.HTTPFound(location)
+
+    def _landing(self, request: web.Request) -> web.Response:
+        if (token := request.query.get("ssid")) is None or token not in self._sessions:
+            return web.Response(text="Session expired")
+
+        response = web.HTTPFound("/mobile/home/")
+        response.set_cookie("_t", token, path="/")
+        raise response
+
+    async def _send(self, request: web.Request, body: bytes) -> web.StreamResponse:
+        if self.options.bandwidth is None:
+            return web.Response(body=body, content_type="text/html", charset="utf-8")
+
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/html; charset=utf-8"}
+        )
+        response.content_length = len(body)
+        await response.prepare(request)
+
+        chunk_size = 16 * 1024
+        for start in range(0, len(body), chunk_size):
+            chunk = body[start : start + chunk_size]
+            await response.write(chunk)
+            await asyncio.sleep(len(chunk) / self.options.bandwidth)
+
+        await response.write_eof()
+        return response
+
+
+def create_app(options: Optional[FakeChuniNetOptions] = None) -> web.Application:
+    """The fake CHUNITHM-NET. Its stats are in `app["stats"]`."""
+    fake = _FakeChuniNet(options or FakeChuniNetOptions())
+
+    app = web.Application()
+    app["stats"] = fake.stats
+    app.router.add_route("*", "/{path:.*}", fake.handle)
+
+    return app
+
+
+class FakeHostTransport(SharedTransport):
+    def __init__(self, server_url: "httpx.URL | str", **kwargs) -> None:
+        """A `SharedTransport` that sends every request to `server_url` instead of
+        the host it was meant for.
+
+        Clients still see the original URLs, so cookies, redirects and the
+        session checks in `ChuniNet` behave as they would against the real
+        site.
+        """
+        super().__init__(**kwargs)
+        self.server_url = httpx.URL(server_url)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        forwarded = httpx.Request(
+            request.method,
+            request.url.copy_with(
+                scheme=self.server_url.scheme,
+                host=self.server_url.host,
+                port=self.server_url.port,
+            ),
+            headers=request.headers,
+            stream=request.stream,
+            extensions=request.extensions,
+        )
+
+        return await super().handle_async_request(forwarded)
@@ -0,0 +1,366 @@
+"""Drives the bot's commands against the fake CHUNITHM-NET at a fixed rate.
+
+Commands are invoked on the real cogs through stand-in `Context` objects, with a
+scratch database holding logged in users and the songs on the fixture pages.
+Commands are started on schedule whether or not earlier ones have finished, so
+slowdowns show up as growing latencies instead of a lower request rate.
+
+Loading the cogs reads `bot.ini`, like running the bot does.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import random
+import secrets
+import statistics
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.cookiejar import Cookie as HTTPCookie
+from http.cookiejar import LWPCookieJar
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+import httpx
+from aiohttp.test_utils import TestServer
+
+from chunithm_net import parser
+from chunithm_net.consts import KEY_SONG_ID
+
+from ._harness import BenchmarkResult, Measurement
+from .fake_chuninet import FakeChuniNetOptions, FakeHostTransport, create_app
+from .parsers import FIXTURES_DIR
+
+if TYPE_CHECKING:
+    from bot import ChuniBot
+
+# Arguments each command is invoked with.
+COMMANDS: dict[str, dict[str, Any]] = {
+    "best30": {},
+    "recent10": {},
+    "top": {"query": "14"},
+}
+
+# Requests sent by the command currently running in this task.
+_requests: contextvars.ContextVar[Optional[list[int]]] = contextvars.ContextVar(
+    "requests", default=None
+)
+
+
+class CountingTransport(FakeHostTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if (counter := _requests.get()) is not None:
+            counter[0] += 1
+
+        return await super().handle_async_request(request)
+
+
+@dataclass(eq=False)
+class FakeUser:
+    id: int
+    bot: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"user{self.id}"
+
+    display_name = name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+
+class FakeMessage:
+    reference = None
+
+    def __init__(self) -> None:
+        self.id = random.getrandbits(63)
+
+    async def edit(self, **_) -> "FakeMessage":
+        return self
+
+    async def delete(self, **_) -> None:
+        pass
+
+
+class FakeContext:
+    def __init__(self, bot: "ChuniBot", author: FakeUser) -> None:
+        """Just enough of `discord.ext.commands.Context` for commands to run.
+        Replies are counted and thrown away."""
+        self.bot = bot
+        self._state = bot._connection
+        self.author = author
+        self.prefix = "c>"
+        self.guild = None
+        self.interaction = None
+        self.message = FakeMessage()
+        self.channel = self
+        self.replies = 0
+
+    async def reply(self, *_, **__) -> FakeMessage:
+        self.replies += 1
+        return FakeMessage()
+
+    send = reply
+
+    async def defer(self, **_) -> None:
+        pass
+
+    @contextlib.asynccontextmanager
+    async def typing(self):
+        yield
+
+
+@dataclass
+class CommandStats:
+    latencies: list[float] = field(default_factory=list)
+    requests: list[int] = field(default_factory=list)
+    errors: Counter[str] = field(default_factory=Counter)
+
+
+def _make_jar() -> LWPCookieJar:
+    jar = LWPCookieJar()
+    jar.set_cookie(
+        HTTPCookie(
+            version=0,
+            name="clal",
+            value=secrets.token_hex(32),
+            port=None,
+            port_specified=False,
+            domain="lng-tgk-aime-gw.am-all.net",
+            domain_specified=True,
+            domain_initial_dot=False,
+            path="/common_auth",
+            path_specified=True,
+            secure=False,
+            expires=3856586927,
+            discard=False,
+            comment=None,
+            comment_url=None,
+            rest={},
+        )
+    )
+
+    return jar
+
+
+async def _seed_database(bot: "ChuniBot", users: int, rng: random.Random) -> None:
+    """Adds the users, and every chart on the fixture pages as a level 14."""
+    from database.models import Base, Chart, Cookie, Song
+    from utils.cookie_store import dump_jar
+
+    async with bot.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    charts: dict[int, tuple[str, set[str]]] = {}
+    for fixture in [
+        "best30.html",
+        "recent10.html",
+        "music_record_by_level_folder.html",
+    ]:
+        doc = parser.document_fromstring(
+            (FIXTURES_DIR / fixture).read_text(encoding="utf-8")
+        )
+        for record in parser.parse_music_for_rating(doc):
+            title, difficulties = charts.setdefault(
+                record.extras[KEY_SONG_ID], (record.title, set())
+            )
+            difficulties.add(record.difficulty.short_form())
+
+    async with bot.begin_db_session() as session, session.begin():
+        session.add_all(
+            Cookie(discord_id=discord_id, cookie=dump_jar(_make_jar()))
+            for discord_id in range(1, users + 1)
+        )
+
+        for song_id, (title, difficulties) in charts.items():
+            song = Song(
+                id=song_id,
+                title=title,
+                chunithm_catcode=0,
+                genre="ORIGINAL",
+                artist="Artist",
+                version="CHUNITHM",
+                jacket=f"{song_id:016x}.jpg",
+                available=True,
+                removed=False,
+            )
+            song.charts = [
+                Chart(
+                    song_id=song_id,
+                    difficulty=difficulty,
+                    level="14",
+                    const=round(rng.uniform(14.0, 14.4), 1),
+                    maxcombo=rng.randint(1000, 3000),
+                )
+                for difficulty in difficulties
+            ]
+            session.add(song)
+
+
+async def _build_bot(
+    server_url: str, db_path: Path, users: int, rng: random.Random
+) -> "ChuniBot":
+    import discord
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from bot import ChuniBot
+    from chunithm_net.breaker import CircuitBreaker
+    from chunithm_net.cache import CACHEABLE_ENDPOINTS, ResponseCache
+    from utils.config import config
+
+    bot = ChuniBot(command_prefix="c>", intents=discord.Intents.none())
+    bot.engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    bot.begin_db_session = async_sessionmaker(bot.engine, expire_on_commit=False)
+    bot.chuninet_transport = CountingTransport(
+        server_url,
+        max_connections=config.chunithm_net.max_connections,
+        max_keepalive_connections=config.chunithm_net.max_keepalive_connections,
+        keepalive_expiry=config.chunithm_net.keepalive_expiry,
+        breaker=CircuitBreaker(
+            failure_threshold=config.chunithm_net.breaker_failure_threshold,
+            cooldown=config.chunithm_net.breaker_cooldown,
+            maintenance_cooldown=config.chunithm_net.breaker_maintenance_cooldown,
+        ),
+    )
+    bot.chuninet_cache = ResponseCache(
+        {
+            endpoint: config.chunithm_net.cache_ttl(endpoint)
+            for endpoint in CACHEABLE_ENDPOINTS
+        },
+        max_entries=config.chunithm_net.cache_max_entries,
+        max_size=config.chunithm_net.cache_max_size,
+    )
+
+    await _seed_database(bot, users, rng)
+
+    for extension in ["cogs.botutils", "cogs.autocompleters", "cogs.chunithm.records"]:
+        await bot.load_extension(extension)
+
+    return bot
+
+
+async def _run_command(
+    bot: "ChuniBot", name: str, user: FakeUser, stats: CommandStats
+) -> None:
+    command = bot.get_command(name)
+    assert command is not None
+
+    requests = [0]
+    _requests.set(requests)
+
+    start = time.perf_counter()
+    try:
+        await command(FakeContext(bot, user), **COMMANDS[name])  # type: ignore[reportArgumentType]
+    except Exception as e:  # noqa: BLE001
+        stats.errors[type(e).__name__] += 1
+    finally:
+        stats.latencies.append(time.perf_counter() - start)
+        stats.requests.append(requests[0])
+
+
+async def run_load(
+    *,
+    commands: list[str],
+    rate: float,
+    duration: float,
+    users: int,
+    options: FakeChuniNetOptions,
+    seed: Optional[int] = None,
+) -> tuple[dict[str, CommandStats], dict[str, Any]]:
+    """Starts `rate` commands per second for `duration` seconds, each one picked
+    at random from `commands` and run as a random user.
+
+    Returns statistics for each command, and the fake server's counters.
+    """
+    rng = random.Random(seed)
+    stats = {name: CommandStats() for name in commands}
+
+    async with TestServer(create_app(options)) as server:
+        with tempfile.TemporaryDirectory() as tmp:
+            bot = await _build_bot(
+                str(server.make_url("/")), Path(tmp) / "load.sqlite3", users, rng
+            )
+
+            try:
+                tasks = []
+                started = time.perf_counter()
+
+                for i in range(int(rate * duration)):
+                    # Keep to the schedule even if starting commands falls behind.
+                    delay = started + i / rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                    name = rng.choice(commands)
+                    user = FakeUser(rng.randint(1, users))
+                    tasks.append(
+                        asyncio.create_task(_run_command(bot, name, user, stats[name]))
+                    )
+
+                await asyncio.gather(*tasks)
+            finally:
+                await bot.close()
+
+        server_stats = server.app["stats"]
+
+    return stats, {
+        "requests": sum(server_stats.requests.values()),
+        "logins": server_stats.logins,
+        "maintenance": server_stats.maintenance,
+        "session_errors": server_stats.session_errors,
+        "expired_sessions": server_stats.expired_sessions,
+    }
+
+
+def run(
+    *,
+    commands: list[str],
+    rate: float,
+    duration: float,
+    users: int,
+    options: FakeChuniNetOptions,
+    seed: Optional[int] = None,
+) -> tuple[list[BenchmarkResult], dict[str, Any]]:
+    stats, server_stats = asyncio.run(
+        run_load(
+            commands=commands,
+            rate=rate,
+            duration=duration,
+            users=users,
+            options=options,
+            seed=seed,
+        )
+    )
+
+    results = []
+    for name, s in stats.items():
+        if not s.latencies:
+            continue
+
+        latencies = sorted(s.latencies)
+        results.append(
+            BenchmarkResult(
+                name=name,
+                measurements={"latency": Measurement(timings=s.latencies)},
+                extras={
+                    "runs": len(latencies),
+                    "errors": dict(s.errors),
+                    "p50": statistics.median(latencies),
+                    "p95": latencies[int(len(latencies) * 0.95)],
+                    "p99": latencies[int(len(latencies) * 0.99)],
+                    "requests": statistics.mean(s.requests),
+                },
+            )
+        )
+
+    return results, server_stats
@@ -0,0 +1,165 @@
+import copy
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+from chunithm_net import ParserBackend
+
+from ._harness import BenchmarkResult, measure, peak_rss
+
+FIXTURES_DIR = Path(__file__).parent.parent / "tests" / "chunithm_net" / "assets"
+
+PARSER_MODULES: dict[ParserBackend, str] = {
+    "bs4": "chunithm_net.parser",
+    "lxml": "chunithm_net.parser_lxml",
+}
+
+
+@dataclass(frozen=True)
+class ParserCase:
+    name: str
+    fixture: str
+    parser: str
+    args: tuple = ()
+
+    # If set, the records matched by this selector are duplicated until the page
+    # holds `scale` times as many records, to simulate huge folders.
+    record_selector: Optional[str] = None
+    scale: int = 1
+
+    def load(self) -> str:
+        text = (FIXTURES_DIR / self.fixture).read_text(encoding="utf-8")
+
+        if self.record_selector is None or self.scale <= 1:
+            return text
+
+        return scale_records(text, self.record_selector, self.scale)
+
+
+PLAYLOG_RECORD = ".frame02.w400"
+RATING_RECORD = "form:has(.w388.musiclist_box)"
+
+
+def get_cases(scale: int) -> list[ParserCase]:
+    cases = [
+        ParserCase("player_data", "player_data.html", "parse_player_data"),
+        ParserCase("playlog", "playlog.html", "parse_recent_records"),
+        ParserCase(
+            "playlog_detail", "playlog_detail.html", "parse_detailed_recent_record"
+        ),
+        ParserCase("music_record", "music_record.html", "parse_music_record", (428,)),
+        ParserCase("best30", "best30.html", "parse_music_for_rating"),
+        ParserCase(
+            "level_folder",
+            "music_record_by_level_folder.html",
+            "parse_music_for_rating",
+        ),
+    ]
+
+    if scale > 1:
+        cases.extend(
+            [
+                ParserCase(
+                    f"playlog_x{scale}",
+                    "playlog.html",
+                    "parse_recent_records",
+                    record_selector=PLAYLOG_RECORD,
+                    scale=scale,
+                ),
+                ParserCase(
+                    f"level_folder_x{scale}",
+                    "music_record_by_level_folder.html",
+                    "parse_music_for_rating",
+                    record_selector=RATING_RECORD,
+                    scale=scale,
+                ),
+            ]
+        )
+
+    return cases
+
+
+def scale_records(text: str, selector: str, scale: int) -> str:
+    """Duplicates every record matched by `selector` so that the page ends up with
+    `scale` times as many records as the original."""
+    soup = BeautifulSoup(text, "html.parser")
+    records = soup.select(selector)
+
+    if len(records) == 0:
+        return text
+
+    last = records[-1]
+    for _ in range(scale - 1):
+        for record in records:
+            clone = copy.copy(record)
+            last.insert_after(clone)
+            last = clone
+
+    return str(soup)
+
+
+def run_case(
+    case: ParserCase, backend: ParserBackend, iterations: int
+) -> BenchmarkResult:
+    parser = importlib.import_module(PARSER_MODULES[backend])
+    parse = getattr(parser, case.parser)
+    text = case.load()
+
+    rss_before = peak_rss()
+
+    tree, build = measure(
+        lambda: parser.document_fromstring(text), iterations=iterations
+    )
+    records, parsing = measure(lambda: parse(tree, *case.args), iterations=iterations)
+
+    rss_after = peak_rss()
+
+    return BenchmarkResult(
+        name=f"{case.name}[{backend}]",
+        measurements={"build": build, "parse": parsing},
+        peak_rss=(
+            rss_after - rss_before
+            if rss_before is not None and rss_after is not None
+            else None
+        ),
+        extras={
+            "html_bytes": len(text.encode("utf-8")),
+            "records": len(records) if isinstance(records, list) else 1,
+        },
+    )
+
+
+def run(
+    backends: list[ParserBackend],
+    *,
+    iterations: int,
+    scale: int,
+    isolate: bool,
+    filter: Optional[str] = None,
+) -> list[BenchmarkResult]:
+    """Runs every parser case against every backend.
+
+    With `isolate`, each case runs in a fresh process, so that peak RSS reflects
+    that case alone instead of whatever ran before it.
+    """
+    cases = [c for c in get_cases(scale) if filter is None or filter in c.name]
+    jobs = [(case, backend) for case in cases for backend in backends]
+
+    if not isolate:
+        return [run_case(case, backend, iterations) for case, backend in jobs]
+
+    results = []
+    for case, backend in jobs:
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            results.append(
+                executor.submit(run_case, case, backend, iterations).result()
+            )
+
+    return results
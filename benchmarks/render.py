@@ -0,0 +1,165 @@
+import io
+import multiprocessing
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageFont
+
+from chunithm_net.consts import KEY_INTERNAL_LEVEL, KEY_PLAY_RATING
+from chunithm_net.models.enums import ClearType, ComboType, Difficulty, Rank
+from chunithm_net.models.player_data import Rating
+from chunithm_net.models.record import Record
+from utils.rendering import (
+    FONT_DIR,
+    FONTS,
+    RenderAssets,
+    decode_jacket,
+    encode_image,
+    render_b30,
+)
+
+from ._harness import BenchmarkResult, measure, peak_rss
+
+# Encoding cases: name -> encode_image() arguments
+ENCODINGS = {
+    "encode_png": {"format": "png"},
+    "encode_png_optimized": {"format": "png", "optimize": True},
+    "encode_webp_q90": {"format": "webp", "quality": 90},
+    "encode_webp_lossless": {"format": "webp", "quality": 100},
+}
+
+CASES = ["uncached", "cached", *ENCODINGS]
+
+
+def make_records(count: int, rng: random.Random) -> list[Record]:
+    records = []
+
+    for i in range(count):
+        record = Record(
+            title=f"Song {i} " + "".join(rng.choices("ABCDEFGHIJ", k=12)),
+            difficulty=rng.choice(
+                [Difficulty.EXPERT, Difficulty.MASTER, Difficulty.ULTIMA]
+            ),
+            score=rng.randint(990_000, 1_010_000),
+            rank=rng.choice([Rank.SS, Rank.SSp, Rank.SSS, Rank.SSSp]),
+            clear_lamp=rng.choice(list(ClearType)),
+            combo_lamp=rng.choice(list(ComboType)),
+            jacket=f"https://jackets.invalid/{i}.jpg",
+        )
+        record.extras[KEY_INTERNAL_LEVEL] = round(rng.uniform(13.0, 15.4), 1)
+        record.extras[KEY_PLAY_RATING] = Decimal(rng.randint(1500, 1770)) / 100
+        records.append(record)
+
+    return records
+
+
+def make_jacket(rng: random.Random) -> bytes:
+    # Real jackets are 300x300 JPEGs.
+    image = Image.effect_noise((300, 300), rng.randint(32, 96)).convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def resolve_font_dir(font_dir: Path) -> tuple[Path, bool]:
+    """The fonts used in production are not shipped with the bot. If they are
+    missing, substitute Pillow's built-in font so the benchmark can still run.
+    Font loading then becomes much cheaper than with the real fonts, so the
+    uncached numbers are an underestimate."""
+    if all((font_dir / file).exists() for file, _ in FONTS.values()):
+        return font_dir, False
+
+    substitute_dir = Path(tempfile.mkdtemp(prefix="chuninewbot-fonts-"))
+    font_bytes = ImageFont.load_default(size=16).font_bytes  # type: ignore[reportAttributeAccessIssue]
+
+    for file, _ in FONTS.values():
+        (substitute_dir / file).write_bytes(font_bytes)
+
+    return substitute_dir, True
+
+
+def run_case(case: str, iterations: int, font_dir: Path) -> BenchmarkResult:
+    rng = random.Random(30)
+    best30 = make_records(30, rng)
+    recent10 = make_records(10, rng)
+    rating = Rating(17.12, 17.34)
+    jacket_bytes = {record.jacket: make_jacket(rng) for record in best30 + recent10}
+
+    font_dir, substituted = resolve_font_dir(font_dir)
+    rss_before = peak_rss()
+    measurements = {}
+    extras: dict = {"substitute_fonts": substituted}
+
+    if case == "uncached":
+        # What every c>generate used to do: read and decode every asset and
+        # jacket again for each image.
+        def load_assets():
+            return RenderAssets.load(font_dir=font_dir)
+
+        def decode_jackets():
+            return {url: decode_jacket(data) for url, data in jacket_bytes.items()}
+
+        assets, measurements["assets"] = measure(load_assets, iterations=iterations)
+        jackets, measurements["jackets"] = measure(
+            decode_jackets, iterations=iterations
+        )
+    else:
+        # Assets are loaded at cog load, and jacket tiles come from memory.
+        assets = RenderAssets.load(font_dir=font_dir)
+        jackets = {url: decode_jacket(data) for url, data in jacket_bytes.items()}
+
+    image, render_measurement = measure(
+        lambda: render_b30(
+            assets, "PLAYER", rating, best30, recent10, Decimal("16.5"), jackets
+        ),
+        iterations=iterations,
+    )
+
+    if case in ENCODINGS:
+        encoded, measurements["encode"] = measure(
+            lambda: encode_image(image, **ENCODINGS[case]), iterations=iterations
+        )
+        extras["size"] = len(encoded.data)
+    else:
+        measurements["render"] = render_measurement
+
+    rss_after = peak_rss()
+
+    return BenchmarkResult(
+        name=case,
+        measurements=measurements,
+        peak_rss=(
+            rss_after - rss_before
+            if rss_before is not None and rss_after is not None
+            else None
+        ),
+        extras=extras,
+    )
+
+
+def run(
+    *,
+    iterations: int,
+    isolate: bool,
+    font_dir: Path = FONT_DIR,
+    filter: Optional[str] = None,
+) -> list[BenchmarkResult]:
+    cases = [c for c in CASES if filter is None or filter in c]
+
+    if not isolate:
+        return [run_case(case, iterations, font_dir) for case in cases]
+
+    results = []
+    for case in cases:
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            results.append(
+                executor.submit(run_case, case, iterations, font_dir).result()
+            )
+
+    return results
@@ -0,0 +1,174 @@
+import multiprocessing
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from rapidfuzz import fuzz, process
+
+from utils.song_search import CachedAlias, SongSearchIndex
+
+from ._harness import BenchmarkResult, measure, peak_rss
+
+CASES = [
+    "build_index",
+    "autocomplete_linear",
+    "autocomplete_indexed",
+    "find_linear",
+    "find_indexed",
+]
+
+WORDS = [
+    "ultimate", "force", "dance", "night", "world", "end", "heart", "star",
+    "light", "blue", "red", "dream", "battle", "love", "sky", "zero", "angel",
+    "destiny", "garden", "galaxy", "memory", "phantom", "rain", "fire",
+]  # fmt: skip
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+GUILDS = [100, 200, 300, 400]
+
+
+def make_aliases(songs: int, rng: random.Random) -> list[CachedAlias]:
+    """A song and alias set shaped like the real one: mostly English or Japanese
+    titles, a few global aliases each and some guild-specific ones."""
+    aliases = []
+
+    for song_id in range(songs):
+        if rng.random() < 0.6:
+            title = " ".join(rng.choices(WORDS, k=rng.randint(1, 5))).title()
+        else:
+            title = "".join(rng.choices(KANA, k=rng.randint(3, 15)))
+        title += f" {song_id}"
+
+        aliases.append(CachedAlias(None, title, title, song_id, -1))
+
+        for _ in range(rng.randint(0, 4)):
+            alias = "".join(
+                rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 8))
+            )
+            guild_id = -1 if rng.random() < 0.7 else rng.choice(GUILDS)
+            aliases.append(CachedAlias(song_id, alias, title, song_id, guild_id))
+
+    return aliases
+
+
+def make_keystrokes(aliases: list[CachedAlias], rng: random.Random) -> list[str]:
+    """What Discord sends to the autocomplete while typing out some titles. The
+    bot does not suggest anything for fewer than 3 characters."""
+    return [
+        title[:length]
+        for title in rng.sample([a.title for a in aliases], 50)
+        for length in range(3, len(title) + 1)
+    ]
+
+
+def linear_extract(aliases: list[CachedAlias], query: str, guild_id: int):
+    """The search as it was before the index, for comparison."""
+    choices = [x for x in aliases if x.guild_id in {-1, guild_id}]
+    results = process.extract(
+        query,
+        [x.alias for x in choices],
+        scorer=fuzz.QRatio,
+        processor=str.lower,
+        limit=50,
+        score_cutoff=70,
+    )
+    return [choices[r[2]] for r in results]
+
+
+def linear_extract_one(aliases: list[CachedAlias], query: str, guild_id: int):
+    choices = [x for x in aliases if x.guild_id in {-1, guild_id}]
+    _, _, index = process.extractOne(
+        query, [x.alias for x in choices], scorer=fuzz.QRatio, processor=str.lower
+    )
+    return choices[index]
+
+
+def latencies(search: Callable[[str], object], queries: list[str]) -> list[float]:
+    timings = []
+
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def run_case(case: str, iterations: int, songs: int) -> BenchmarkResult:
+    rng = random.Random(10)
+    aliases = make_aliases(songs, rng)
+    guild_id = GUILDS[0]
+
+    if case.startswith("autocomplete"):
+        queries = make_keystrokes(aliases, rng)
+    else:
+        # Someone typing a title from memory.
+        queries = [
+            "".join(c for c in a.title if rng.random() > 0.1)
+            for a in rng.sample(aliases, 200)
+        ]
+
+    index = SongSearchIndex(aliases)
+    search: Optional[Callable[[str], object]] = None
+
+    if case == "autocomplete_linear":
+        search = lambda q: linear_extract(aliases, q, guild_id)  # noqa: E731
+    elif case == "autocomplete_indexed":
+        search = lambda q: index.extract(q, guild_id, limit=50, score_cutoff=70)  # noqa: E731
+    elif case == "find_linear":
+        search = lambda q: linear_extract_one(aliases, q, guild_id)  # noqa: E731
+    elif case == "find_indexed":
+        search = lambda q: index.extract_one(q, guild_id)  # noqa: E731
+
+    rss_before = peak_rss()
+    extras: dict = {"choices": len(aliases)}
+
+    if search is None:
+        _, measurement = measure(
+            lambda: SongSearchIndex(aliases), iterations=iterations
+        )
+    else:
+        _, measurement = measure(
+            lambda: [search(q) for q in queries], iterations=iterations
+        )
+
+        per_query = sorted(latencies(search, queries))
+        extras["queries"] = len(queries)
+        extras["p50"] = statistics.median(per_query)
+        extras["p99"] = per_query[int(len(per_query) * 0.99)]
+
+    rss_after = peak_rss()
+
+    return BenchmarkResult(
+        name=case,
+        measurements={"search" if search is not None else "build": measurement},
+        peak_rss=(
+            rss_after - rss_before
+            if rss_before is not None and rss_after is not None
+            else None
+        ),
+        extras=extras,
+    )
+
+
+def run(
+    *,
+    iterations: int,
+    isolate: bool,
+    songs: int = 1500,
+    filter: Optional[str] = None,
+) -> list[BenchmarkResult]:
+    cases = [c for c in CASES if filter is None or filter in c]
+
+    if not isolate:
+        return [run_case(case, iterations, songs) for case in cases]
+
+    results = []
+    for case in cases:
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            results.append(executor.submit(run_case, case, iterations, songs).result())
+
+    return results
@@ -4,6 +4,7 @@ import functools
 import logging
 import logging.handlers
 import sys
+from collections import Counter
 from pathlib import Path
 from time import time
 from typing import TYPE_CHECKING, Optional
@@ -16,12 +17,20 @@ from rapidfuzz import fuzz
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+from chunithm_net.breaker import CircuitBreaker
+from chunithm_net.cache import CACHEABLE_ENDPOINTS, ResponseCache
+from chunithm_net.parser_pool import ParserPool
+from chunithm_net.transport import SharedTransport
 from cogs import COG_LIST
 from database.models import Prefix
 from utils.config import config
 from utils.evtloop import get_event_loop
 from utils.help import HelpCommand
 from utils.logging import QueueListenerHandler, console_handler, logger, setup_handler
+from utils.loop_watchdog import LoopWatchdog, Stall, running_command
+from utils.metrics import BotMetrics
+from utils.render_pool import RenderPool
+from utils.rendering import init_worker
 from web import init_app
 
 if TYPE_CHECKING:
@@ -40,6 +49,17 @@ class ChuniBot(commands.Bot):
 
     launch_time: float
     app: Optional["Application"] = None
+    parser_pool: Optional[ParserPool] = None
+    chuninet_transport: SharedTransport
+    chuninet_cache: ResponseCache
+    render_pool: RenderPool
+    # Only collected if served, see `[web] metrics`.
+    metrics: Optional[BotMetrics] = None
+    loop_watchdog: LoopWatchdog
+
+    # key: user discord ID
+    # value: how many times their CHUNITHM-NET session had to be re-established
+    chuninet_reauthentications: Counter[int]
 
     # Prefix cache
     prefixes: dict[int, str]
@@ -52,6 +72,10 @@ class ChuniBot(commands.Bot):
         self.dev = config.dangerous.dev
         self.prefixes = {}
         self.sessions = {}
+        self.chuninet_reauthentications = Counter()
+        self.loop_watchdog = LoopWatchdog(
+            threshold=config.bot.loop_stall_threshold, on_stall=_log_stall
+        )
 
         super().__init__(*args, **kwargs)
 
@@ -60,6 +84,13 @@ class ChuniBot(commands.Bot):
         return await super().start(*args, **kwargs)
 
     async def setup_hook(self) -> None:
+        if config.web.enable and config.web.metrics:
+            self.metrics = BotMetrics()
+            self.metrics.add_collector("bot", self._collect_metrics)
+            self.loop_watchdog.on_lag = self.metrics.event_loop_lag.observe
+
+        self.loop_watchdog.start()
+
         # Database setup
         connection_string = config.bot.db_connection_string
         self.engine = create_async_engine(connection_string)
@@ -75,6 +106,9 @@ class ChuniBot(commands.Bot):
 
         sqlalchemy.event.listen(self.engine.sync_engine, "connect", setup_database)
 
+        if self.metrics is not None:
+            self.metrics.instrument_engine(self.engine)
+
         # Load guild prefixes
         async with self.begin_db_session() as session:
             prefixes = (await session.execute(select(Prefix))).scalars()
@@ -82,6 +116,46 @@ class ChuniBot(commands.Bot):
         self.prefixes = {prefix.guild_id: prefix.prefix for prefix in prefixes}
         logger.info(f"Loaded {len(self.prefixes)} guild prefixes")
 
+        self.chuninet_transport = SharedTransport(
+            max_connections=config.chunithm_net.max_connections,
+            max_keepalive_connections=config.chunithm_net.max_keepalive_connections,
+            keepalive_expiry=config.chunithm_net.keepalive_expiry,
+            http2=config.chunithm_net.http2,
+            breaker=CircuitBreaker(
+                failure_threshold=config.chunithm_net.breaker_failure_threshold,
+                cooldown=config.chunithm_net.breaker_cooldown,
+                maintenance_cooldown=config.chunithm_net.breaker_maintenance_cooldown,
+            ),
+            on_response=(
+                self.metrics.observe_chunithm_net_response
+                if self.metrics is not None
+                else None
+            ),
+        )
+
+        self.chuninet_cache = ResponseCache(
+            {
+                endpoint: config.chunithm_net.cache_ttl(endpoint)
+                for endpoint in CACHEABLE_ENDPOINTS
+            },
+            max_entries=config.chunithm_net.cache_max_entries,
+            max_size=config.chunithm_net.cache_max_size,
+        )
+
+        if (pool_kind := config.chunithm_net.parser_pool) is not None:
+            self.parser_pool = ParserPool(
+                pool_kind,
+                max_workers=config.chunithm_net.parser_pool_workers,
+                max_queue_size=config.chunithm_net.parser_pool_queue_size,
+            )
+            logger.info(f"Parsing CHUNITHM-NET responses in a {pool_kind} pool")
+
+        self.render_pool = RenderPool(
+            config.render.pool_workers,
+            max_queue_size=config.render.pool_queue_size,
+            initializer=init_worker,
+        )
+
         # Setup login web server (if enabled)
         if config.web.enable:
             self.app = init_app(
@@ -90,6 +164,8 @@ class ChuniBot(commands.Bot):
                 base_url=config.web.base_url,
                 kamaitachi_client_id=config.credentials.kamaitachi_client_id,
                 kamaitachi_client_secret=config.credentials.kamaitachi_client_secret,
+                metrics=self.metrics,
+                metrics_token=config.web.metrics_token,
             )
             _ = asyncio.ensure_future(
                 web._run_app(
@@ -116,7 +192,24 @@ class ChuniBot(commands.Bot):
                     f"{cog} raised an error: {e.original.__class__.__name__}: {e.original}"
                 )
 
+    async def invoke(self, ctx: commands.Context) -> None:
+        if ctx.command is None:
+            return await super().invoke(ctx)
+
+        with running_command(
+            f"{ctx.prefix}{ctx.command.qualified_name} by {ctx.author} ({ctx.author.id})"
+        ):
+            return await super().invoke(ctx)
+
+    def _collect_metrics(self) -> None:
+        assert self.metrics is not None
+
+        stats = self.chuninet_cache.stats
+        self.metrics.observe_cache("chunithm_net", stats.hits, stats.misses)
+
     async def close(self) -> None:
+        self.loop_watchdog.stop()
+
         if self.app is not None:
             await self.app.shutdown()
             await self.app.cleanup()
@@ -124,9 +217,30 @@ class ChuniBot(commands.Bot):
         if hasattr(self, "engine"):
             await self.engine.dispose()
 
+        if hasattr(self, "chuninet_transport"):
+            await self.chuninet_transport.close()
+
+        if self.parser_pool is not None:
+            self.parser_pool.shutdown(wait=False)
+
+        if hasattr(self, "render_pool"):
+            self.render_pool.shutdown(wait=False)
+
         return await super().close()
 
 
+def _log_stall(stall: Stall) -> None:
+    # Called from the watchdog thread while the loop is blocked. The log queue
+    # is thread-safe, and written out by its own thread.
+    logger.warning(
+        "Event loop blocked for over %.2fs in task %s, running %s:\n%s",
+        stall.duration,
+        stall.task or "unknown",
+        stall.command or "no command",
+        "".join(stall.stack).rstrip(),
+    )
+
+
 def guild_specific_prefix(default: str):
     async def inner(bot: ChuniBot, msg: discord.Message) -> list[str]:
         when_mentioned = commands.when_mentioned(bot, msg)
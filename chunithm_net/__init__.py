@@ -1,12 +1,18 @@
+import asyncio
 import dataclasses
+import time
+from datetime import datetime
 from http.cookiejar import CookieJar
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Optional
 
 import httpx
 from bs4 import BeautifulSoup
 
 from ._bs4 import BS4_FEATURE
 from ._httpx_hooks import raise_on_chunithm_net_error, raise_on_scheduled_maintenance
+from ._parsing import ParserBackend, load_parser
+from ._streaming import RecordStream, StreamedPage
+from .cache import MISSING
 from .consts import _KEY_DETAILED_PARAMS
 from .exceptions import (
     AlreadyAddedAsFriend,
@@ -16,19 +22,15 @@ from .exceptions import (
 )
 from .models.enums import Difficulty, Genres, Rank
 from .models.record import MusicRecord, RecentRecord, Record
-from .parser import (
-    parse_basic_recent_record,
-    parse_detailed_recent_record,
-    parse_music_for_rating,
-    parse_music_record,
-    parse_player_card_and_avatar,
-    parse_player_data,
-)
 
 if TYPE_CHECKING:
     from chunithm_net.models.player_data import PlayerData
 
-__all__ = ["ChuniNet"]
+    from .cache import UserResponseCache
+    from .parser_pool import ParserPool
+    from .transport import SharedTransport
+
+__all__ = ["ChuniNet", "ParserBackend"]
 
 _AUTHENTICATION_URL = httpx.URL(
     "https://lng-tgk-aime-gw.am-all.net/common_auth/login?site_id=chuniex&redirect_url=https://chunithm-net-eng.com/mobile/&back_url=https://chunithm.sega.com/"
@@ -37,7 +39,62 @@ _BASE_URL = httpx.URL("https://chunithm-net-eng.com")
 
 
 class ChuniNet:
-    def __init__(self, cookies: CookieJar) -> None:
+    def __init__(
+        self,
+        cookies: CookieJar,
+        *,
+        parser: ParserBackend = "bs4",
+        pool: Optional["ParserPool"] = None,
+        transport: Optional["SharedTransport"] = None,
+        cache: Optional["UserResponseCache"] = None,
+        on_parse: Optional[Callable[[str, float], None]] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        cookies: CookieJar
+            Cookie jar containing at least the `clal` cookie for authentication.
+        parser: ParserBackend
+            Which HTML parser backend to use. `"bs4"` uses BeautifulSoup with CSS
+            selectors, `"lxml"` walks an lxml tree with precompiled XPath
+            expressions, which is considerably faster but requires `lxml`.
+        pool: Optional[ParserPool]
+            If set, responses are decoded and parsed in this pool instead of on
+            the event loop. The pool can be shared between clients.
+        transport: Optional[SharedTransport]
+            Connection pool to send requests through. If not set, the client
+            opens its own connections, which are closed along with the client.
+        cache: Optional[UserResponseCache]
+            Cache for this user's best30, recent10, player_data, music_record and
+            music_record_by_folder responses. Invalidated whenever
+            `authenticate()` or `player_data()` sees a newer last play date.
+            Before the first cached response is served, the home page is
+            fetched to check the last play date, unless one of those two
+            already did.
+        on_parse: Optional[Callable[[str, float], None]]
+            Called with the parser's name and the time taken every time a page
+            is parsed. With a pool, this includes waiting for a worker. For
+            pages parsed while they download, only time spent parsing counts.
+        """
+        # Requests that find the session expired wait on this lock, so that only
+        # one of them logs in again and the rest retry with the new session.
+        self._reauth_lock = asyncio.Lock()
+        self._session_generation = 0
+        self._token_invalid = False
+        # How many times the session was re-established.
+        self.reauthentications = 0
+
+        self._parser_backend = parser
+        self._parser = load_parser(parser)
+        self._pool = pool
+        self._cache = cache
+        # Whether this client has seen the user's last play date, so that the
+        # cache is known to be fresh.
+        self._cache_checked = False
+        self._cache_check_lock = asyncio.Lock()
+        # Responses this client fetched itself, which are fresh regardless.
+        self._fetched_keys: set[tuple] = set()
+        self._on_parse = on_parse
         self.session = httpx.AsyncClient(
             cookies=cookies,
             event_hooks={
@@ -48,7 +105,7 @@ class ChuniNet:
             },
             timeout=httpx.Timeout(timeout=60.0),
             follow_redirects=True,
-            transport=httpx.AsyncHTTPTransport(retries=5),
+            transport=transport or httpx.AsyncHTTPTransport(retries=5),
         )
 
     async def __aenter__(self):
@@ -61,20 +118,38 @@ class ChuniNet:
         await self.session.aclose()
 
     async def authenticate(self) -> "PlayerData":
-        soup = await self._request_soup("GET", "/mobile/home/")
+        player_data = await self._request_parsed(
+            "parse_player_card_and_avatar", "GET", "/mobile/home/"
+        )
+        self._observe_last_play_date(player_data.last_play_date)
+
+        return player_data
 
-        return parse_player_card_and_avatar(soup)
+    async def player_data(self) -> "PlayerData":
+        if (cached := await self._cache_get(("player_data",))) is not MISSING:
+            return cached
 
-    async def player_data(self):
-        soup = await self._request_soup("GET", "/mobile/home/playerData")
+        player_data = await self._request_parsed(
+            "parse_player_data", "GET", "/mobile/home/playerData"
+        )
+        self._observe_last_play_date(player_data.last_play_date)
+
+        self._cache_put(("player_data",), player_data)
 
-        return parse_player_data(soup)
+        return player_data
 
     async def recent_record(self) -> list[RecentRecord]:
-        soup = await self._request_soup("GET", "/mobile/record/playlog")
-        web_records = soup.select(".frame02.w400")
+        return await self._request_parsed(
+            "parse_recent_records", "GET", "/mobile/record/playlog"
+        )
 
-        return [parse_basic_recent_record(record) for record in web_records]
+    async def iter_recent_record(self) -> AsyncIterator[RecentRecord]:
+        """Same as `recent_record()`, but yields every play as soon as it has
+        been received, newest first."""
+        async for record in self._request_streamed(
+            "recent_records", "GET", "/mobile/record/playlog"
+        ):
+            yield record
 
     async def detailed_recent_record(self, recent_record: RecentRecord | int):
         if isinstance(recent_record, int):
@@ -85,54 +160,70 @@ class ChuniNet:
         else:
             params = dataclasses.asdict(recent_record.extras[_KEY_DETAILED_PARAMS])
 
-        soup = await self._request_soup(
+        return await self._request_parsed(
+            "parse_detailed_recent_record",
             "POST",
             "/mobile/record/playlog/sendPlaylogDetail/",
             data=params,
         )
 
-        return parse_detailed_recent_record(soup)
-
     async def music_record(self, idx: int) -> list[MusicRecord]:
+        if (cached := await self._cache_get(("music_record", idx))) is not MISSING:
+            return cached
+
         if idx >= 8000:
-            return await self._worlds_end_music_record(idx)
+            records = await self._worlds_end_music_record(idx)
+        else:
+            records = await self._request_parsed(
+                "parse_music_record",
+                "POST",
+                "/mobile/record/musicGenre/sendMusicDetail/",
+                data={
+                    "idx": idx,
+                    "token": self._token,
+                },
+                parser_args=(idx,),
+            )
 
-        soup = await self._request_soup(
-            "POST",
-            "/mobile/record/musicGenre/sendMusicDetail/",
-            data={
-                "idx": idx,
-                "token": self._token,
-            },
-        )
+        self._cache_put(("music_record", idx), records)
 
-        return parse_music_record(soup, idx)
+        return records
 
     async def _worlds_end_music_record(self, idx: int) -> list[MusicRecord]:
-        soup = await self._request_soup(
+        return await self._request_parsed(
+            "parse_music_record",
             "POST",
             "/mobile/record/worldsEndList/sendWorldsEndDetail/",
             data={
                 "idx": idx,
                 "token": self._token,
             },
+            parser_args=(idx,),
         )
 
-        return parse_music_record(soup, idx)
-
     async def best30(self) -> list[Record]:
-        soup = await self._request_soup(
-            "GET", "/mobile/home/playerData/ratingDetailBest/"
+        if (cached := await self._cache_get(("best30",))) is not MISSING:
+            return cached
+
+        records = await self._request_parsed(
+            "parse_music_for_rating", "GET", "/mobile/home/playerData/ratingDetailBest/"
         )
+        self._cache_put(("best30",), records)
 
-        return parse_music_for_rating(soup)
+        return records
 
     async def recent10(self) -> list[Record]:
-        soup = await self._request_soup(
-            "GET", "/mobile/home/playerData/ratingDetailRecent/"
+        if (cached := await self._cache_get(("recent10",))) is not MISSING:
+            return cached
+
+        records = await self._request_parsed(
+            "parse_music_for_rating",
+            "GET",
+            "/mobile/home/playerData/ratingDetailRecent/",
         )
+        self._cache_put(("recent10",), records)
 
-        return parse_music_for_rating(soup)
+        return records
 
     async def music_record_by_folder(
         self,
@@ -174,37 +265,97 @@ class ChuniNet:
             When genre/rank is specified but difficulty is not set, or when no
             criteria is provided.
         """
+        cache_key = ("music_record_by_folder", level, genre, rank, difficulty)
+        if (cached := await self._cache_get(cache_key)) is not MISSING:
+            return cached
+
+        method, path, data = self._folder_request(
+            level=level, genre=genre, rank=rank, difficulty=difficulty
+        )
+        resp = await self._request(method, path, data=data)
+
+        records = await self._parse_response(resp, "parse_music_for_rating")
+        self._cache_put(cache_key, records)
+
+        return records
+
+    async def iter_music_record_by_folder(
+        self,
+        *,
+        level: Optional[str] = None,
+        genre: Optional[Genres] = None,
+        rank: Optional[Rank] = None,
+        difficulty: Optional[Difficulty] = None,
+    ) -> AsyncIterator[Record]:
+        """Same as `music_record_by_folder()`, but yields every record as soon as
+        it has been received.
+
+        Records are parsed on the event loop a few at a time while the page is
+        downloading, instead of in the parser pool. The full list is cached
+        once the whole page has been read.
+        """
+        cache_key = ("music_record_by_folder", level, genre, rank, difficulty)
+        if (cached := await self._cache_get(cache_key)) is not MISSING:
+            for record in cached:
+                yield record
+            return
+
+        method, path, data = self._folder_request(
+            level=level, genre=genre, rank=rank, difficulty=difficulty
+        )
+
+        records = []
+        async for record in self._request_streamed(
+            "music_for_rating", method, path, data=data
+        ):
+            records.append(record)
+            yield record
+
+        self._cache_put(cache_key, records)
+
+    def _folder_request(
+        self,
+        *,
+        level: Optional[str],
+        genre: Optional[Genres],
+        rank: Optional[Rank],
+        difficulty: Optional[Difficulty],
+    ) -> tuple[str, str, Optional[dict[str, str]]]:
+        """The method, path and form data of the page listing a folder."""
         if difficulty == Difficulty.WORLDS_END:
-            soup = await self._request_soup("GET", "/mobile/record/worldsEndList")
-        elif level is not None:
+            return "GET", "/mobile/record/worldsEndList", None
+
+        if level is not None:
             plus_level = level[-1] == "+"
             level_num = int(level[:-1] if plus_level else level)
             level_value = (
                 level_num - 1 + max(0, level_num - 7) + (1 if plus_level else 0)
             )
 
-            soup = await self._request_soup(
+            return (
                 "POST",
                 "/mobile/record/musicLevel/sendSearch/",
-                data={
+                {
                     "level": str(level_value),
                     "token": self._token,
                 },
             )
-        elif genre is not None:
+
+        if genre is not None:
             if difficulty is None:
                 msg = "Difficulty cannot be None when genre is specified"
                 raise ValueError(msg)
 
-            soup = await self._request_soup(
+            return (
                 "POST",
                 f"/mobile/record/musicGenre/send{str(difficulty).capitalize()}",
-                data={
+                {
                     "genre": genre.value,
                     "token": self._token,
                 },
             )
-        elif rank is not None:
+
+        if rank is not None:
             if difficulty is None:
                 msg = "Difficulty cannot be None when genre is specified"
                 raise ValueError(msg)
@@ -213,28 +364,27 @@ class ChuniNet:
             if value < Rank.S.value:
                 value = 7
 
-            soup = await self._request_soup(
+            return (
                 "POST",
                 f"/mobile/record/musicRank/send{str(difficulty).capitalize()}",
-                data={
+                {
                     "rank": str(rank.value),
                     "token": self._token,
                 },
             )
-        elif difficulty is not None:
-            soup = await self._request_soup(
+
+        if difficulty is not None:
+            return (
                 "POST",
                 f"/mobile/record/musicGenre/send{str(difficulty).capitalize()}",
-                data={
+                {
                     "genre": "99",
                     "token": self._token,
                 },
             )
-        else:
-            msg = "No search criteria specified"
-            raise ValueError(msg)
 
-        return parse_music_for_rating(soup)
+        msg = "No search criteria specified"
+        raise ValueError(msg)
 
     async def change_player_name(self, new_name: str) -> bool:
         resp = await self._request(
@@ -252,6 +402,9 @@ class ChuniNet:
         )
 
         if resp.url.path == "/mobile/home/userOption/":
+            if self._cache is not None:
+                self._cache.invalidate()
+
             return True
 
         text = "".join([part async for part in resp.aiter_text()])
@@ -265,6 +418,9 @@ class ChuniNet:
         raise ValueError(msg)
 
     async def logout(self) -> bool:
+        if self._cache is not None:
+            self._cache.invalidate()
+
         resp = await self._request("GET", "mobile/home/userOption/logout/")
         return resp.url.host == _AUTHENTICATION_URL.host
 
@@ -296,6 +452,34 @@ class ChuniNet:
             },
         )
 
+    async def _cache_get(self, key: tuple) -> Any:
+        if self._cache is None:
+            return MISSING
+
+        # Entries may be from before the user's last credit. Misses are fetched
+        # anyway, so only hits need the home page checked first.
+        if (
+            not self._cache_checked
+            and key not in self._fetched_keys
+            and self._cache.has(key)
+        ):
+            async with self._cache_check_lock:
+                if not self._cache_checked:
+                    await self.authenticate()
+
+        return self._cache.get(key)
+
+    def _observe_last_play_date(self, last_play_date: Optional[datetime]) -> None:
+        self._cache_checked = True
+
+        if self._cache is not None:
+            self._cache.observe_last_play_date(last_play_date)
+
+    def _cache_put(self, key: tuple, value: Any) -> None:
+        if self._cache is not None:
+            self._fetched_keys.add(key)
+            self._cache.put(key, value)
+
     @property
     def _token(self):
         return self.session.cookies.get("_t", domain=_BASE_URL.host)
@@ -311,11 +495,88 @@ class ChuniNet:
 
         return BeautifulSoup(text, BS4_FEATURE)
 
-    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+    async def _request_parsed(
+        self,
+        parser_name: str,
+        method: str,
+        path: str,
+        *,
+        parser_args: tuple = (),
+        **kwargs,
+    ) -> Any:
+        resp = await self._request(method, path, **kwargs)
+
+        return await self._parse_response(resp, parser_name, parser_args)
+
+    async def _request_streamed(
+        self, page: StreamedPage, method: str, path: str, **kwargs
+    ) -> AsyncIterator[Any]:
+        resp = await self._request(method, path, stream=True, **kwargs)
+        stream = RecordStream(page)
+        elapsed = 0.0
+
+        try:
+            async for chunk in resp.aiter_text():
+                started = time.perf_counter()
+                records = stream.feed(chunk)
+                elapsed += time.perf_counter() - started
+
+                for record in records:
+                    yield record
+
+            started = time.perf_counter()
+            records = stream.close()
+            elapsed += time.perf_counter() - started
+
+            if self._on_parse is not None:
+                self._on_parse(f"parse_{page}", elapsed)
+
+            for record in records:
+                yield record
+        finally:
+            await resp.aclose()
+
+    async def _parse_response(
+        self, resp: httpx.Response, parser_name: str, parser_args: tuple = ()
+    ) -> Any:
+        """Build a document from the response with the configured parser backend
+        and run `parser_name` over it, in the parser pool if there is one."""
+        if self._pool is not None:
+            content = await resp.aread()
+            started = time.perf_counter()
+            result = await self._pool.parse(
+                self._parser_backend,
+                parser_name,
+                content,
+                resp.encoding,
+                parser_args,
+            )
+        else:
+            text = "".join([part async for part in resp.aiter_text()])
+            started = time.perf_counter()
+            doc = self._parser.document_fromstring(text)
+            result = getattr(self._parser, parser_name)(doc, *parser_args)
+
+        if self._on_parse is not None:
+            self._on_parse(parser_name, time.perf_counter() - started)
+
+        return result
+
+    async def _request(
+        self, method: str, path: str, *, stream: bool = False, **kwargs
+    ) -> httpx.Response:
+        """Sends a request, logging in again if the session expired.
+
+        With `stream`, the body is not read yet, and the caller has to close
+        the response.
+        """
         url = _BASE_URL.join(path)
+        generation = self._session_generation
 
         try:
-            response = await self.session.request(method, url, **kwargs)
+            response = await self.session.send(
+                self.session.build_request(method, url, **kwargs), stream=stream
+            )
 
             if response.url.path == "/mobile/":
                 await response.aclose()
@@ -330,14 +591,40 @@ class ChuniNet:
         else:
             return response
 
-        auth_response = await self.session.get(_AUTHENTICATION_URL)
+        auth_response = await self._reauthenticate(generation)
+
+        if auth_response is not None:
+            if str(url) == str(auth_response.url):
+                return auth_response
 
-        if auth_response.url.host == _AUTHENTICATION_URL.host:
             await auth_response.aclose()
-            raise InvalidTokenException
 
-        if str(url) == str(auth_response.url):
-            return auth_response
+        return await self.session.send(
+            self.session.build_request(method, url, **kwargs), stream=stream
+        )
+
+    async def _reauthenticate(self, generation: int) -> Optional[httpx.Response]:
+        """Logs in again, unless another request already did so after the session
+        `generation` expired.
+
+        Returns the response of the login, or None if it was done by another
+        request.
+        """
+        async with self._reauth_lock:
+            if self._token_invalid:
+                raise InvalidTokenException
+
+            if self._session_generation != generation:
+                return None
+
+            auth_response = await self.session.get(_AUTHENTICATION_URL)
 
-        await auth_response.aclose()
-        return await self.session.request(method, url, **kwargs)
+            if auth_response.url.host == _AUTHENTICATION_URL.host:
+                await auth_response.aclose()
+                self._token_invalid = True
+                raise InvalidTokenException
+
+            self._session_generation += 1
+            self.reauthentications += 1
+
+            return auth_response
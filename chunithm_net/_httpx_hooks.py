@@ -5,6 +5,7 @@ from bs4 import BeautifulSoup
 
 from ._bs4 import BS4_FEATURE
 from .exceptions import ChuniNetError, MaintenanceException
+from .parser import parse_error_page
 
 
 async def raise_on_chunithm_net_error(response: httpx.Response):
@@ -15,10 +16,7 @@ async def raise_on_chunithm_net_error(response: httpx.Response):
     async for chunk in response.aiter_text():
         html += chunk
 
-    dom = BeautifulSoup(html, BS4_FEATURE)
-    error_blocks = dom.select(".block.text_l .font_small")
-    code = int(error_blocks[0].text.split(": ", 1)[1])
-    description = error_blocks[1].text if len(error_blocks) > 1 else ""
+    code, description = parse_error_page(BeautifulSoup(html, BS4_FEATURE))
 
     raise ChuniNetError(code, description)
 
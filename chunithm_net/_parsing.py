@@ -0,0 +1,35 @@
+from typing import TYPE_CHECKING, Any, Literal, Optional
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+ParserBackend = Literal["bs4", "lxml"]
+
+
+def load_parser(backend: ParserBackend) -> "ModuleType":
+    if backend == "lxml":
+        from . import parser_lxml
+
+        return parser_lxml
+
+    from . import parser
+
+    return parser
+
+
+def parse_content(
+    backend: ParserBackend,
+    parser_name: str,
+    content: bytes,
+    encoding: Optional[str],
+    args: tuple = (),
+) -> Any:
+    """Decode a response body, build a document and run `parser_name` over it.
+
+    This is a plain module-level function taking and returning picklable values,
+    so it can be submitted to a process pool.
+    """
+    parser = load_parser(backend)
+    text = content.decode(encoding or "utf-8", errors="replace")
+
+    return getattr(parser, parser_name)(parser.document_fromstring(text), *args)
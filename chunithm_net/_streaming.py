@@ -0,0 +1,86 @@
+import importlib.util
+from typing import Any, Callable, Literal, Optional
+
+StreamedPage = Literal["recent_records", "music_for_rating"]
+
+# Which element closes each record on a page, and how to parse it.
+_BLOCKS: dict[StreamedPage, tuple[str, str]] = {
+    "recent_records": ("div", "parse_recent_record_block"),
+    "music_for_rating": ("form", "parse_rating_form"),
+}
+
+
+class RecordStream:
+    def __init__(self, page: StreamedPage) -> None:
+        """Parses a page of records while it is being downloaded.
+
+        Text is fed in as it arrives, and every record is returned as soon as
+        the element holding it is closed. Finished elements are then dropped,
+        so the whole page is never held in memory at once.
+
+        Incremental parsing needs `lxml`. Without it, the text is collected and
+        parsed with BeautifulSoup when the stream is closed.
+
+        Parameters
+        ----------
+        page: StreamedPage
+            What kind of page is parsed. `"recent_records"` is the playlog,
+            `"music_for_rating"` is any song list, like best30 or a folder.
+        """
+        self.page = page
+
+        self._parser: Any = None
+        self._parse_block: Optional[Callable[[Any], Any]] = None
+        self._chunks: list[str] = []
+
+        if importlib.util.find_spec("lxml") is not None:
+            from lxml import etree
+
+            from . import parser_lxml
+
+            tag, parser_name = _BLOCKS[page]
+            self._parser = etree.HTMLPullParser(events=("end",), tag=tag)
+            self._parse_block = getattr(parser_lxml, parser_name)
+
+    def feed(self, text: str) -> list[Any]:
+        """Feeds the next piece of the page. Returns the records completed by
+        it."""
+        if self._parser is None:
+            self._chunks.append(text)
+            return []
+
+        self._parser.feed(text)
+
+        return self._read_events()
+
+    def close(self) -> list[Any]:
+        """Ends the page. Returns the remaining records."""
+        if self._parser is None:
+            from . import parser
+
+            doc = parser.document_fromstring("".join(self._chunks))
+            self._chunks.clear()
+
+            return getattr(parser, f"parse_{self.page}")(doc)
+
+        self._parser.close()
+
+        return self._read_events()
+
+    def _read_events(self) -> list[Any]:
+        assert self._parse_block is not None
+
+        records = []
+        for _, el in self._parser.read_events():
+            if (record := self._parse_block(el)) is None:
+                continue
+
+            records.append(record)
+
+            # Everything before the record is done with, and no later record
+            # can be inside it.
+            el.clear(keep_tail=True)
+            while (previous := el.getprevious()) is not None:
+                el.getparent().remove(previous)
+
+        return records
@@ -0,0 +1,149 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import time as dt_time
+from typing import Callable, Literal, Optional
+
+from zoneinfo import ZoneInfo
+
+from .exceptions import MaintenanceException
+
+__all__ = ["BreakerStats", "CircuitBreaker", "in_scheduled_maintenance"]
+
+_JST = ZoneInfo("Asia/Tokyo")
+
+# CHUNITHM-NET goes down for maintenance every day during this window.
+MAINTENANCE_START = dt_time(2, 0)
+MAINTENANCE_END = dt_time(7, 0)
+
+BreakerState = Literal["closed", "open", "half_open"]
+
+
+def in_scheduled_maintenance(now: datetime) -> bool:
+    """Whether `now` falls in CHUNITHM-NET's daily maintenance window."""
+    return MAINTENANCE_START <= now.astimezone(_JST).time() < MAINTENANCE_END
+
+
+@dataclass
+class BreakerStats:
+    # Requests turned away without being sent.
+    rejected: int = 0
+    # Times the breaker opened, including failed probes.
+    opened: int = 0
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        maintenance_cooldown: float = 120.0,
+        clock: Callable[[], float] = time.monotonic,
+        now: Optional[Callable[[], datetime]] = None,
+    ) -> None:
+        """Stops sending requests to CHUNITHM-NET while it is down.
+
+        The breaker opens when CHUNITHM-NET reports maintenance, or after
+        `failure_threshold` timeouts, connection errors or 5xx responses in a
+        row. While open, requests fail right away with `MaintenanceException`.
+        Once `cooldown` seconds have passed, a single request is let through as
+        a probe: if it succeeds the breaker closes, otherwise it stays open for
+        another cooldown.
+
+        During the daily maintenance window, the first failure opens the breaker
+        and probes are spaced `maintenance_cooldown` seconds apart.
+
+        Parameters
+        ----------
+        failure_threshold: int
+            Number of consecutive failures that open the breaker.
+        cooldown: float
+            Time between probes while open, in seconds.
+        maintenance_cooldown: float
+            Time between probes while open during scheduled maintenance, in
+            seconds.
+        clock: Callable[[], float]
+            Monotonic clock, in seconds.
+        now: Optional[Callable[[], datetime]]
+            Current wall-clock time, used to tell whether scheduled maintenance
+            is ongoing.
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.maintenance_cooldown = maintenance_cooldown
+        self.stats = BreakerStats()
+
+        self._clock = clock
+        self._now = now or (lambda: datetime.now(_JST))
+
+        self._state: BreakerState = "closed"
+        self._failures = 0
+        self._retry_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> BreakerState:
+        return self._state
+
+    def acquire(self) -> None:
+        """Call before sending a request. Raises `MaintenanceException` if the
+        request should not be sent.
+
+        Every successful call must be followed by one of `record_success()`,
+        `record_failure()`, `record_maintenance()` or `release()`.
+        """
+        if self._state == "closed":
+            return
+
+        if self._state == "open" and self._clock() >= self._retry_at:
+            self._state = "half_open"
+
+        if self._state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+
+        self.stats.rejected += 1
+        raise MaintenanceException
+
+    def record_success(self) -> None:
+        self._state = "closed"
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """The request timed out, could not connect or got a 5xx response."""
+        self._failures += 1
+
+        if (
+            self._state != "closed"
+            or self._failures >= self.failure_threshold
+            or in_scheduled_maintenance(self._now())
+        ):
+            self._open()
+
+    def record_maintenance(self) -> None:
+        """CHUNITHM-NET said it is under maintenance."""
+        self._failures += 1
+        self._open()
+
+    def release(self) -> None:
+        """The request ended without saying anything about CHUNITHM-NET's
+        health, e.g. because it was cancelled."""
+        if self._probe_in_flight:
+            # Let the next request probe instead.
+            self._probe_in_flight = False
+            self._state = "open"
+
+    def _open(self) -> None:
+        if in_scheduled_maintenance(self._now()):
+            cooldown = self.maintenance_cooldown
+        else:
+            cooldown = self.cooldown
+
+        if self._state != "open":
+            self.stats.opened += 1
+
+        self._state = "open"
+        self._retry_at = self._clock() + cooldown
+        self._probe_in_flight = False
@@ -0,0 +1,181 @@
+import pickle
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+__all__ = ["MISSING", "CacheStats", "ResponseCache", "UserResponseCache"]
+
+# Endpoints that can be cached. The first element of every cache key is one
+# of these, and TTLs are configured per endpoint.
+CACHEABLE_ENDPOINTS = (
+    "best30",
+    "recent10",
+    "player_data",
+    "music_record",
+    "music_record_by_folder",
+)
+
+MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    entries: int = 0
+    size: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0
+
+
+@dataclass
+class _Entry:
+    expires_at: float
+    data: bytes
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttls: dict[str, float],
+        *,
+        max_entries: int = 1024,
+        max_size: int = 64 * 1024 * 1024,
+    ) -> None:
+        """An LRU cache of parsed CHUNITHM-NET responses, partitioned by user.
+
+        Values are stored pickled, so every hit returns a fresh copy that the
+        caller is free to mutate, and the memory cap counts actual bytes.
+
+        Parameters
+        ----------
+        ttls: dict[str, float]
+            How long responses from each endpoint are cached, in seconds.
+            Endpoints that are missing or have a TTL of 0 are not cached.
+        max_entries: int
+            Maximum number of cached responses across all users.
+        max_size: int
+            Maximum total size of cached responses across all users, in bytes.
+        """
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.stats = CacheStats()
+
+        self._entries: OrderedDict[tuple[Hashable, tuple], _Entry] = OrderedDict()
+        self._keys_by_user: dict[Hashable, set[tuple]] = {}
+        self._last_play_dates: dict[Hashable, datetime] = {}
+
+    def for_user(self, user: Hashable) -> "UserResponseCache":
+        return UserResponseCache(self, user)
+
+    def has(self, user: Hashable, key: tuple) -> bool:
+        """Whether a value is cached, without counting a hit or a miss."""
+        entry = self._entries.get((user, key))
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def get(self, user: Hashable, key: tuple) -> Any:
+        """Returns a copy of the cached value, or `MISSING` if there is none."""
+        entry = self._entries.get((user, key))
+
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove((user, key))
+
+            if self.ttls.get(key[0], 0) > 0:
+                self.stats.misses += 1
+
+            return MISSING
+
+        self._entries.move_to_end((user, key))
+        self.stats.hits += 1
+
+        return pickle.loads(entry.data)
+
+    def put(self, user: Hashable, key: tuple, value: Any) -> None:
+        ttl = self.ttls.get(key[0], 0)
+        if ttl <= 0:
+            return
+
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_size:
+            return
+
+        if (user, key) in self._entries:
+            self._remove((user, key))
+
+        self._entries[(user, key)] = _Entry(time.monotonic() + ttl, data)
+        self._keys_by_user.setdefault(user, set()).add(key)
+        self.stats.entries += 1
+        self.stats.size += len(data)
+
+        while self.stats.entries > self.max_entries or self.stats.size > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def invalidate(self, user: Hashable) -> None:
+        keys = self._keys_by_user.get(user)
+        if not keys:
+            return
+
+        for key in list(keys):
+            self._remove((user, key))
+
+        self.stats.invalidations += 1
+
+    def observe_last_play_date(self, user: Hashable, last_play_date: datetime) -> None:
+        """Drop everything cached for a user once they have played another credit.
+
+        Entries cached before the first last play date was seen for the user
+        may be from any time, so they are dropped too.
+        """
+        previous = self._last_play_dates.get(user)
+        self._last_play_dates[user] = last_play_date
+
+        if previous is None or last_play_date > previous:
+            self.invalidate(user)
+
+    def _remove(self, entry_key: tuple[Hashable, tuple]) -> None:
+        entry = self._entries.pop(entry_key)
+        user, key = entry_key
+
+        keys = self._keys_by_user[user]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[user]
+
+        self.stats.entries -= 1
+        self.stats.size -= len(entry.data)
+
+
+class UserResponseCache:
+    """A view of a `ResponseCache` bound to a single user."""
+
+    def __init__(self, cache: ResponseCache, user: Hashable) -> None:
+        self.cache = cache
+        self.user = user
+
+    def has(self, key: tuple) -> bool:
+        return self.cache.has(self.user, key)
+
+    def get(self, key: tuple) -> Any:
+        return self.cache.get(self.user, key)
+
+    def put(self, key: tuple, value: Any) -> None:
+        self.cache.put(self.user, key, value)
+
+    def invalidate(self) -> None:
+        self.cache.invalidate(self.user)
+
+    def observe_last_play_date(self, last_play_date: Optional[datetime]) -> None:
+        if last_play_date is not None:
+            self.cache.observe_last_play_date(self.user, last_play_date)
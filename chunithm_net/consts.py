@@ -6,11 +6,11 @@ from chunithm_net.models.type_paired_dict import TypePairedDictKey
 JACKET_BASE = "https://new.chunithm-net.com/chuni-mobile/html/mobile/img"
 INTERNATIONAL_JACKET_BASE = "https://chunithm-net-eng.com/mobile/img"
 
-_KEY_DETAILED_PARAMS = TypePairedDictKey[DetailedParams]()
-KEY_SONG_ID = TypePairedDictKey[int]()
-KEY_LEVEL = TypePairedDictKey[str]()
-KEY_INTERNAL_LEVEL = TypePairedDictKey[float]()
-KEY_PLAY_RATING = TypePairedDictKey[Decimal]()
-KEY_OVERPOWER_BASE = TypePairedDictKey[Decimal]()
-KEY_OVERPOWER_MAX = TypePairedDictKey[Decimal]()
-KEY_TOTAL_COMBO = TypePairedDictKey[int]()
+_KEY_DETAILED_PARAMS = TypePairedDictKey[DetailedParams]("detailed_params")
+KEY_SONG_ID = TypePairedDictKey[int]("song_id")
+KEY_LEVEL = TypePairedDictKey[str]("level")
+KEY_INTERNAL_LEVEL = TypePairedDictKey[float]("internal_level")
+KEY_PLAY_RATING = TypePairedDictKey[Decimal]("play_rating")
+KEY_OVERPOWER_BASE = TypePairedDictKey[Decimal]("overpower_base")
+KEY_OVERPOWER_MAX = TypePairedDictKey[Decimal]("overpower_max")
+KEY_TOTAL_COMBO = TypePairedDictKey[int]("total_combo")
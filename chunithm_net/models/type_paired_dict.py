@@ -1,11 +1,34 @@
-from typing import Generic, TypeVar
+from typing import Generic, Optional, TypeVar
 
 T = TypeVar("T")
 VT = TypeVar("VT")
 
+_NAMED_KEYS: dict[str, "TypePairedDictKey"] = {}
+
+
+def _named_key(name: str) -> "TypePairedDictKey":
+    return _NAMED_KEYS[name]
+
 
 class TypePairedDictKey(Generic[T]):
-    pass
+    """
+    Keys are compared by identity. Give a key a unique name if dicts using it
+    need to be pickled (e.g. sent back from a process pool), so that it unpickles
+    to the very same key object instead of a new one.
+    """
+
+    def __init__(self, name: Optional[str] = None) -> None:
+        self.name = name
+
+        if name is not None:
+            _NAMED_KEYS[name] = self
+
+    def __reduce__(self):
+        if self.name is None:
+            msg = "Cannot pickle an unnamed TypePairedDictKey."
+            raise TypeError(msg)
+
+        return (_named_key, (self.name,))
 
 
 class TypePairedDict(dict):
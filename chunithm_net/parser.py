@@ -3,6 +3,7 @@ from typing import cast
 
 from bs4 import BeautifulSoup, Tag
 
+from ._bs4 import BS4_FEATURE
 from .consts import _KEY_DETAILED_PARAMS, KEY_SONG_ID
 from .models.enums import ClearType, ComboType, Possession, Rank, SkillClass
 from .models.player_data import (
@@ -34,6 +35,10 @@ from .utils import (
 )
 
 
+def document_fromstring(text: str) -> BeautifulSoup:
+    return BeautifulSoup(text, BS4_FEATURE)
+
+
 def parse_player_card_and_avatar(soup: BeautifulSoup):
     if (e := soup.select_one(".player_chara img")) is not None:
         character = cast(str, e["src"])
@@ -199,6 +204,12 @@ def parse_basic_recent_record(record: Tag) -> RecentRecord:
     return score
 
 
+def parse_recent_records(soup: BeautifulSoup) -> list[RecentRecord]:
+    return [
+        parse_basic_recent_record(record) for record in soup.select(".frame02.w400")
+    ]
+
+
 def parse_music_record(soup: BeautifulSoup, song_id: int) -> list[MusicRecord]:
     jacket = (
         str(elem["src"]) if (elem := soup.select_one(".play_jacket_img img")) else ""
@@ -323,3 +334,11 @@ def parse_detailed_recent_record(soup: BeautifulSoup) -> DetailedRecentRecord:
         str(soup.select_one("form input[name=idx]")["value"])
     )
     return record
+
+
+def parse_error_page(soup: BeautifulSoup) -> tuple[int, str]:
+    error_blocks = soup.select(".block.text_l .font_small")
+    code = int(error_blocks[0].text.split(": ", 1)[1])
+    description = error_blocks[1].text if len(error_blocks) > 1 else ""
+
+    return code, description
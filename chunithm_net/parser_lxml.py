@@ -0,0 +1,479 @@
+"""
+An alternative to `chunithm_net.parser` that walks an lxml tree with precompiled
+XPath expressions instead of running soupsieve CSS selectors over a BeautifulSoup
+tree.
+
+Every function here mirrors the function with the same name in
+`chunithm_net.parser` and returns identical objects, so the two can be used
+interchangeably. Requires `lxml`, which is part of the `speedup` extra.
+"""
+
+from typing import Optional
+
+from lxml import etree, html
+
+from .consts import _KEY_DETAILED_PARAMS, KEY_SONG_ID
+from .models.enums import ClearType, ComboType, Possession, Rank, SkillClass
+from .models.player_data import (
+    Currency,
+    Nameplate,
+    Overpower,
+    PlayerData,
+    Rating,
+    Team,
+    UserAvatar,
+)
+from .models.record import (
+    DetailedParams,
+    DetailedRecentRecord,
+    Judgements,
+    MusicRecord,
+    NoteType,
+    RecentRecord,
+    Record,
+    Skill,
+)
+from .utils import chuni_int, difficulty_from_imgurl, extract_last_part, parse_time
+
+HtmlElement = html.HtmlElement
+
+
+def _cls(*names: str) -> str:
+    """Builds an XPath predicate matching elements that have all of the given classes,
+    the same way the CSS selector `.name1.name2` does."""
+    return " and ".join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+        for name in names
+    )
+
+
+def _xpath(expr: str) -> etree.XPath:
+    return etree.XPath(expr, smart_strings=False)
+
+
+def document_fromstring(text: str) -> HtmlElement:
+    return html.document_fromstring(text)
+
+
+def _first(xpath: etree.XPath, el: HtmlElement) -> Optional[HtmlElement]:
+    result = xpath(el)
+    return result[0] if result else None
+
+
+def _text(el: HtmlElement) -> str:
+    """Equivalent to BeautifulSoup's `Tag.get_text()`."""
+    return "".join(_TEXT_NODES(el))
+
+
+def _text_stripped(el: HtmlElement) -> str:
+    """Equivalent to BeautifulSoup's `Tag.get_text(strip=True)`."""
+    return "".join(s for x in _TEXT_NODES(el) if (s := x.strip()))
+
+
+_TEXT_NODES = _xpath(".//text()")
+
+_RANK_IMG = _xpath(".//img[contains(@src, '_rank_')]/@src")
+_CLEAR_LAMP_IMGS = [
+    (_xpath(f".//img[contains(@src, '{needle}')]"), clear_type)
+    for needle, clear_type in [
+        ("clear", ClearType.CLEAR),
+        ("hard", ClearType.HARD),
+        ("absolutep", ClearType.ABSOLUTE_PLUS),
+        ("absolute", ClearType.ABSOLUTE),
+        ("catastrophy", ClearType.CATASTROPHY),
+    ]
+]
+_COMBO_LAMP_IMGS = [
+    (_xpath(f".//img[contains(@src, '{needle}')]"), combo_type)
+    for needle, combo_type in [
+        ("fullcombo", ComboType.FULL_COMBO),
+        ("alljusticecritical", ComboType.ALL_JUSTICE_CRITICAL),
+        ("alljustice", ComboType.ALL_JUSTICE),
+    ]
+]
+
+
+def get_rank_and_lamps(el: HtmlElement) -> tuple[Rank, ClearType, ComboType]:
+    if rank_img_url := _RANK_IMG(el):
+        rank = Rank(int(extract_last_part(rank_img_url[0])))
+    else:
+        rank = Rank.D
+
+    clear_type = next(
+        (t for xpath, t in _CLEAR_LAMP_IMGS if xpath(el)), ClearType.FAILED
+    )
+
+    # FC and AJ should override all other lamps.
+    combo_type = next((t for xpath, t in _COMBO_LAMP_IMGS if xpath(el)), ComboType.NONE)
+
+    return rank, clear_type, combo_type
+
+
+_PLAYER_CHARA_IMG_SRC = _xpath(f".//*[{_cls('player_chara')}]//img/@src")
+_PLAYER_NAME = _xpath(f".//*[{_cls('player_name_in')}]")
+_PLAYER_LV = _xpath(f".//*[{_cls('player_lv')}]")
+_PLAYER_TEAM_NAME = _xpath(f".//*[{_cls('player_team_name')}]")
+_PLAYER_HONOR_TEXT = _xpath(f".//*[{_cls('player_honor_text')}]")
+_PLAYER_HONOR_STYLE = _xpath(f"(.//*[{_cls('player_honor_short')}])[1]/@style")
+_PLAYER_RATING_DIGITS = _xpath(f".//*[{_cls('player_rating_num_block')}]//img/@src")
+_PLAYER_RATING_MAX = _xpath(f".//*[{_cls('player_rating_max')}]")
+_PLAYER_OVERPOWER = _xpath(f".//*[{_cls('player_overpower_text')}]")
+_PLAYER_LAST_PLAY_DATE = _xpath(f".//*[{_cls('player_lastplaydate_text')}]")
+_PLAYER_REBORN = _xpath(f".//*[{_cls('player_reborn')}]")
+_PLAYER_PROFILE_BOX = _xpath(f".//*[{_cls('box_playerprofile')}]")
+_PLAYER_CLASSEMBLEM_BASE = _xpath(f".//*[{_cls('player_classemblem_base')}]//img")
+_PLAYER_CLASSEMBLEM_TOP = _xpath(f".//*[{_cls('player_classemblem_top')}]//img")
+_AVATAR_GROUP = _xpath(f".//*[{_cls('avatar_group')}]")
+_AVATAR_PARTS = {
+    name: _xpath(f"(.//*[{_cls(f'avatar_{part}')}]//img)[1]/@src")
+    for name, part in [
+        ("back", "back"),
+        ("skinfoot_r", "skinfoot_r"),
+        ("skinfoot_l", "skinfoot_l"),
+        ("skin", "skin"),
+        ("wear", "wear"),
+        ("face", "face"),
+        ("face_cover", "faceCover"),
+        ("head", "head"),
+        ("hand_r", "hand_r"),
+        ("hand_l", "hand_l"),
+        ("item_r", "item_r"),
+        ("item_l", "item_l"),
+    ]
+}
+
+
+def _skill_class_from_img(el: Optional[HtmlElement]) -> Optional[SkillClass]:
+    if el is None or (src := el.get("src")) is None:
+        return None
+
+    return SkillClass(chuni_int(extract_last_part(src)))
+
+
+def parse_player_card_and_avatar(doc: HtmlElement) -> PlayerData:
+    character_src = _PLAYER_CHARA_IMG_SRC(doc)
+    character = character_src[0] if character_src else None
+
+    name = _text(_PLAYER_NAME(doc)[0])
+    lv = chuni_int(_text(_PLAYER_LV(doc)[0]))
+
+    team_name_elem = _first(_PLAYER_TEAM_NAME, doc)
+    team_name = _text(team_name_elem) if team_name_elem is not None else None
+
+    nameplate_content = _text(_PLAYER_HONOR_TEXT(doc)[0])
+    nameplate_rarity = _PLAYER_HONOR_STYLE(doc)[0].split("_")[-1].split(".")[0]
+
+    rating = float(
+        "".join(
+            "." if (digit := extract_last_part(src)) == "comma" else digit[1]
+            for src in _PLAYER_RATING_DIGITS(doc)
+        )
+    )
+    max_rating = float(_text(_PLAYER_RATING_MAX(doc)[0]))
+
+    overpower = _text(_PLAYER_OVERPOWER(doc)[0]).split(" ")
+    overpower_value = float(overpower[0])
+    overpower_progress = (
+        float(overpower[1].replace("(", "").replace(")", "").replace("%", "")) / 100
+    )
+
+    last_play_date = parse_time(_text(_PLAYER_LAST_PLAY_DATE(doc)[0]))
+
+    reborn_elem = _first(_PLAYER_REBORN, doc)
+    reborn = chuni_int(_text(reborn_elem)) if reborn_elem is not None else 0
+
+    possession_elem = _first(_PLAYER_PROFILE_BOX, doc)
+    possession = (
+        Possession.from_str(extract_last_part(style))
+        if possession_elem is not None
+        and (style := possession_elem.get("style")) is not None
+        else Possession.NONE
+    )
+
+    emblem = _skill_class_from_img(_first(_PLAYER_CLASSEMBLEM_BASE, doc))
+    medal = _skill_class_from_img(_first(_PLAYER_CLASSEMBLEM_TOP, doc))
+
+    avatar_group = _AVATAR_GROUP(doc)[0]
+    avatar = UserAvatar(
+        base="https://new.chunithm-net.com/chuni-mobile/html/mobile/images/avatar_base.png",
+        **{name: xpath(avatar_group)[0] for name, xpath in _AVATAR_PARTS.items()},
+    )
+
+    return PlayerData(
+        character=character,
+        avatar=avatar,
+        name=name,
+        lv=lv,
+        reborn=reborn,
+        possession=possession,
+        team=Team(name=team_name) if team_name else None,
+        nameplate=Nameplate(content=nameplate_content, rarity=nameplate_rarity),
+        rating=Rating(rating, max_rating),
+        overpower=Overpower(overpower_value, overpower_progress),
+        last_play_date=last_play_date,
+        emblem=emblem,
+        medal=medal,
+    )
+
+
+_USER_DATA_POINT = _xpath(
+    f".//*[{_cls('user_data_point')}]//*[{_cls('user_data_text')}]"
+)
+_USER_DATA_TOTAL_POINT = _xpath(
+    f".//*[{_cls('user_data_total_point')}]//*[{_cls('user_data_text')}]"
+)
+_USER_DATA_PLAY_COUNT = _xpath(
+    f".//*[{_cls('user_data_play_count')}]//*[{_cls('user_data_text')}]"
+)
+_USER_DATA_FRIEND_CODE = _xpath(
+    f".//*[{_cls('user_data_friend_code')}]//*[{_cls('user_data_text')}]"
+    f"//span[not({_cls('font_90')})]"
+)
+
+
+def parse_player_data(doc: HtmlElement) -> PlayerData:
+    data = parse_player_card_and_avatar(doc)
+
+    owned_currency = chuni_int(_text(_USER_DATA_POINT(doc)[0]))
+    total_currency = chuni_int(_text(_USER_DATA_TOTAL_POINT(doc)[0]))
+    data.currency = Currency(owned_currency, total_currency)
+
+    data.playcount = chuni_int(_text(_USER_DATA_PLAY_COUNT(doc)[0]))
+    data.friend_code = _text(_USER_DATA_FRIEND_CODE(doc)[0])
+
+    return data
+
+
+_FORM_IDX = _xpath(".//form//input[@name='idx']/@value")
+_FORM_TOKEN = _xpath(".//form//input[@name='token']/@value")
+_PLAY_DATE = _xpath(f".//*[{_cls('play_datalist_date')} or {_cls('box_inner01')}]")
+_PLAY_JACKET_IMG = _xpath(f".//*[{_cls('play_jacket_img')}]//img")
+_PLAY_TRACK_TEXT = _xpath(f".//*[{_cls('play_track_text')}]")
+_PLAY_TITLE = _xpath(f".//*[{_cls('play_musicdata_title')}]")
+_PLAY_SCORE_TEXT = _xpath(f".//*[{_cls('play_musicdata_score_text')}]")
+_PLAY_SCORE_IMG = _xpath(f".//*[{_cls('play_musicdata_score_img')}]")
+_PLAY_MUSICDATA_ICON = _xpath(f".//*[{_cls('play_musicdata_icon')}]")
+_PLAY_TRACK_RESULT_IMG_SRC = _xpath(f"(.//*[{_cls('play_track_result')}]//img)[1]/@src")
+
+
+def parse_basic_recent_record(record: HtmlElement) -> RecentRecord:
+    idx = int(_FORM_IDX(record)[0])
+    token = _FORM_TOKEN(record)[0]
+    detailed = DetailedParams(idx, token)
+
+    date = parse_time(_text(_PLAY_DATE(record)[0]))
+    jacket_elem = _PLAY_JACKET_IMG(record)[0]
+    if (jacket := jacket_elem.get("data-original")) is None:
+        jacket = jacket_elem.get("src")
+    track = int(_text(_PLAY_TRACK_TEXT(record)[0]).split(" ")[1])
+    title = _text(_PLAY_TITLE(record)[0])
+
+    score = int(_text(_PLAY_SCORE_TEXT(record)[0]).replace(",", ""))
+    new_record = bool(_PLAY_SCORE_IMG(record))
+
+    if (rank_elem := _first(_PLAY_MUSICDATA_ICON, record)) is not None:
+        rank, clear_lamp, combo_lamp = get_rank_and_lamps(rank_elem)
+    else:
+        rank = Rank.D
+        clear_lamp = ClearType.FAILED
+        combo_lamp = ComboType.NONE
+
+    score = RecentRecord(
+        track=track,
+        date=date,
+        title=title,
+        jacket=jacket,
+        difficulty=difficulty_from_imgurl(_PLAY_TRACK_RESULT_IMG_SRC(record)[0]),
+        score=score,
+        rank=rank,
+        clear_lamp=clear_lamp,
+        combo_lamp=combo_lamp,
+        new_record=new_record,
+    )
+    score.extras[_KEY_DETAILED_PARAMS] = detailed
+
+    return score
+
+
+_RECENT_RECORDS = _xpath(f".//*[{_cls('frame02', 'w400')}]")
+
+
+def parse_recent_records(doc: HtmlElement) -> list[RecentRecord]:
+    return [parse_basic_recent_record(record) for record in _RECENT_RECORDS(doc)]
+
+
+_IS_RECENT_RECORD = _xpath(f"self::*[{_cls('frame02', 'w400')}]")
+
+
+def parse_recent_record_block(el: HtmlElement) -> Optional[RecentRecord]:
+    """Parses a single element of the playlog, or returns None if it is not a
+    `.frame02.w400` block."""
+    if not _IS_RECENT_RECORD(el):
+        return None
+
+    return parse_basic_recent_record(el)
+
+
+_MUSIC_JACKET_SRC = _xpath(f"(.//*[{_cls('play_jacket_img')}]//img)[1]/@src")
+_MUSIC_TITLE = _xpath(
+    f".//*[{_cls('play_musicdata_title')} or {_cls('play_musicdata_worldsend_title')}]"
+)
+_MUSIC_BOXES = _xpath(f".//*[{_cls('music_box')}]")
+_MUSIC_SCORE = _xpath(f".//*[{_cls('musicdata_score_num')}]//*[{_cls('text_b')}]")
+_MUSIC_PLAY_COUNT = _xpath(
+    f".//*[{_cls('musicdata_score_num')}]//*[{_cls('text_b')}][contains(., 'times')]"
+    f" | .//*[{_cls('block_icon_text')}]//span[not(@class)]"
+)
+_MUSIC_AJC_COUNT = _xpath(f".//*[{_cls('musicdata_score_theory_num')}]")
+
+
+def parse_music_record(doc: HtmlElement, song_id: int) -> list[MusicRecord]:
+    jacket_src = _MUSIC_JACKET_SRC(doc)
+    jacket = jacket_src[0] if jacket_src else ""
+    title = (
+        _text_stripped(elem) if (elem := _first(_MUSIC_TITLE, doc)) is not None else ""
+    )
+
+    records = []
+    for block in _MUSIC_BOXES(doc):
+        if (musicdata := _first(_PLAY_MUSICDATA_ICON, block)) is not None:
+            rank, clear_lamp, combo_lamp = get_rank_and_lamps(musicdata)
+        else:
+            rank, clear_lamp, combo_lamp = Rank.D, ClearType.FAILED, ComboType.NONE
+
+        score_elem = _first(_MUSIC_SCORE, block)
+        play_count_elem = _first(_MUSIC_PLAY_COUNT, block)
+        ajc_count_elem = _first(_MUSIC_AJC_COUNT, block)
+
+        score = MusicRecord(
+            title=title,
+            jacket=jacket,
+            difficulty=difficulty_from_imgurl(" ".join(block.get("class", "").split())),
+            score=chuni_int(_text(score_elem) if score_elem is not None else "0"),
+            rank=rank,
+            clear_lamp=clear_lamp,
+            combo_lamp=combo_lamp,
+            play_count=chuni_int(
+                _text(play_count_elem).replace("times", "")
+                if play_count_elem is not None
+                else "0"
+            ),
+            ajc_count=chuni_int(_text(ajc_count_elem))
+            if ajc_count_elem is not None
+            else None,
+        )
+        score.extras[KEY_SONG_ID] = song_id
+
+        records.append(score)
+    return records
+
+
+_RATING_FORMS = _xpath(f".//form[.//*[{_cls('w388', 'musiclist_box')}]]")
+_RATING_HIGHSCORE = _xpath(
+    f".//*[{_cls('play_musicdata_highscore')}]//*[{_cls('text_b')}]"
+)
+_RATING_MUSICLIST_BOX_CLASS = _xpath(
+    f"(.//*[{_cls('w388', 'musiclist_box')}])[1]/@class"
+)
+_RATING_TITLE = _xpath(
+    f".//*[{_cls('music_title')} or {_cls('musiclist_worldsend_title')}]"
+)
+_RATING_IDX = _xpath(".//input[@name='idx']/@value")
+
+
+def parse_music_for_rating(doc: HtmlElement) -> list[Record]:
+    return [
+        record
+        for x in _RATING_FORMS(doc)
+        if (record := parse_rating_form(x)) is not None
+    ]
+
+
+def parse_rating_form(x: HtmlElement) -> Optional[Record]:
+    """Parses a single `<form>` of a song list, or returns None if it does not
+    hold a played chart."""
+    if not (box_class := _RATING_MUSICLIST_BOX_CLASS(x)):
+        return None
+
+    if (score_elem := _first(_RATING_HIGHSCORE, x)) is None:
+        return None
+
+    if (musicdata := _first(_PLAY_MUSICDATA_ICON, x)) is not None:
+        rank, clear_lamp, combo_lamp = get_rank_and_lamps(musicdata)
+    else:
+        rank, clear_lamp, combo_lamp = Rank.D, ClearType.FAILED, ComboType.NONE
+
+    score = Record(
+        title=_text(_RATING_TITLE(x)[0]),
+        difficulty=difficulty_from_imgurl(" ".join(box_class[0].split())),
+        score=chuni_int(_text(score_elem)),
+        rank=rank,
+        clear_lamp=clear_lamp,
+        combo_lamp=combo_lamp,
+    )
+    score.extras[KEY_SONG_ID] = int(_RATING_IDX(x)[0])
+
+    return score
+
+
+_DETAIL_FRAME = _xpath(f".//*[{_cls('frame01_inside')}]")
+_DETAIL_MAX_COMBO = _xpath(f".//*[{_cls('play_data_detail_maxcombo_block')}]")
+_DETAIL_JUDGEMENTS = [
+    _xpath(f".//*[{_cls(f'text_{judgement}', 'play_data_detail_judge_text')}]")
+    for judgement in ["critical", "justice", "attack", "miss"]
+]
+_DETAIL_NOTE_TYPES = [
+    _xpath(f".//*[{_cls(f'text_{note_type}', 'play_data_detail_notes_text')}]")
+    for note_type in [
+        "tap_red",
+        "hold_yellow",
+        "slide_blue",
+        "air_green",
+        "flick_skyblue",
+    ]
+]
+_DETAIL_CHARA_NAME = _xpath(f".//*[{_cls('play_data_chara_name')}]")
+_DETAIL_SKILL_NAME = _xpath(f".//*[{_cls('play_data_skill_name')}]")
+_DETAIL_SKILL_GRADE = _xpath(f".//*[{_cls('play_data_skill_grade')}]")
+_DETAIL_SKILL_RESULT = _xpath(f".//*[{_cls('play_musicdata_skilleffect_text')}]")
+
+
+def parse_detailed_recent_record(doc: HtmlElement) -> DetailedRecentRecord:
+    record = DetailedRecentRecord.from_basic(
+        parse_basic_recent_record(_DETAIL_FRAME(doc)[0])
+    )
+
+    record.max_combo = chuni_int(_text(_DETAIL_MAX_COMBO(doc)[0]))
+
+    record.judgements = Judgements(
+        *(chuni_int(_text(xpath(doc)[0])) for xpath in _DETAIL_JUDGEMENTS)
+    )
+    record.note_type = NoteType(
+        *(
+            float(_text(xpath(doc)[0]).replace("%", "")) / 100
+            for xpath in _DETAIL_NOTE_TYPES
+        )
+    )
+
+    record.character = _text(_DETAIL_CHARA_NAME(doc)[0])
+    record.skill = Skill(_text(_DETAIL_SKILL_NAME(doc)[0]), None)
+
+    if (skill_grade := _first(_DETAIL_SKILL_GRADE, doc)) is not None:
+        record.skill.grade = chuni_int(_text(skill_grade))
+
+    record.skill_result = chuni_int(
+        _text(_DETAIL_SKILL_RESULT(doc)[0]).replace("+", "")
+    )
+    record.extras[KEY_SONG_ID] = int(_FORM_IDX(doc)[0])
+    return record
+
+
+_ERROR_BLOCKS = _xpath(f".//*[{_cls('block', 'text_l')}]//*[{_cls('font_small')}]")
+
+
+def parse_error_page(doc: HtmlElement) -> tuple[int, str]:
+    error_blocks = _ERROR_BLOCKS(doc)
+    code = int(_text(error_blocks[0]).split(": ", 1)[1])
+    description = _text(error_blocks[1]) if len(error_blocks) > 1 else ""
+
+    return code, description
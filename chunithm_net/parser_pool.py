@@ -0,0 +1,133 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Literal, Optional
+
+from ._parsing import ParserBackend, parse_content
+
+__all__ = ["ParserPool", "ParserPoolStats", "PoolKind"]
+
+PoolKind = Literal["thread", "process"]
+
+
+@dataclass
+class ParserPoolStats:
+    jobs: int = 0
+    failed: int = 0
+
+    # Jobs submitted but not yet finished, including those waiting for a queue slot.
+    in_flight: int = 0
+
+    # In seconds.
+    total_queue_wait: float = 0
+    max_queue_wait: float = 0
+    total_parse_time: float = 0
+
+    @property
+    def mean_queue_wait(self) -> float:
+        return self.total_queue_wait / self.jobs if self.jobs > 0 else 0
+
+    @property
+    def mean_parse_time(self) -> float:
+        return self.total_parse_time / self.jobs if self.jobs > 0 else 0
+
+
+def _run_job(
+    backend: ParserBackend,
+    parser_name: str,
+    content: bytes,
+    encoding: Optional[str],
+    args: tuple,
+) -> tuple[float, float, Any]:
+    # time.monotonic() is system-wide, so it can be compared with the submission
+    # time recorded in the parent process.
+    started = time.monotonic()
+    result = parse_content(backend, parser_name, content, encoding, args)
+
+    return started, time.monotonic(), result
+
+
+class ParserPool:
+    def __init__(
+        self,
+        kind: PoolKind = "thread",
+        *,
+        max_workers: Optional[int] = None,
+        max_queue_size: int = 32,
+    ) -> None:
+        """Runs response decoding, tree building and parsing outside the event loop.
+
+        Parameters
+        ----------
+        kind: PoolKind
+            `"thread"` runs jobs in a thread pool. This keeps the event loop
+            responsive, but still contends for the GIL. `"process"` runs jobs in
+            worker processes, which is fully parallel at the cost of pickling
+            the response body and the parsed results.
+        max_workers: Optional[int]
+            Number of workers. Defaults to the executor's own default.
+        max_queue_size: int
+            How many jobs can wait for a worker before further callers are made
+            to wait for a slot, to avoid piling up response bodies in memory.
+        """
+        self.kind = kind
+        self.stats = ParserPoolStats()
+
+        self._executor: Executor
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix="chuninet-parser"
+            )
+
+        # Both executors store the resolved worker count here.
+        workers: int = self._executor._max_workers  # type: ignore[reportAttributeAccessIssue]
+        self._slots = asyncio.Semaphore(workers + max_queue_size)
+
+    async def parse(
+        self,
+        backend: ParserBackend,
+        parser_name: str,
+        content: bytes,
+        encoding: Optional[str],
+        args: tuple = (),
+    ) -> Any:
+        submitted = time.monotonic()
+        self.stats.in_flight += 1
+
+        try:
+            async with self._slots:
+                future = asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    _run_job,
+                    backend,
+                    parser_name,
+                    content,
+                    encoding,
+                    args,
+                )
+
+                try:
+                    started, finished, result = await future
+                except Exception:
+                    self.stats.failed += 1
+                    raise
+        finally:
+            self.stats.in_flight -= 1
+
+        queue_wait = max(0, started - submitted)
+
+        self.stats.jobs += 1
+        self.stats.total_queue_wait += queue_wait
+        self.stats.max_queue_wait = max(self.stats.max_queue_wait, queue_wait)
+        self.stats.total_parse_time += finished - started
+
+        return result
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,182 @@
+import importlib.util
+import time
+from dataclasses import dataclass
+from http.client import SERVICE_UNAVAILABLE
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    from .breaker import CircuitBreaker
+
+__all__ = ["SharedTransport", "TransportStats"]
+
+# Called with the method, path, status code, seconds until the response
+# arrived and size of the body, once the body has been read.
+ResponseHook = Callable[[str, str, int, float, int], None]
+
+
+@dataclass
+class TransportStats:
+    requests: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    http2_requests: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        return self.reused_connections / self.requests if self.requests > 0 else 0
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        *,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 30.0,
+        http2: bool = True,
+        retries: int = 5,
+        breaker: Optional["CircuitBreaker"] = None,
+        on_response: Optional[ResponseHook] = None,
+    ) -> None:
+        """A keep-alive connection pool that can be shared between many `ChuniNet`
+        clients.
+
+        Cookies live on the clients, so every client still has its own cookie
+        jar. Closing a client does not close the shared pool; call `close()`
+        once it is no longer needed.
+
+        Parameters
+        ----------
+        max_connections: Optional[int]
+            Maximum number of open connections.
+        max_keepalive_connections: Optional[int]
+            Maximum number of idle connections kept around for reuse.
+        keepalive_expiry: Optional[float]
+            How long an idle connection is kept around, in seconds.
+        http2: bool
+            Whether to negotiate HTTP/2. Only takes effect if `h2` is installed.
+        retries: int
+            Number of times to retry establishing a connection.
+        breaker: Optional[CircuitBreaker]
+            If set, requests are sent through this circuit breaker, which turns
+            them away with `MaintenanceException` while CHUNITHM-NET is down.
+        on_response: Optional[ResponseHook]
+            Called for every response once its body has been read, with the
+            method, path, status code, time taken until the response arrived
+            and the size of the body.
+        """
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.stats = TransportStats()
+        self.breaker = breaker
+        self.on_response = on_response
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=self.http2,
+            retries=retries,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        new_connection = False
+        parent_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict[str, Any]) -> None:
+            nonlocal new_connection
+
+            if event_name == "connection.connect_tcp.complete":
+                new_connection = True
+
+            if parent_trace is not None:
+                await parent_trace(event_name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        started = time.perf_counter()
+
+        if self.breaker is None:
+            response = await self._transport.handle_async_request(request)
+        else:
+            response = await self._send_through_breaker(self.breaker, request)
+
+        self.stats.requests += 1
+        if new_connection:
+            self.stats.new_connections += 1
+        else:
+            self.stats.reused_connections += 1
+        if response.extensions.get("http_version") == b"HTTP/2":
+            self.stats.http2_requests += 1
+
+        if self.on_response is not None:
+            response.stream = _MeteredStream(
+                response.stream,  # type: ignore[reportArgumentType]
+                self.on_response,
+                request.method,
+                request.url.path,
+                response.status_code,
+                time.perf_counter() - started,
+            )
+
+        return response
+
+    async def _send_through_breaker(
+        self, breaker: "CircuitBreaker", request: httpx.Request
+    ) -> httpx.Response:
+        breaker.acquire()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except (httpx.TimeoutException, httpx.NetworkError):
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        if response.status_code == SERVICE_UNAVAILABLE:
+            breaker.record_maintenance()
+        elif response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        return response
+
+    async def aclose(self) -> None:
+        # Called by every client using this transport when it is closed.
+        pass
+
+    async def close(self) -> None:
+        await self._transport.aclose()
+
+
+class _MeteredStream(httpx.AsyncByteStream):
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        hook: ResponseHook,
+        method: str,
+        path: str,
+        status_code: int,
+        elapsed: float,
+    ) -> None:
+        self._stream = stream
+        self._hook = hook
+        self._args = (method, path, status_code, elapsed)
+        self._size = 0
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._size += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._hook(*self._args, self._size)
+
+        await self._stream.aclose()
@@ -3,7 +3,6 @@ from typing import TYPE_CHECKING
 import discord
 from discord import app_commands
 from discord.ext import commands
-from rapidfuzz import fuzz, process
 
 if TYPE_CHECKING:
     from bot import ChuniBot
@@ -23,21 +22,15 @@ class AutocompletersCog(commands.Cog, name="Autocompleters"):
         if len(current) < 3:
             return []
 
-        aliases = [
-            x
-            for x in self.utils.alias_cache
-            if x.guild_id == -1
-            or (interaction.guild is None or x.guild_id == interaction.guild.id)
-        ]
-        results = process.extract(
+        # Outside of guilds, suggest aliases from every guild.
+        results = self.utils.song_index.extract(
             current,
-            [x.alias for x in aliases],
-            scorer=fuzz.QRatio,
-            processor=str.lower,
+            None if interaction.guild is None else interaction.guild.id,
+            all_guilds=interaction.guild is None,
             limit=50,
             score_cutoff=70,
         )
-        titles = {aliases[r[2]].title for r in results}
+        titles = {r.alias.title for r in results}
 
         return [app_commands.Choice(name=t, value=t) for t in titles][:25]
 
@@ -1,16 +1,19 @@
+import asyncio
 import contextlib
-import io
+import importlib.util
 from dataclasses import dataclass
+from datetime import datetime
 from http.cookiejar import LWPCookieJar
 from typing import TYPE_CHECKING, Optional, Sequence, TypeVar
+from weakref import WeakValueDictionary
 
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.ext.commands import Context
-from rapidfuzz import fuzz, process
-from sqlalchemy import select, update
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import joinedload
 
-from chunithm_net import ChuniNet
+from chunithm_net import ChuniNet, ParserBackend
 from chunithm_net.consts import (
     KEY_INTERNAL_LEVEL,
     KEY_LEVEL,
@@ -20,17 +23,28 @@ from chunithm_net.consts import (
     KEY_SONG_ID,
     KEY_TOTAL_COMBO,
 )
-from chunithm_net.models.enums import Rank
-from chunithm_net.models.record import Record
-from database.models import Alias, Cookie, Song
+from chunithm_net.models.enums import Difficulty, Genres, Rank
+from chunithm_net.models.record import MusicRecord, Record
+from database.models import Alias, Song
 from utils import get_jacket_url
-from utils.calculation.overpower import (
-    calculate_overpower_base,
-    calculate_overpower_max,
+from utils.calculation.batch import (
+    calculate_overpower_bases_decimal,
+    calculate_overpower_maxes_decimal,
+    calculate_ratings_decimal,
 )
-from utils.calculation.rating import calculate_rating
+from utils.catalog import ChartCatalog
 from utils.config import config
+from utils.cookie_store import CookieStore
 from utils.logging import logger
+from utils.score_store import (
+    filter_folder,
+    load_scores,
+    store_music_records,
+    sync_scores,
+    to_music_record,
+    to_record,
+)
+from utils.song_search import CachedAlias, SongSearchIndex
 from utils.types import MissingDetailedParams
 
 if TYPE_CHECKING:
@@ -38,27 +52,7 @@ if TYPE_CHECKING:
 
 T = TypeVar("T", bound=Record)
 
-
-class CachedAlias:
-    id: Optional[int] = None
-    alias: str
-    title: str
-    song_id: int
-    guild_id: Optional[int] = None
-
-    def __init__(
-        self,
-        id: Optional[int],
-        alias: str,
-        title: str,
-        song_id: int,
-        guild_id: Optional[int],
-    ) -> None:
-        self.id = id
-        self.alias = alias
-        self.title = title
-        self.song_id = song_id
-        self.guild_id = guild_id
+CHUNINET_PARSER: ParserBackend = "lxml" if importlib.util.find_spec("lxml") else "bs4"
 
 
 @dataclass
@@ -72,17 +66,54 @@ class UtilsCog(commands.Cog, name="Utils"):
     def __init__(self, bot: "ChuniBot") -> None:
         self.bot = bot
         self.alias_cache: list[CachedAlias] = []
+        self.song_index = SongSearchIndex([])
+        self.catalog = ChartCatalog([])
+        self.cookie_store = CookieStore(bot.begin_db_session)
+        self._score_sync_locks: WeakValueDictionary[int, asyncio.Lock] = (
+            WeakValueDictionary()
+        )
+        self._request_limiters: WeakValueDictionary[int, asyncio.Semaphore] = (
+            WeakValueDictionary()
+        )
 
     async def cog_load(self) -> None:
-        return await self._reload_alias_cache()
+        await self.reload_catalog()
+        await self._reload_alias_cache()
+
+        self.flush_cookies.change_interval(
+            seconds=config.chunithm_net.cookie_flush_interval
+        )
+        self.flush_cookies.start()
+
+        if self.bot.metrics is not None:
+            self.bot.metrics.add_collector("cookie_store", self._collect_metrics)
+
+    async def cog_unload(self) -> None:
+        if self.bot.metrics is not None:
+            self.bot.metrics.remove_collector("cookie_store")
+
+        self.flush_cookies.cancel()
+        await self.cookie_store.flush()
+
+    def _collect_metrics(self) -> None:
+        assert self.bot.metrics is not None
+
+        stats = self.cookie_store.stats
+        self.bot.metrics.observe_cache("cookie_store", stats.hits, stats.misses)
+
+    async def reload_catalog(self) -> None:
+        async with self.bot.begin_db_session() as session:
+            catalog = await ChartCatalog.load(session)
+
+        self.catalog = catalog
+        logger.info("Loaded %d songs into the chart catalog", len(catalog))
 
     async def _reload_alias_cache(self) -> None:
         async with self.bot.begin_db_session() as session:
             stmt = select(Song).options(joinedload(Song.aliases))
             songs = (await session.execute(stmt)).scalars().unique()
 
-        self.alias_cache.clear()
-
+        alias_cache = []
         titles = set()
 
         for song in songs:
@@ -91,20 +122,22 @@ class UtilsCog(commands.Cog, name="Utils"):
 
             titles.add(song.title)
 
-            self.alias_cache.append(
-                CachedAlias(None, song.title, song.title, song.id, -1)
-            )
+            alias_cache.append(CachedAlias(None, song.title, song.title, song.id, -1))
 
-            for alias in song.aliases:
-                self.alias_cache.append(
-                    CachedAlias(
-                        alias.rowid,
-                        alias.alias,
-                        song.title,
-                        alias.song_id,
-                        alias.guild_id,
-                    )
+            alias_cache.extend(
+                CachedAlias(
+                    alias.rowid,
+                    alias.alias,
+                    song.title,
+                    alias.song_id,
+                    alias.guild_id,
                 )
+                for alias in song.aliases
+            )
+
+        # Swap both at once, so searches never see a half-built index.
+        self.alias_cache = alias_cache
+        self.song_index = SongSearchIndex(alias_cache)
 
     async def guild_prefix(self, ctx: Context) -> str:
         default_prefix: str = config.bot.default_prefix
@@ -122,78 +155,73 @@ class UtilsCog(commands.Cog, name="Utils"):
         return clal
 
     async def fetch_cookie(self, id: int) -> LWPCookieJar | None:
-        async with self.bot.begin_db_session() as session:
-            stmt = select(Cookie).where(Cookie.discord_id == id)
-            cookie = (await session.execute(stmt)).scalar_one_or_none()
-
-        if cookie is None:
-            return None
-
-        jar = LWPCookieJar()
-        jar._really_load(  # type: ignore[reportAttributeAccessIssue]
-            io.StringIO(cookie.cookie), "?", ignore_discard=False, ignore_expires=False
-        )
-
-        return jar
+        return await self.cookie_store.get(id)
 
     @contextlib.asynccontextmanager
     async def chuninet(self, ctx_or_id: Context | int):
         id = ctx_or_id if isinstance(ctx_or_id, int) else ctx_or_id.author.id
         jar = await self.login_check(ctx_or_id)
 
-        session = ChuniNet(jar)
+        session = ChuniNet(
+            jar,
+            parser=CHUNINET_PARSER,
+            pool=self.bot.parser_pool,
+            transport=self.bot.chuninet_transport,
+            cache=self.bot.chuninet_cache.for_user(id),
+            on_parse=(
+                self.bot.metrics.observe_parse if self.bot.metrics is not None else None
+            ),
+        )
         try:
             yield session
         finally:
-            async with self.bot.begin_db_session() as db_session:
-                await db_session.execute(
-                    update(Cookie)
-                    .where(Cookie.discord_id == id)
-                    .values(cookie=f"#LWP-Cookies-2.0\n{jar.as_lwp_str()}")
-                )
-                await db_session.commit()
+            if session.reauthentications > 0:
+                self.bot.chuninet_reauthentications[id] += session.reauthentications
 
-            await session.close()
+            # Written back by `flush_cookies`, and only if a cookie changed.
+            self.cookie_store.put(id, jar)
 
-    async def hydrate_records(self, records: Sequence[T]) -> list[T]:
-        song_ids = set()
-        jackets = set()
-
-        for record in records:
-            song_id = record.extras.get(KEY_SONG_ID)
+            await session.close()
 
-            if song_id is not None:
-                song_ids.add(song_id)
-            elif record.jacket is not None:
-                jackets.add(record.jacket.split("/")[-1])
-            else:
-                raise MissingDetailedParams
+    def request_limiter(self, discord_id: int) -> asyncio.Semaphore:
+        """Limits how many requests are sent to CHUNITHM-NET at once on behalf of
+        a user, across all of their commands. Hold it around each request."""
+        limiter = self._request_limiters.get(discord_id)
 
-        async with self.bot.begin_db_session() as session:
-            stmt = (
-                select(Song)
-                .where(Song.id.in_(song_ids) | Song.jacket.in_(jackets))
-                .options(joinedload(Song.charts))
+        if limiter is None:
+            limiter = self._request_limiters[discord_id] = asyncio.Semaphore(
+                config.chunithm_net.max_concurrent_requests
             )
-            songs = (await session.execute(stmt)).scalars().unique()
 
-        song_lookup: dict[int | str, Song] = {}
+        return limiter
 
-        for song in songs:
-            song_lookup[song.id] = song
-            song_lookup[song.jacket] = song
+    @tasks.loop(seconds=5)
+    async def flush_cookies(self) -> None:
+        try:
+            written = await self.cookie_store.flush()
+        except SQLAlchemyError:
+            logger.exception("Could not save cookie jars, retrying later")
+        else:
+            if written > 0:
+                logger.debug("Saved %d cookie jars", written)
 
+    async def hydrate_records(self, records: Sequence[T]) -> list[T]:
+        if any(
+            record.extras.get(KEY_SONG_ID) is None and record.jacket is None
+            for record in records
+        ):
+            raise MissingDetailedParams
+
+        # Hold on to one snapshot, in case the catalog is swapped out meanwhile.
+        catalog = self.catalog
         hydrated_records = []
 
-        for record in records[:]:
-            song_id = record.extras.get(KEY_SONG_ID)
+        # Ratings and overpower are calculated for all records at once at the end.
+        rated_records: list[T] = []
+        internal_levels: list[float] = []
 
-            if song_id is not None:
-                song = song_lookup.get(song_id)
-            elif record.jacket is not None:
-                song = song_lookup.get(record.jacket.split("/")[-1])
-            else:
-                raise MissingDetailedParams
+        for record in records:
+            song = catalog.song(record.extras.get(KEY_SONG_ID), record.jacket)
 
             if song is None:
                 logger.warn(f"Missing song data for song title {record.title}")
@@ -203,14 +231,7 @@ class UtilsCog(commands.Cog, name="Utils"):
             if record.jacket is None:
                 record.jacket = get_jacket_url(song)
 
-            chart = next(
-                (
-                    c
-                    for c in song.charts
-                    if c.difficulty == record.difficulty.short_form()
-                ),
-                None,
-            )
+            chart = song.charts.get(record.difficulty.short_form())
 
             if chart is None:
                 logger.warn(
@@ -231,13 +252,8 @@ class UtilsCog(commands.Cog, name="Utils"):
             else:
                 internal_level = record.extras[KEY_INTERNAL_LEVEL] = chart.const
 
-            record.extras[KEY_PLAY_RATING] = calculate_rating(
-                record.score, internal_level
-            )
-            record.extras[KEY_OVERPOWER_BASE] = calculate_overpower_base(
-                record.score, internal_level
-            )
-            record.extras[KEY_OVERPOWER_MAX] = calculate_overpower_max(internal_level)
+            rated_records.append(record)
+            internal_levels.append(internal_level)
 
             if chart.maxcombo is not None:
                 record.extras[KEY_TOTAL_COMBO] = chart.maxcombo
@@ -247,11 +263,106 @@ class UtilsCog(commands.Cog, name="Utils"):
 
             hydrated_records.append(record)
 
+        scores = [record.score for record in rated_records]
+        for record, rating, overpower_base, overpower_max in zip(
+            rated_records,
+            calculate_ratings_decimal(scores, internal_levels),
+            calculate_overpower_bases_decimal(scores, internal_levels),
+            calculate_overpower_maxes_decimal(internal_levels),
+        ):
+            record.extras[KEY_PLAY_RATING] = rating
+            record.extras[KEY_OVERPOWER_BASE] = overpower_base
+            record.extras[KEY_OVERPOWER_MAX] = overpower_max
+
         return hydrated_records
 
     async def hydrate_record(self, record: T) -> T:
         return (await self.hydrate_records([record]))[0]
 
+    async def sync_score_store(
+        self, client: ChuniNet, discord_id: int, last_play_date: datetime
+    ) -> None:
+        # Concurrent syncs of the same player would insert the same scores.
+        # Whoever waits finds them synced already.
+        lock = self._score_sync_locks.setdefault(discord_id, asyncio.Lock())
+
+        async with lock:
+            plan = await sync_scores(
+                self.bot.begin_db_session,
+                client,
+                discord_id,
+                last_play_date,
+                limiter=self.request_limiter(discord_id),
+            )
+
+        if plan.folders:
+            logger.debug(
+                "Synced scores of user %d (full: %s, folders: %s)",
+                discord_id,
+                plan.full,
+                ", ".join(d.short_form() for d in plan.folders),
+            )
+
+    async def song_records(
+        self, client: ChuniNet, discord_id: int, last_play_date: datetime, song_id: int
+    ) -> list[MusicRecord]:
+        """Gets a player's records for a song, from the score store if possible.
+
+        The song's page is only fetched when the store does not know the play
+        count of one of the charts.
+        """
+        await self.sync_score_store(client, discord_id, last_play_date)
+
+        async with self.bot.begin_db_session() as session:
+            snapshots = await load_scores(session, discord_id, song_id=song_id)
+
+        if all(s.play_count is not None for s in snapshots):
+            return [to_music_record(s) for s in snapshots]
+
+        records = await client.music_record(song_id)
+
+        async with self.bot.begin_db_session() as session:
+            await store_music_records(session, discord_id, records)
+
+        return records
+
+    async def folder_records(
+        self,
+        client: ChuniNet,
+        discord_id: int,
+        *,
+        level: Optional[str] = None,
+        genre: Optional[Genres] = None,
+        rank: Optional[Rank] = None,
+        difficulty: Optional[Difficulty] = None,
+        last_play_date: Optional[datetime] = None,
+    ) -> list[Record]:
+        """Same as `ChuniNet.music_record_by_folder`, but answered from the score
+        store unless filtering by rank.
+
+        If the player's last play date is not given, it is fetched with
+        `ChuniNet.authenticate()`.
+        """
+        if rank is not None:
+            return await client.music_record_by_folder(
+                level=level, genre=genre, rank=rank, difficulty=difficulty
+            )
+
+        if last_play_date is None:
+            last_play_date = (await client.authenticate()).last_play_date
+
+        await self.sync_score_store(client, discord_id, last_play_date)
+
+        async with self.bot.begin_db_session() as session:
+            snapshots = await load_scores(session, discord_id)
+
+        return [
+            to_record(s)
+            for s in filter_folder(
+                snapshots, self.catalog, level=level, genre=genre, difficulty=difficulty
+            )
+        ]
+
     async def find_song(
         self,
         query: str,
@@ -275,16 +386,10 @@ class UtilsCog(commands.Cog, name="Utils"):
         tuple[Song, Alias | None, float]
             The third item is the similarity of the matched song.
         """
-        aliases = [
-            x for x in self.alias_cache if x.guild_id == -1 or x.guild_id == guild_id
-        ]
-        (_, similarity, index) = process.extractOne(
-            query,
-            [x.alias for x in aliases],
-            scorer=fuzz.QRatio,
-            processor=str.lower,
-        )
-        matching_alias = aliases[index]
+        if (match := self.song_index.extract_one(query, guild_id)) is None:
+            return None, None, 0
+
+        matching_alias, similarity = match.alias, match.similarity
 
         async with self.bot.begin_db_session() as session:
             condition = Song.id == matching_alias.song_id
@@ -313,14 +418,10 @@ class UtilsCog(commands.Cog, name="Utils"):
         load_charts: bool = False,
         available: Optional[bool] = None,
     ) -> SongSearchResult:
-        aliases = [x for x in self.alias_cache if x.guild_id in {-1, guild_id}]
-        (_, similarity, index) = process.extractOne(
-            query,
-            [x.alias for x in aliases],
-            scorer=fuzz.QRatio,
-            processor=str.lower,
-        )
-        matching_alias = aliases[index]
+        if (match := self.song_index.extract_one(query, guild_id)) is None:
+            return SongSearchResult(songs=[], matched_alias=None, similarity=0)
+
+        matching_alias, similarity = match.alias, match.similarity
 
         async with self.bot.begin_db_session() as session:
             cond = Song.title == matching_alias.title
@@ -14,7 +14,9 @@ from chunithm_net.exceptions import ChuniNetException, InvalidTokenException
 from database.models import Cookie
 from utils import asuppress
 from utils.config import config
+from utils.cookie_store import dump_jar
 from utils.logging import logger as root_logger
+from utils.score_store import clear_scores
 from utils.views.login import LoginFlowView
 
 if TYPE_CHECKING:
@@ -56,10 +58,15 @@ class AuthCog(commands.Cog, name="Auth"):
                         "However, your account has been deleted from our records."
                     )
 
+        await self.utils.cookie_store.forget(ctx.author.id)
+
         async with ctx.typing(), self.bot.begin_db_session() as session:
             stmt = delete(Cookie).where(Cookie.discord_id == ctx.author.id)
             await session.execute(stmt)
+            await clear_scores(session, ctx.author.id)
             await session.commit()
+
+        self.bot.chuninet_cache.invalidate(ctx.author.id)
         await ctx.reply(msg, mention_author=False)
 
     async def _verify_and_login(self, id: int, clal: str) -> Optional[Exception]:
@@ -87,17 +94,22 @@ class AuthCog(commands.Cog, name="Auth"):
         jar = LWPCookieJar()
         jar.set_cookie(cookie)
 
-        async with ChuniNet(jar) as client:
+        async with ChuniNet(jar, transport=self.bot.chuninet_transport) as client:
             try:
                 await client.authenticate()
             except ChuniNetException as e:
                 return e
 
+        await self.utils.cookie_store.forget(id)
+
         async with self.bot.begin_db_session() as session, session.begin():
-            await session.merge(
-                Cookie(discord_id=id, cookie=f"#LWP-Cookies-2.0\n{jar.as_lwp_str()}")
-            )
-            return None
+            await session.merge(Cookie(discord_id=id, cookie=dump_jar(jar)))
+            await clear_scores(session, id)
+
+        # The user might have logged in to a different account.
+        self.bot.chuninet_cache.invalidate(id)
+
+        return None
 
     @commands.hybrid_command("login")
     async def login(self, ctx: Context, clal: Optional[str] = None):
@@ -1,23 +1,95 @@
 import asyncio
+import itertools
 import sys
-from typing import TYPE_CHECKING, Literal, Optional
+import time
+from datetime import datetime, timezone
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Iterable,
+    Literal,
+    NamedTuple,
+    Optional,
+)
 
 import discord
 import httpx
 from discord.ext import commands
 from discord.ext.commands import Context
+from discord.utils import format_dt
 from sqlalchemy import select
 
 from chunithm_net.consts import KEY_SONG_ID
 from chunithm_net.models.enums import ClearType, ComboType, Difficulty, SkillClass
-from database.models import Cookie
-from utils import json_dumps, json_loads
+from chunithm_net.models.record import DetailedRecentRecord, RecentRecord, Record
+from database.models import Cookie, KamaitachiImport
+from utils import asuppress, json_dumps, json_loads
+from utils.backoff import Backoff
 from utils.config import config
+from utils.logging import logger as root_logger
+from utils.progress import ThrottledProgress
+from utils.score_store import load_scores, to_record
 
 if TYPE_CHECKING:
     from bot import ChuniBot
     from cogs.botutils import UtilsCog
 
+logger = root_logger.getChild(__name__)
+
+
+async def stream_import_body(
+    meta: dict, classes: dict, scores: Iterable[dict], *, chunk_size: int = 256
+) -> AsyncIterator[bytes]:
+    """Serializes a batch-manual import a few scores at a time, so that the whole
+    body never has to be held in memory."""
+    yield f'{{"meta":{json_dumps(meta)},"classes":{json_dumps(classes)},"scores":['.encode()
+
+    scores = iter(scores)
+    separator = ""
+    while batch := list(itertools.islice(scores, chunk_size)):
+        yield (separator + ",".join(json_dumps(score) for score in batch)).encode()
+        separator = ","
+
+    yield b"]}"
+
+
+class ImportPoll(NamedTuple):
+    # None if the import failed.
+    status: Optional[Literal["ongoing", "completed"]]
+    description: str
+    progress: Optional[str] = None
+    score_count: int = 0
+    error_count: int = 0
+
+
+def parse_import_poll(data: dict) -> ImportPoll:
+    """Reads a response from an import's poll URL.
+
+    Raises `LookupError`, `TypeError` or `ValueError` if the response is not
+    shaped like one, or has a status this does not know about.
+    """
+    if not data["success"]:
+        return ImportPoll(None, data["description"])
+
+    body = data["body"]
+    status = body["importStatus"]
+
+    if status == "ongoing":
+        return ImportPoll(
+            status, data["description"], progress=body["progress"]["description"]
+        )
+
+    if status == "completed":
+        return ImportPoll(
+            status,
+            data["description"],
+            score_count=len(body["import"]["scoreIDs"]),
+            error_count=len(body["import"]["errors"]),
+        )
+
+    msg = f"Unknown import status {status!r}"
+    raise ValueError(msg)
+
 
 def to_tachi_class(cls: SkillClass) -> str:
     return {
@@ -52,6 +124,36 @@ class KamaitachiCog(commands.Cog, name="Kamaitachi", command_attrs={"hidden": Tr
         self.kt_client_secret = kt_client_secret
         self.user_agent = f"ChuniPenguin (https://github.com/Rapptz/discord.py {discord.__version__}) Python/{sys.version_info[0]}.{sys.version_info[1]} httpx/{httpx.__version__}"
 
+        # Import polls from every user share one client and a cap on requests
+        # in flight, however many imports are running.
+        self.tachi_client = httpx.AsyncClient(
+            headers={"User-Agent": self.user_agent},
+            limits=httpx.Limits(max_connections=config.kamaitachi.max_concurrent_polls),
+        )
+        self._poll_limiter = asyncio.Semaphore(config.kamaitachi.max_concurrent_polls)
+        self._poll_tasks: dict[int, asyncio.Task] = {}
+
+    async def cog_load(self) -> None:
+        # Pick up imports that were still running when the bot was stopped.
+        async with self.bot.begin_db_session() as session:
+            stmt = select(KamaitachiImport.discord_id).where(
+                KamaitachiImport.status == "ongoing"
+            )
+            discord_ids = (await session.execute(stmt)).scalars().all()
+
+        for discord_id in discord_ids:
+            self._start_polling(discord_id)
+
+        if discord_ids:
+            logger.info("Resumed polling %d Kamaitachi imports", len(discord_ids))
+
+    async def cog_unload(self) -> None:
+        for task in self._poll_tasks.values():
+            task.cancel()
+
+        await asyncio.gather(*self._poll_tasks.values(), return_exceptions=True)
+        await self.tachi_client.aclose()
+
     @commands.hybrid_group("kamaitachi", aliases=["kt"], invoke_without_command=True)
     async def kamaitachi(self, ctx: Context):
         await ctx.reply(
@@ -185,6 +287,47 @@ class KamaitachiCog(commands.Cog, name="Kamaitachi", command_attrs={"hidden": Tr
 
         return "FAILED"
 
+    @kamaitachi.command("status")
+    async def kamaitachi_status(self, ctx: Context):
+        """Check on your latest Kamaitachi sync."""
+        async with self.bot.begin_db_session() as session:
+            job = await session.get(KamaitachiImport, ctx.author.id)
+
+        if job is None:
+            return await ctx.reply(
+                content="You have not synced any scores with Kamaitachi yet.",
+                mention_author=False,
+            )
+
+        started_at = job.started_at.replace(tzinfo=timezone.utc)
+        updated_at = job.updated_at.replace(tzinfo=timezone.utc)
+
+        if job.status == "ongoing":
+            content = (
+                f"Kamaitachi has been importing your scores since {format_dt(started_at, 'R')}.\n"
+                f"Progress: {job.progress or 'Waiting for Kamaitachi to start...'}"
+            )
+        else:
+            content = (
+                f"Your last sync finished {format_dt(updated_at, 'R')}.\n{job.progress}"
+            )
+
+        return await ctx.reply(content=content, mention_author=False)
+
+    def _tachi_pb(self, record: Record) -> dict:
+        score_data = {
+            "score": record.score,
+            "lamp": self._tachi_lamp(record.clear_lamp, record.combo_lamp),
+            "matchType": "inGameID",
+            "identifier": str(record.extras.get(KEY_SONG_ID)),
+            "difficulty": str(record.difficulty),
+        }
+
+        if record.score == 1010000:
+            score_data["lamp"] = "ALL JUSTICE CRITICAL"
+
+        return score_data
+
     @kamaitachi.command("sync", aliases=["s"])
     async def kamaitachi_sync(
         self, ctx: Context, sync: Literal["recent", "pb"] = "recent"
@@ -214,7 +357,15 @@ class KamaitachiCog(commands.Cog, name="Kamaitachi", command_attrs={"hidden": Tr
                 mention_author=False,
             )
 
-        scores = []
+        if ctx.author.id in self._poll_tasks:
+            return await ctx.reply(
+                content="Kamaitachi is still importing your last sync. Please wait for it to finish.",
+                mention_author=False,
+            )
+
+        scores: Iterable[dict] = ()
+        timings: dict[str, float] = {}
+        phase_start = time.perf_counter()
         message = await ctx.reply(
             "Fetching scores from CHUNITHM-NET...", mention_author=False
         )
@@ -227,39 +378,82 @@ class KamaitachiCog(commands.Cog, name="Kamaitachi", command_attrs={"hidden": Tr
             profile = await chuni_client.player_data()
 
             if sync == "recent":
-                recents = await chuni_client.recent_record()
+                recents: list[RecentRecord] = []
+                started = time.perf_counter()
+                limiter = self.utils.request_limiter(ctx.author.id)
 
-                for recent in recents:
-                    if recent.difficulty == Difficulty.WORLDS_END:
+                async def fetch_detailed(recent: RecentRecord):
+                    async with limiter:
+                        detailed = await chuni_client.detailed_recent_record(recent)
+
+                    progress.advance()
+                    return detailed
+
+                async def report_progress(completed: int):
+                    await message.edit(
+                        content=f"Fetching recent scores from CHUNITHM-NET... {completed}/{len(recents)}",
+                        allowed_mentions=discord.AllowedMentions.none(),
+                    )
+
+                def report_failed(e: Exception):
+                    logger.warning(
+                        "Could not update Kamaitachi sync progress for %d",
+                        ctx.author.id,
+                        exc_info=e,
+                    )
+
+                # Details are fetched as soon as each play has been read off
+                # the playlog, and come back in play order, whatever order the
+                # requests finish in.
+                fetches: list[asyncio.Future[DetailedRecentRecord]] = []
+                async with ThrottledProgress(
+                    report_progress, on_error=report_failed
+                ) as progress:
+                    try:
+                        async for recent in chuni_client.iter_recent_record():
+                            # Kamaitachi does not accept WORLD'S END scores
+                            if recent.difficulty == Difficulty.WORLDS_END:
+                                continue
+
+                            recents.append(recent)
+                            fetches.append(
+                                asyncio.ensure_future(fetch_detailed(recent))
+                            )
+
+                        detailed_recents = await asyncio.gather(*fetches)
+                    except BaseException:
+                        for fetch in fetches:
+                            fetch.cancel()
+                        raise
+
+                logger.info(
+                    "Fetched %d detailed plays for %d in %.0fms",
+                    len(detailed_recents),
+                    ctx.author.id,
+                    (time.perf_counter() - started) * 1000,
+                )
+
+                recent_scores = []
+                for recent, detailed_recent in zip(recents, detailed_recents):
+                    if (song_id := detailed_recent.extras.get(KEY_SONG_ID)) is None:
                         continue
 
                     score_data = {
                         "score": recent.score,
                         "lamp": self._tachi_lamp(recent.clear_lamp, recent.combo_lamp),
                         "matchType": "inGameID",
-                        "identifier": "",
+                        "identifier": str(song_id),
                         "difficulty": str(recent.difficulty),
                         "timeAchieved": int(recent.date.timestamp()) * 1000,
-                        "judgements": {},
-                        "hitMeta": {},
+                        "judgements": {
+                            "jcrit": detailed_recent.judgements.jcrit,
+                            "justice": detailed_recent.judgements.justice,
+                            "attack": detailed_recent.judgements.attack,
+                            "miss": detailed_recent.judgements.miss,
+                        },
+                        "hitMeta": {"maxCombo": detailed_recent.max_combo},
                     }
 
-                    detailed_recent = await chuni_client.detailed_recent_record(recent)
-
-                    if (song_id := detailed_recent.extras.get(KEY_SONG_ID)) is None:
-                        continue
-
-                    score_data["identifier"] = str(song_id)
-
-                    score_data["judgements"]["jcrit"] = detailed_recent.judgements.jcrit
-                    score_data["judgements"][
-                        "justice"
-                    ] = detailed_recent.judgements.justice
-                    score_data["judgements"][
-                        "attack"
-                    ] = detailed_recent.judgements.attack
-                    score_data["judgements"]["miss"] = detailed_recent.judgements.miss
-
                     if (
                         detailed_recent.judgements.justice == 0
                         and detailed_recent.judgements.attack == 0
@@ -267,110 +461,229 @@ class KamaitachiCog(commands.Cog, name="Kamaitachi", command_attrs={"hidden": Tr
                     ):
                         score_data["lamp"] = "ALL JUSTICE CRITICAL"
 
-                    score_data["hitMeta"]["maxCombo"] = detailed_recent.max_combo
-
-                    scores.append(score_data)
+                    recent_scores.append(score_data)
 
-                    if len(scores) % 10 == 0:
-                        await message.edit(
-                            content=f"Fetching recent scores from CHUNITHM-NET... {len(scores)}/{len(recents)}",
-                            allowed_mentions=discord.AllowedMentions.none(),
-                        )
+                scores = recent_scores
 
             elif sync == "pb":
-                for difficulty in Difficulty:
-                    if difficulty == Difficulty.WORLDS_END:
-                        # Kamaitachi does not accept WORLD'S END scores
-                        continue
-
-                    await message.edit(
-                        content=f"Fetching {difficulty} scores...",
-                        allowed_mentions=discord.AllowedMentions.none(),
-                    )
-
-                    records = await chuni_client.music_record_by_folder(
-                        difficulty=difficulty
-                    )
-
-                    for score in records:
-                        if (song_id := score.extras.get(KEY_SONG_ID)) is None:
-                            continue
-
-                        score_data = {
-                            "score": score.score,
-                            "lamp": self._tachi_lamp(
-                                score.clear_lamp, score.combo_lamp
-                            ),
-                            "matchType": "inGameID",
-                            "identifier": str(song_id),
-                            "difficulty": str(score.difficulty),
-                        }
+                # Every difficulty folder that changed is fetched at once.
+                await self.utils.sync_score_store(
+                    chuni_client, ctx.author.id, profile.last_play_date
+                )
 
-                        if score.score == 1010000:
-                            score_data["lamp"] = "ALL JUSTICE CRITICAL"
+                async with self.bot.begin_db_session() as session:
+                    snapshots = await load_scores(session, ctx.author.id)
 
-                        scores.append(score_data)
+                # Score data is built as it is uploaded.
+                scores = (
+                    self._tachi_pb(to_record(snapshot))
+                    for snapshot in snapshots
+                    # Kamaitachi does not accept WORLD'S END scores
+                    if snapshot.difficulty != Difficulty.WORLDS_END.short_form()
+                )
 
+            timings["fetch"] = time.perf_counter() - phase_start
+            phase_start = time.perf_counter()
             await message.edit(content="Uploading scores to Kamaitachi...")
 
-            request_body = {
-                "meta": {
-                    "game": "chunithm",
-                    "playtype": "Single",
-                    "service": "site-importer",
-                },
-                "scores": scores,
-                "classes": {},
-            }
-
+            classes = {}
             if profile.medal is not None:
-                request_body["classes"]["dan"] = to_tachi_class(profile.medal)
+                classes["dan"] = to_tachi_class(profile.medal)
             if profile.emblem is not None:
-                request_body["classes"]["emblem"] = to_tachi_class(profile.emblem)
+                classes["emblem"] = to_tachi_class(profile.emblem)
 
             resp = await tachi_client.post(
                 "https://kamai.tachi.ac/ir/direct-manual/import",
-                content=json_dumps(request_body),
+                content=stream_import_body(
+                    {
+                        "game": "chunithm",
+                        "playtype": "Single",
+                        "service": "site-importer",
+                    },
+                    classes,
+                    scores,
+                ),
                 headers={
                     "Content-Type": "application/json",
                     "X-User-Intent": "true",
                 },
             )
             data = json_loads(resp.content)
+            timings["upload"] = time.perf_counter() - phase_start
 
             if not data["success"]:
                 return await message.edit(
                     content=f"Failed to upload scores to Kamaitachi: {data['description']}"
                 )
 
-            poll_url = data["body"]["url"]
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            async with self.bot.begin_db_session() as session, session.begin():
+                await session.merge(
+                    KamaitachiImport(
+                        discord_id=ctx.author.id,
+                        poll_url=data["body"]["url"],
+                        channel_id=message.channel.id,
+                        message_id=message.id,
+                        status="ongoing",
+                        progress=None,
+                        started_at=now,
+                        updated_at=now,
+                    )
+                )
+
+        # Kamaitachi imports in the background, so there is no need to keep
+        # either session open while waiting for it.
+        self._start_polling(ctx.author.id, timings)
 
-            while True:
-                resp = await tachi_client.get(poll_url)
-                data = json_loads(resp.content)
+        await message.edit(
+            content=(
+                "Scores uploaded, Kamaitachi is importing them. "
+                f"This message will be updated, or check with `{ctx.prefix}kamaitachi status`."
+            )
+        )
+        return None
 
-                if not data["success"]:
-                    return await message.edit(
-                        content=f"Failed to upload scores to Kamaitachi: {data['description']}"
-                    )
+    def _start_polling(
+        self, discord_id: int, timings: Optional[dict[str, float]] = None
+    ) -> None:
+        task = asyncio.create_task(self._poll_import(discord_id, timings or {}))
+        self._poll_tasks[discord_id] = task
+
+        def done(task: asyncio.Task) -> None:
+            if self._poll_tasks.get(discord_id) is task:
+                del self._poll_tasks[discord_id]
+
+            if not task.cancelled() and (exc := task.exception()) is not None:
+                logger.error(
+                    "Polling Kamaitachi import of %d failed",
+                    discord_id,
+                    exc_info=exc,
+                )
 
-                if data["body"]["importStatus"] == "ongoing":
-                    await message.edit(
-                        content=(
-                            f"Importing scores: {data['description']}\n"
-                            f"Progress: {data['body']['progress']['description']}"
-                        )
+        task.add_done_callback(done)
+
+    async def _poll_import(self, discord_id: int, timings: dict[str, float]) -> None:
+        async with self.bot.begin_db_session() as session:
+            job = await session.get(KamaitachiImport, discord_id)
+            cookie = await session.get(Cookie, discord_id)
+
+        if job is None or job.status != "ongoing":
+            return
+
+        if cookie is None or cookie.kamaitachi_token is None:
+            await self._finish_import(
+                job, "failed", "Import was abandoned after unlinking Kamaitachi."
+            )
+            return
+
+        headers = {"Authorization": f"Bearer {cookie.kamaitachi_token}"}
+        backoff = Backoff(2, config.kamaitachi.poll_max_interval, factor=1.5)
+
+        failures = 0
+
+        while True:
+            await asyncio.sleep(backoff.next_delay())
+
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            age = (now - job.started_at).total_seconds()
+
+            if age > config.kamaitachi.import_timeout:
+                await self._finish_import(
+                    job, "failed", "Kamaitachi took too long to import the scores."
+                )
+                return
+
+            try:
+                async with self._poll_limiter:
+                    resp = await self.tachi_client.get(job.poll_url, headers=headers)
+                poll = parse_import_poll(json_loads(resp.content))
+            except (httpx.HTTPError, ValueError, LookupError, TypeError) as e:
+                # Covers error pages, expired imports and responses of an
+                # unexpected shape, none of which may ever go away.
+                failures += 1
+                logger.warning(
+                    "Could not poll Kamaitachi import of %d (%d/%d): %r",
+                    discord_id,
+                    failures,
+                    config.kamaitachi.poll_max_failures,
+                    e,
+                )
+
+                if failures >= config.kamaitachi.poll_max_failures:
+                    await self._finish_import(
+                        job,
+                        "failed",
+                        "Lost track of the import on Kamaitachi. Check your profile there to see if it went through.",
                     )
-                    await asyncio.sleep(2)
-                    continue
+                    return
 
-                if data["body"]["importStatus"] == "completed":
-                    msg = f"{data['description']} {len(data['body']['import']['scoreIDs'])} scores"
+                continue
 
-                    if len(data["body"]["import"]["errors"]) > 0:
-                        msg += f", {len(data['body']['import']['errors'])} errors"
+            failures = 0
 
-                    return await message.edit(content=msg)
+            if poll.status is None:
+                await self._finish_import(
+                    job,
+                    "failed",
+                    f"Failed to upload scores to Kamaitachi: {poll.description}",
+                )
+                return
+
+            if poll.status == "completed":
+                timings["import"] = age
+                logger.info(
+                    "Synced scores of %d with Kamaitachi in %.0fms (%s)",
+                    discord_id,
+                    sum(timings.values()) * 1000,
+                    ", ".join(
+                        f"{phase} {elapsed * 1000:.0f}ms"
+                        for phase, elapsed in timings.items()
+                    ),
+                )
+
+                msg = f"{poll.description} {poll.score_count} scores"
+
+                if poll.error_count > 0:
+                    msg += f", {poll.error_count} errors"
+
+                msg += "\n-# " + ", ".join(
+                    f"{phase.capitalize()} {elapsed:.1f}s"
+                    for phase, elapsed in timings.items()
+                )
+
+                await self._finish_import(job, "completed", msg)
+                return
+
+            if poll.progress == job.progress:
+                continue
+
+            # Poll quickly again while the import is moving.
+            backoff.reset()
+            job.progress = poll.progress
+            await self._update_import(
+                job,
+                f"Importing scores: {poll.description}\nProgress: {poll.progress}",
+            )
+
+    async def _update_import(self, job: KamaitachiImport, content: str) -> None:
+        job.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        async with self.bot.begin_db_session() as session, session.begin():
+            await session.merge(job)
+
+        message = self.bot.get_partial_messageable(job.channel_id).get_partial_message(
+            job.message_id
+        )
+        # The message may have been deleted, which is no reason to stop.
+        async with asuppress(discord.HTTPException):
+            await message.edit(content=content)
+
+    async def _finish_import(
+        self, job: KamaitachiImport, status: str, result: str
+    ) -> None:
+        job.status = status
+        job.progress = result
+        await self._update_import(job, result)
 
 
 async def setup(bot: "ChuniBot"):
@@ -1,15 +1,14 @@
 import asyncio
 import contextlib
-from dataclasses import dataclass
-from io import BytesIO
 from typing import TYPE_CHECKING, Optional
 
 import discord
 from discord.ext import commands
 from discord.ext.commands import Context
-from PIL import Image
 
 from chunithm_net.exceptions import ChuniNetError
+from utils.render_pool import interaction_deadline
+from utils.rendering import AVATAR_COORDS, render_avatar
 from utils.views.profile import ProfileView
 
 if TYPE_CHECKING:
@@ -17,106 +16,6 @@ if TYPE_CHECKING:
     from cogs.botutils import UtilsCog
 
 
-@dataclass
-class DrawCoordinates:
-    sx: int = 0
-    sy: int = 0
-    dx_offset: int = 0
-    dy: int = 0
-    width: int = 0
-    height: int = 0
-    rotate: int = 0
-
-
-AVATAR_COORDS = {
-    "skinfoot_r": DrawCoordinates(
-        sy=204,
-        dx_offset=84,
-        dy=260,
-        width=42,
-        height=52,
-    ),
-    "skinfoot_l": DrawCoordinates(
-        sx=42,
-        sy=204,
-        dx_offset=147,
-        dy=260,
-        width=42,
-        height=52,
-    ),
-    "skin": DrawCoordinates(
-        dx_offset=72,
-        dy=73,
-        width=128,
-        height=204,
-    ),
-    "wear": DrawCoordinates(
-        dx_offset=7,
-        dy=86,
-        width=258,
-        height=218,
-    ),
-    "face": DrawCoordinates(
-        dx_offset=107,
-        dy=80,
-        width=58,
-        height=64,
-    ),
-    "face_cover": DrawCoordinates(dx_offset=78, dy=76, width=116, height=104),
-    "head": DrawCoordinates(
-        width=200,
-        height=150,
-        dx_offset=37,
-        dy=8,
-    ),
-    "hand_r": DrawCoordinates(
-        width=36,
-        height=72,
-        dx_offset=52,
-        dy=158,
-    ),
-    "hand_l": DrawCoordinates(
-        width=36,
-        height=72,
-        dx_offset=184,
-        dy=158,
-    ),
-    "item_r": DrawCoordinates(width=100, height=272, dx_offset=9, dy=30, rotate=-5),
-    "item_l": DrawCoordinates(
-        sx=100, width=100, height=272, dx_offset=163, dy=30, rotate=5
-    ),
-}
-
-
-def render_avatar(items: dict[str, bytes]) -> BytesIO:
-    avatar = Image.open(BytesIO(items["base"]))
-
-    # crop out the USER AVATAR text at the top
-    avatar = avatar.crop((0, 20, avatar.width, avatar.height))
-
-    back = Image.open(BytesIO(items["back"]))
-
-    base_x = int((avatar.width - back.width) / 2)
-    avatar.paste(back, (base_x, 25), back)
-
-    for name, coords in AVATAR_COORDS.items():
-        image = Image.open(BytesIO(items[name]))
-        crop = image.crop(
-            (
-                coords.sx,
-                coords.sy,
-                coords.sx + coords.width,
-                coords.sy + coords.height,
-            )
-        ).rotate(coords.rotate, expand=True, resample=Image.Resampling.BICUBIC)
-        avatar.paste(crop, (base_x + coords.dx_offset, coords.dy), crop)
-
-    buffer = BytesIO()
-    avatar.save(buffer, "png", optimize=True)
-    buffer.seek(0)
-    return buffer
-
-
 class ProfileCog(commands.Cog, name="Profile"):
     def __init__(self, bot: "ChuniBot") -> None:
         self.bot = bot
@@ -151,7 +50,9 @@ class ProfileCog(commands.Cog, name="Profile"):
                 )
             )
 
-        buffer = await asyncio.to_thread(render_avatar, items)
+        buffer = await self.bot.render_pool.run(
+            render_avatar, items, deadline=interaction_deadline(ctx)
+        )
         await ctx.reply(
             content=f"Avatar of {basic_data.name}",
             file=discord.File(buffer, filename="avatar.png"),
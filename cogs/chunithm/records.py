@@ -1,15 +1,13 @@
 import asyncio
 import contextlib
-import httpx
+import functools
+import io
 import itertools
-import os
+import time
 
 from argparse import ArgumentError
-from io import BytesIO
 from functools import wraps
-from typing import TYPE_CHECKING, Literal, Optional, cast
-from PIL import Image, ImageDraw, ImageFont
-from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Literal, Optional, cast
 
 import discord
 from discord import app_commands
@@ -23,66 +21,51 @@ from chunithm_net.consts import (
     INTERNATIONAL_JACKET_BASE,
     JACKET_BASE,
     KEY_INTERNAL_LEVEL,
+    KEY_LEVEL,
     KEY_OVERPOWER_BASE,
     KEY_OVERPOWER_MAX,
     KEY_PLAY_RATING,
     KEY_SONG_ID,
 )
-from chunithm_net.models.enums import ComboType, ClearType, Difficulty, Genres, Rank
-from chunithm_net.models.record import (
-    Record, 
-    MusicRecord
-)
+from chunithm_net.models.enums import Difficulty, Genres, Rank
+from chunithm_net.models.record import Record, MusicRecord
 from database.models import SongJacket
 from utils import did_you_mean_text, shlex_split
 from utils.argparse import DiscordArguments
 from utils.components import ScoreCardEmbed
+from utils.config import config
 from utils.constants import SIMILARITY_THRESHOLD
+from utils.logging import logger as root_logger
+from utils.render_pool import interaction_deadline
+from utils.rendering import EncodedImage, JacketCache, render_b30_image
 from utils.views import B30View, CompareView, RecentRecordsView, SelectToCompareView
 
 if TYPE_CHECKING:
     from bot import ChuniBot
+    from chunithm_net import ChuniNet
     from cogs.autocompleters import AutocompletersCog
     from cogs.botutils import UtilsCog
 
-rank_image_paths = {
-    Rank.SSSp: "./photo/icon_rank_13.png",
-    Rank.SSS: "./photo/icon_rank_12.png",
-    Rank.SSp: "./photo/icon_rank_11.png",
-    Rank.SS: "./photo/icon_rank_10.png",
-    Rank.Sp: "./photo/icon_rank_9.png",
-    Rank.S: "./photo/icon_rank_8.png",
-    Rank.AAA: "./photo/icon_rank_7.png",
-    Rank.AA: "./photo/icon_rank_6.png",
-    Rank.A: "./photo/icon_rank_5.png",
-    Rank.BBB: "./photo/icon_rank_4.png",
-    Rank.BB: "./photo/icon_rank_3.png",
-    Rank.B: "./photo/icon_rank_2.png",
-    Rank.C: "./photo/icon_rank_1.png",
-    Rank.D: "./photo/icon_rank_0.png",
-}
-
-icon_image_paths = {
-    ClearType.CLEAR: "./photo/icon_clear.png",
-    ClearType.HARD: "./photo/icon_hard.png",
-    ClearType.ABSOLUTE: "./photo/icon_absolute.png",
-    ClearType.ABSOLUTE_PLUS: "./photo/icon_absolutep.png",
-    ClearType.CATASTROPHY: "./photo/icon_catastrophy.png",
-}
-
-difficulty_image_paths = {
-    Difficulty.BASIC: "./photo/basic.png",
-    Difficulty.ADVANCED: "./photo/advanced.png",
-    Difficulty.EXPERT: "./photo/expert.png",
-    Difficulty.MASTER: "./photo/master.png",
-    Difficulty.ULTIMA: "./photo/ultima.png",
-}
+logger = root_logger.getChild(__name__)
+
 
 class RecordsCog(commands.Cog, name="Records"):
     def __init__(self, bot: "ChuniBot") -> None:
         self.bot = bot
-        self.utils: "UtilsCog" = self.bot.get_cog("Utils") # type: ignore[reportGeneralTypeIssues]
-        self.autocompleters: "AutocompletersCog" = self.bot.get_cog("Autocompleters") # type: ignore[reportGeneralTypeIssues]
+        self.utils: "UtilsCog" = self.bot.get_cog("Utils")  # type: ignore[reportGeneralTypeIssues]
+        self.autocompleters: "AutocompletersCog" = self.bot.get_cog("Autocompleters")  # type: ignore[reportGeneralTypeIssues]
+
+        self.jackets = JacketCache(
+            config.render.jacket_cache_dir,
+            max_memory_items=config.render.jacket_cache_memory_items,
+            max_disk_size=config.render.jacket_cache_size,
+        )
+
+    async def cog_load(self) -> None:
+        await self.jackets.load()
+
+    async def cog_unload(self) -> None:
+        await self.jackets.close()
 
     @commands.hybrid_command(name="generate", aliases=["gen"])
     async def generate(
@@ -95,25 +78,46 @@ class RecordsCog(commands.Cog, name="Records"):
         user: Optional[discord.User | discord.Member]
             The user to generate the image for. Defaults to the author.
         """
+        timings: dict[str, float] = {}
+        phase_start = time.perf_counter()
+
+        discord_id = ctx.author.id if user is None else user.id
+
         async with ctx.typing(), self.utils.chuninet(
             ctx if user is None else user.id
         ) as client:
+            # Be polite to SEGA: every request made on behalf of this user goes
+            # through the same semaphore, shared with their other commands.
+            limiter = self.utils.request_limiter(discord_id)
+
+            async def limited(coro):
+                async with limiter:
+                    return await coro
+
+            # The first request goes out alone, so that if the session has to be
+            # re-established it only happens once.
+            recordsb30 = await limited(client.best30())
+            timings["best30"] = time.perf_counter() - phase_start
+            phase_start = time.perf_counter()
+
+            async def fetch_recent10():
+                return await self.utils.hydrate_records(
+                    await limited(client.recent10())
+                )
+
+            async def fill_best30():
+                hydrated = await self.utils.hydrate_records(recordsb30)
+                await self._fill_lamps(client, hydrated, limited)
+                return hydrated
 
-            recordsb30 = await client.best30()
-            recordsr10 = await client.recent10()
-            recordsb30 = await self.utils.hydrate_records(recordsb30)
-            recordsr10 = await self.utils.hydrate_records(recordsr10)
-            profile = await client.player_data()
+            recordsb30, recordsr10, profile = await asyncio.gather(
+                fill_best30(),
+                fetch_recent10(),
+                limited(client.player_data()),
+            )
             player_name = profile.name
             rating = profile.rating
-
-            for record in recordsb30:
-                song_id = record.extras.get(KEY_SONG_ID)
-                music_record = await client.music_record(song_id)
-                music_record = [x for x in music_record if x.difficulty == record.difficulty]
-
-                record.combo_lamp = music_record[0].combo_lamp
-                record.clear_lamp = music_record[0].clear_lamp
+            timings["details"] = time.perf_counter() - phase_start
 
             total_rating = 0
             for record in recordsr10:
@@ -122,128 +126,134 @@ class RecordsCog(commands.Cog, name="Records"):
                 avg_rating = total_rating / len(recordsr10)
             else:
                 avg_rating = f"{total_rating / len(recordsr10)} (Estimated due to lack of constants)"
-            
-            image = await self.generate_image(player_name, rating, recordsb30, recordsr10, avg_rating)
-            
-            if not os.path.exists("tempgenphoto"):
-                os.makedirs("tempgenphoto")
-
-            image_path = f"tempgenphoto/IMG_{user.id if user else ctx.author.id}.png"
-            image.save(image_path)
-
-            await ctx.reply(f"Image of {player_name}'s Best 30 and Recent 10 songs.",file=discord.File(image_path), mention_author=False)
-
-            os.remove(image_path)
-
-    async def generate_image(self, player_name, rating, records, records2, avg_rating):
-        bg_image = Image.open("./photo/BG.png")
-        draw = ImageDraw.Draw(bg_image)
-        font_path = "./fonts/ArialUnicodeMS.ttf"
-        font_path_bold = "./fonts/ArialUnicodeBold.ttf"
-        font = ImageFont.truetype(font_path, size=15)
-        font_info = ImageFont.truetype(font_path_bold, size=50)
-        font_score_scoreinfo = ImageFont.truetype(font_path_bold, size=45)
-        font_score_info = ImageFont.truetype(font_path_bold, size=30)
-        font_score_name_info = ImageFont.truetype(font_path_bold, size=22)
-        font_score_const_info = ImageFont.truetype(font_path_bold, size=20)
-        font_score_place_info = ImageFont.truetype(font_path_bold, size=16)
-        now_utc = datetime.utcnow()
-        now_jst = now_utc + timedelta(hours=9)
-        date_time_str = now_jst.strftime("%Y-%m-%d")
-
-        draw.text((602, 181), f"{player_name}", font=font_info, fill="black")
-        draw.text((1280, 181), f"{rating.current:.2f} (MAX: {rating.max:.2f})", font=font_info, fill="black")
-        draw.text((602, 1892), f"{avg_rating:.2f}", font=font_info, fill="black")
-        draw.text((2150, 40), f"Generated: {date_time_str}\nImage generated by \nchuninewbot", font=font_info, fill="black")
-
-        x_offset = 50
-        y_offset = 386
-        max_columns = 5
-        padding = 65
-        image_width = 470 
-        image_height = 170
-
-        async with httpx.AsyncClient() as client:
-            tasks = []
-            for i, record in enumerate(records, start=1):
-                tasks.append(self.process_record("B30", record, i, client, draw, bg_image, x_offset, y_offset, max_columns, padding, image_width, image_height, font_score_place_info, font_score_name_info, font_score_const_info, font_score_scoreinfo))
-
-            await asyncio.gather(*tasks)
-
-            x_offset = 50
-            y_offset = 2057
-            tasks = []
-            for i, record2 in enumerate(records2, start=1):
-                tasks.append(self.process_record("R10", record2, i, client, draw, bg_image, x_offset, y_offset, max_columns, padding, image_width, image_height, font_score_place_info, font_score_name_info, font_score_const_info, font_score_scoreinfo))
-
-            await asyncio.gather(*tasks)
-
-        return bg_image
-
-    async def process_record(self, recordname, record, i, client, draw, bg_image, x_offset, y_offset, max_columns, padding, image_width, image_height, font_score_place_info, font_score_name_info, font_score_const_info, font_score_scoreinfo):
-        difficulty = record.difficulty
-        internal_level = record.extras.get(KEY_INTERNAL_LEVEL)
-        rating = record.extras.get(KEY_PLAY_RATING)
-        rating_str = f"{rating:.3f}"[:5] if rating >= 10 else f"{rating:.3f}"[:4]
-
-        difficulty_image = difficulty_image_paths.get(difficulty) 
-        
-        try:
-            song_image = Image.open(difficulty_image)
-        except:
-            song_image = Image.open("./photo/ERROR.png")
 
-        try:
-            response = await client.get(record.jacket)
-            song_jacket = Image.open(BytesIO(response.content))
-            song_jacket = song_jacket.resize((135, 135))
-        except:
-            song_jacket = Image.open("./photo/JACKETERROR.png")
-            song_jacket = song_jacket.resize((135, 135))
-
-        song_draw = ImageDraw.Draw(song_image)
-        song_image.paste(song_jacket, (17, 17))
-        song_draw.text((2, -4), f"#{i}", font=font_score_place_info, fill="white")
-        song_draw.text((166, 35), f"{record.title}", font=font_score_name_info, fill="white")
-        song_draw.text((166, 4), f"Const {internal_level}", font=font_score_const_info, fill="white")
-        song_draw.text((346, 4), f"Rating {rating_str}", font=font_score_const_info, fill="white")
-        song_draw.text((165, 55), f"{record.score:,}", font=font_score_scoreinfo, fill="white")
-
-        rank_image = rank_image_paths.get(record.rank)
-        rank_image = Image.open(rank_image)
-        rank_image = rank_image.resize((96, 27))
-
-        if recordname == "B30":
-            song_image.paste(rank_image, (264, 125))
-        else:
-            song_image.paste(rank_image, (166, 125))
-
-        if record.combo_lamp != ComboType.NONE:
-            if record.combo_lamp == ComboType.FULL_COMBO:
-                icon_image = "./photo/icon_fullcombo.png"
-            elif record.combo_lamp == ComboType.ALL_JUSTICE:
-                icon_image = "./photo/icon_alljustice.png"
-            elif record.combo_lamp == ComboType.ALL_JUSTICE_CRITICAL:
-                icon_image = "./photo/icon_alljusticecritical.png"
+            phase_start = time.perf_counter()
+            image = await self.generate_image(
+                player_name,
+                rating,
+                recordsb30,
+                recordsr10,
+                avg_rating,
+                deadline=interaction_deadline(ctx),
+            )
+            timings["render"] = time.perf_counter() - phase_start
+            phase_start = time.perf_counter()
+
+            await ctx.reply(
+                f"Image of {player_name}'s Best 30 and Recent 10 songs.",
+                file=discord.File(
+                    io.BytesIO(image.data), filename=f"b30.{image.filename_extension}"
+                ),
+                mention_author=False,
+            )
+            timings["upload"] = time.perf_counter() - phase_start
+
+        logger.info(
+            "Generated B30 image for %d in %.0fms (%s), %s %.1f KiB encoded in %.0fms",
+            user.id if user else ctx.author.id,
+            sum(timings.values()) * 1000,
+            ", ".join(
+                f"{phase} {elapsed * 1000:.0f}ms" for phase, elapsed in timings.items()
+            ),
+            image.format.upper(),
+            len(image.data) / 1024,
+            image.encode_time * 1000,
+        )
+
+    async def _fill_lamps(
+        self,
+        client: "ChuniNet",
+        records: list[Record],
+        limited: Callable[[Awaitable[Any]], Awaitable[Any]],
+    ) -> None:
+        """Fill in clear and combo lamps, which the best 30 page does not show.
+
+        Records sharing a level are looked up from that level's folder in a single
+        request, the rest are fetched one song at a time.
+        """
+        by_level: dict[str, list[Record]] = {}
+        singles: list[Record] = []
+
+        for record in records:
+            level = record.extras.get(KEY_LEVEL)
+
+            if level is None:
+                singles.append(record)
             else:
-                raise ArgumentError(None, "Invalid combo lamp")
+                by_level.setdefault(level, []).append(record)
+
+        for level, level_records in list(by_level.items()):
+            if len(level_records) < 2:
+                singles.extend(by_level.pop(level))
+
+        async def fill_from_folder(level: str, level_records: list[Record]):
+            folder = await limited(client.music_record_by_folder(level=level))
+            lamps = {
+                (r.extras.get(KEY_SONG_ID), r.difficulty): (r.clear_lamp, r.combo_lamp)
+                for r in folder
+            }
+
+            for record in level_records:
+                key = (record.extras.get(KEY_SONG_ID), record.difficulty)
+
+                if key in lamps:
+                    record.clear_lamp, record.combo_lamp = lamps[key]
+                else:
+                    await fill_from_music_record(record)
+
+        async def fill_from_music_record(record: Record):
+            song_id = record.extras.get(KEY_SONG_ID)
+            if song_id is None:
+                return
 
-            icon_image = Image.open(icon_image)
-            icon_image = icon_image.resize((96, 27))
-            song_image.paste(icon_image, (362, 125))
+            music_records = await limited(client.music_record(song_id))
+            music_record = next(
+                (x for x in music_records if x.difficulty == record.difficulty), None
+            )
 
-        if record.clear_lamp != ClearType.FAILED:
-            clear_image = icon_image_paths.get(record.clear_lamp)
-            clear_image = Image.open(clear_image)
-            clear_image = clear_image.resize((96, 27))
-            song_image.paste(clear_image, (166, 125))
+            if music_record is not None:
+                record.clear_lamp = music_record.clear_lamp
+                record.combo_lamp = music_record.combo_lamp
 
-        col = (i - 1) % max_columns
-        row = (i - 1) // max_columns
-        x = x_offset + col * (image_width + padding)
-        y = y_offset + row * (image_height + padding)
+        await asyncio.gather(
+            *(
+                fill_from_folder(level, level_records)
+                for level, level_records in by_level.items()
+            ),
+            *(fill_from_music_record(record) for record in singles),
+        )
 
-        bg_image.paste(song_image, (x, y))
+    async def generate_image(
+        self,
+        player_name,
+        rating,
+        records,
+        records2,
+        avg_rating,
+        *,
+        deadline: Optional[float] = None,
+    ) -> EncodedImage:
+        urls = list(
+            {record.jacket for record in [*records, *records2] if record.jacket}
+        )
+        tiles = await asyncio.gather(*(self.jackets.get(url) for url in urls))
+        jackets = {url: tile for url, tile in zip(urls, tiles) if tile is not None}
+
+        return await self.bot.render_pool.run(
+            functools.partial(
+                render_b30_image,
+                format=config.render.image_format,
+                quality=config.render.image_quality,
+                optimize=config.render.png_optimize,
+            ),
+            player_name,
+            rating,
+            records,
+            records2,
+            avg_rating,
+            jackets,
+            deadline=deadline,
+        )
 
     @commands.hybrid_command(name="recent", aliases=["rs"])
     async def recent(
@@ -389,7 +399,12 @@ class RecordsCog(commands.Cog, name="Records"):
                 if jacket.jacket_url in {x.thumbnail.url, x.image.url}
             )
             userinfo = await client.authenticate()
-            records = await client.music_record(song.id)
+            records = await self.utils.song_records(
+                client,
+                ctx.author.id if user is None else user.id,
+                userinfo.last_play_date,
+                song.id,
+            )
 
             if len(records) == 0:
                 await ctx.reply(
@@ -507,7 +522,12 @@ class RecordsCog(commands.Cog, name="Records"):
                 raise commands.BadArgument(msg)
 
             userinfo = await client.authenticate()
-            records = await client.music_record(song.id)
+            records = await self.utils.song_records(
+                client,
+                ctx.author.id if user is None else user.id,
+                userinfo.last_play_date,
+                song.id,
+            )
 
             if len(records) == 0:
                 await ctx.reply(
@@ -640,11 +660,15 @@ class RecordsCog(commands.Cog, name="Records"):
                 "Difficulty must be set if genre or rank is set."
             )
 
-        async with self.utils.chuninet(
-            interaction.user.id if user is None else user.id
-        ) as client:
-            records = await client.music_record_by_folder(
-                level=level, genre=genre, difficulty=difficulty, rank=rank
+        discord_id = interaction.user.id if user is None else user.id
+        async with self.utils.chuninet(discord_id) as client:
+            records = await self.utils.folder_records(
+                client,
+                discord_id,
+                level=level,
+                genre=genre,
+                difficulty=difficulty,
+                rank=rank,
             )
             assert records is not None
 
@@ -840,7 +864,9 @@ class RecordsCog(commands.Cog, name="Records"):
         async with ctx.typing(), self.utils.chuninet(
             ctx if user is None else user.id
         ) as client:
-            records = await client.music_record_by_folder(
+            records = await self.utils.folder_records(
+                client,
+                ctx.author.id if user is None else user.id,
                 level=level,
                 genre=args.genre,
                 difficulty=args.difficulty,
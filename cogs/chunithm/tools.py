@@ -12,12 +12,10 @@ from sqlalchemy.orm import joinedload
 
 from chunithm_net.models.enums import Rank
 from database.models import Chart
-from utils import did_you_mean_text, floor_to_ndp, round_to_nearest
-from utils.calculation.overpower import (
-    calculate_overpower_base,
-    calculate_overpower_max,
-)
-from utils.calculation.rating import calculate_rating, calculate_score_for_rating
+from utils import did_you_mean_text, floor_to_ndp
+from utils.calculation.overpower import calculate_overpower_max
+from utils.calculation.rating import calculate_score_for_rating
+from utils.calculation.rating_table import rating_table
 from utils.components import ChartCardEmbed
 from utils.constants import MAX_DIFFICULTY, SIMILARITY_THRESHOLD
 
@@ -106,11 +104,12 @@ class ToolsCog(commands.Cog, name="Tools"):
             msg = f"Chart constant must be between 1 and {MAX_DIFFICULTY}."
             raise commands.BadArgument(msg)
 
+        table = rating_table(0 if chart_constant is None else chart_constant)
+        rating = table.ratings([score])[0]
+
         if chart_constant is None:
-            rating = calculate_rating(score, 0)
             const_text = ""
         else:
-            rating = calculate_rating(score, chart_constant)
             const_text = f" on a chart with chart constant **{chart_constant}**"
 
         sign = ""
@@ -126,7 +125,7 @@ class ToolsCog(commands.Cog, name="Tools"):
             elif score < 500000:
                 res += f"\n• OVER POWER: **0.00 / {floor_to_ndp(overpower_max, 2)} (0.00%)**"
             else:
-                overpower_base = calculate_overpower_base(score, chart_constant)
+                overpower_base = table.overpower_bases([score])[0]
                 res += "\n• OVER POWER:"
                 if score >= 1000000:
                     overpower = overpower_base + Decimal(1)
@@ -180,12 +179,12 @@ class ToolsCog(commands.Cog, name="Tools"):
             )
         overpower_max = calculate_overpower_max(chart_constant)
         if mode == "aj":
-            rating = calculate_rating(1010000, chart_constant)
             res += f"\n1010000 | {overpower_max:>5.2f} = 100.00%"
 
-        for score in scores:
-            rating = calculate_rating(score, chart_constant)
-            overpower_base = calculate_overpower_base(score, chart_constant)
+        table = rating_table(chart_constant)
+        for score, rating, overpower_base in zip(
+            scores, table.ratings(scores), table.overpower_bases(scores)
+        ):
             if score >= Rank.SS.min_score:
                 overpower = overpower_base + Decimal(1)
                 overpower_aj = f"{floor_to_ndp(overpower / overpower_max * 100, 2)}%"
@@ -350,17 +349,20 @@ class ToolsCog(commands.Cog, name="Tools"):
             for chart in charts:
                 assert chart.const is not None
 
-                target_score = calculate_score_for_rating(max_rating, chart.const)
-                if target_score is None:
+                target_score = rating_table(chart.const).min_score(max_rating)
+                if target_score is None or target_score >= 1_009_000:
                     target_score = 1_009_000
-                elif 0 <= target_score < 1_000_000:
-                    target_score = round_to_nearest(target_score, 5000)
-                elif target_score < 1_006_000:
-                    target_score = round_to_nearest(target_score, 2500)
-                elif target_score < 1_008_500:
-                    target_score = round_to_nearest(target_score, 1000)
-                elif target_score < 1_009_000:
-                    target_score = round_to_nearest(target_score, 500)
+                else:
+                    # Round up to a memorable score that still reaches the rating.
+                    if target_score < 1_000_000:
+                        step = 5000
+                    elif target_score < 1_006_000:
+                        step = 2500
+                    elif target_score < 1_008_500:
+                        step = 1000
+                    else:
+                        step = 500
+                    target_score = min(-(-target_score // step) * step, 1_009_000)
 
                 embeds.append(ChartCardEmbed(chart, target_score=target_score))
             await ctx.reply(embeds=embeds, mention_author=False)
@@ -1,10 +1,12 @@
+import time
 import traceback
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Optional, cast
+from weakref import WeakKeyDictionary
 
 import aiohttp
 import discord
 import httpx
-from discord import Webhook
+from discord import Webhook, app_commands
 from discord.ext import commands
 from discord.ext.commands import Context
 
@@ -17,6 +19,7 @@ from chunithm_net.exceptions import (
 )
 from utils.config import config
 from utils.logging import logger
+from utils.types import RenderExpired, RenderQueueFull
 
 if TYPE_CHECKING:
     from bot import ChuniBot
@@ -25,10 +28,72 @@ if TYPE_CHECKING:
 class EventsCog(commands.Cog, name="Events"):
     def __init__(self, bot: "ChuniBot") -> None:
         self.bot = bot
+        # When each running command was invoked.
+        self._command_started: WeakKeyDictionary[Context, float] = WeakKeyDictionary()
+        self._previous_tree_error = bot.tree.on_error
+
+    async def cog_load(self) -> None:
+        self.bot.tree.on_error = self._on_tree_error
+
+    async def cog_unload(self) -> None:
+        self.bot.tree.on_error = self._previous_tree_error
+
+    def _observe_command(self, ctx: Context, status: str) -> None:
+        if self.bot.metrics is None or ctx.command is None:
+            return
+
+        name = ctx.command.qualified_name
+        self.bot.metrics.commands.inc(name, status)
+
+        if (started := self._command_started.pop(ctx, None)) is not None:
+            self.bot.metrics.command_duration.observe(
+                time.perf_counter() - started, name
+            )
+
+    def _observe_app_command(
+        self,
+        interaction: discord.Interaction,
+        command: Optional[app_commands.Command | app_commands.ContextMenu],
+        status: str,
+    ) -> None:
+        # Hybrid commands are observed as text commands.
+        if (
+            self.bot.metrics is None
+            or command is None
+            or getattr(command, "__commands_is_hybrid_app_command__", False)
+        ):
+            return
+
+        name = command.qualified_name
+        self.bot.metrics.commands.inc(name, status)
+        # Nothing is dispatched when an app command starts, so this is timed
+        # from when the user sent it.
+        self.bot.metrics.command_duration.observe(
+            (discord.utils.utcnow() - interaction.created_at).total_seconds(), name
+        )
+
+    async def _on_tree_error(
+        self, interaction: discord.Interaction, error: app_commands.AppCommandError
+    ) -> None:
+        self._observe_app_command(interaction, interaction.command, "error")
+        await self._previous_tree_error(interaction, error)
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(
+        self,
+        interaction: discord.Interaction,
+        command: app_commands.Command | app_commands.ContextMenu,
+    ):
+        self._observe_app_command(interaction, command, "success")
 
     @commands.Cog.listener()
     async def on_command(self, ctx: Context):
-        pass
+        if self.bot.metrics is not None:
+            self._command_started[ctx] = time.perf_counter()
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx: Context):
+        self._observe_command(ctx, "success")
 
     @commands.Cog.listener()
     async def on_command_error(
@@ -36,6 +101,8 @@ class EventsCog(commands.Cog, name="Events"):
         ctx: Context,
         error: commands.errors.CommandInvokeError,
     ):
+        self._observe_command(ctx, "error")
+
         if isinstance(error, commands.CommandNotFound):
             return None
 
@@ -43,6 +110,10 @@ class EventsCog(commands.Cog, name="Events"):
         while hasattr(exc, "original"):
             exc = exc.original  # type: ignore[reportGeneralTypeIssues]
 
+        if isinstance(exc, RenderExpired):
+            # The interaction can't be responded to anymore.
+            return None
+
         embed = discord.Embed(
             color=discord.Color.red(),
             title="Error",
@@ -99,6 +170,9 @@ class EventsCog(commands.Cog, name="Events"):
         ):
             embed.description = str(error)
 
+        if isinstance(exc, RenderQueueFull):
+            embed.description = "Too many images are being generated right now. Please try again in a bit."
+
         if isinstance(exc, httpx.TimeoutException):
             embed.description = "Timed out trying to connect to CHUNITHM-NET."
 
@@ -1,4 +1,6 @@
 import asyncio
+import copy
+import io
 import platform
 import time
 from pathlib import Path
@@ -15,6 +17,7 @@ from sqlalchemy import delete, func, select
 from database.models import Cookie, Prefix
 from utils.config import config
 from utils.constants import VERSION_NAMES
+from utils.profiler import ProfileMode, profile
 
 if TYPE_CHECKING:
     from bot import ChuniBot
@@ -66,6 +69,140 @@ class MiscCog(commands.Cog, name="Miscellaneous"):
 
         await ctx.send(f"Synced the tree to {ret}/{len(guilds)}.")
 
+    @commands.command("reloadcatalog", hidden=True)
+    @commands.is_owner()
+    async def reload_catalog(self, ctx: Context["ChuniBot"]) -> None:
+        """Picks up song database changes made by dbutils."""
+        async with ctx.typing():
+            await self.utils.reload_catalog()
+            await self.utils._reload_alias_cache()
+
+        await ctx.send(f"Loaded {len(self.utils.catalog)} songs.")
+
+    @commands.group("debug", hidden=True, invoke_without_command=True)
+    @commands.is_owner()
+    async def debug(self, ctx: Context["ChuniBot"]) -> None:
+        await ctx.send_help(ctx.command)
+
+    @debug.command("loop")
+    @commands.is_owner()
+    async def debug_loop(
+        self, ctx: Context["ChuniBot"], stall: Optional[int] = None
+    ) -> None:
+        """Shows event loop lag and recent stalls.
+
+        Parameters
+        ----------
+        stall: Optional[int]
+            Number of a stall to show the full stack of.
+        """
+        watchdog = self.bot.loop_watchdog
+        stats = watchdog.stats
+        # Stalls are numbered from the first one caught, newest first here.
+        numbered = list(zip(range(stats.stalls, 0, -1), reversed(watchdog.stalls)))
+
+        if stall is not None:
+            if (found := dict(numbered).get(stall)) is None:
+                msg = "No such stall, it may have been forgotten already."
+                raise commands.BadArgument(msg)
+
+            await ctx.reply(
+                f"Stall #{stall}, {found.duration:.2f}s in {found.task or 'unknown task'}, "
+                f"running {found.command or 'no command'}",
+                file=discord.File(
+                    io.BytesIO("".join(found.stack).encode()),
+                    filename=f"stall-{stall}.txt",
+                ),
+                mention_author=False,
+            )
+            return
+
+        lines = [
+            (
+                f"Lag: {stats.mean_lag * 1000:.1f}ms avg, "
+                f"{stats.max_lag * 1000:.1f}ms max over {stats.samples} heartbeats"
+            )
+        ]
+
+        if (quantiles := stats.recent_quantiles()) is not None:
+            p50, p99, highest = quantiles
+            window = len(stats.recent_lags) * watchdog.interval
+            window_str = (
+                f"{window / 60:.0f} minutes"
+                if window >= 60
+                else f"{window:.0f} seconds"
+            )
+            lines.append(
+                f"Last {window_str}: {p50 * 1000:.1f}ms p50, "
+                f"{p99 * 1000:.1f}ms p99, {highest * 1000:.1f}ms max"
+            )
+
+        if watchdog.threshold is None:
+            lines.append("Stall capture is disabled.")
+        else:
+            lines.append(
+                f"Stalls over {watchdog.threshold:.2f}s: {stats.stalls}, "
+                f"{stats.stalled_time:.2f}s blocked in total"
+            )
+
+        for number, recent in numbered[:5]:
+            # The innermost frame, without its source line.
+            where = recent.stack[-1].strip().split("\n", 1)[0] if recent.stack else "?"
+            lines.append(
+                f"\n#{number} {discord.utils.format_dt(recent.started_at, 'R')}, "
+                f"{recent.duration:.2f}s{'' if recent.finished else ' so far'}, "
+                f"{recent.command or 'no command'}\n`{where}`"
+            )
+
+        await ctx.reply("\n".join(lines)[:2000], mention_author=False)
+
+    @debug.command("profile")
+    @commands.is_owner()
+    @commands.max_concurrency(1)
+    async def debug_profile(
+        self,
+        ctx: Context["ChuniBot"],
+        mode: Optional[ProfileMode] = None,
+        *,
+        command: str,
+    ) -> None:
+        """Runs a command under a profiler, and attaches the results.
+
+        Parameters
+        ----------
+        mode: Optional[ProfileMode]
+            `sample` (the default) attaches collapsed stacks for flame graph
+            tools, `trace` attaches cProfile data for pstats.
+        command: str
+            The command to run, with its arguments and without the prefix.
+        """
+        message = copy.copy(ctx.message)
+        message.content = f"{ctx.prefix}{command}"
+        new_ctx = await self.bot.get_context(message, cls=type(ctx))
+
+        if new_ctx.command is None:
+            msg = f"There is no command called {new_ctx.invoked_with}."
+            raise commands.BadArgument(msg)
+        if (new_ctx.command.root_parent or new_ctx.command) is self.debug:
+            msg = "Debug commands cannot be profiled."
+            raise commands.BadArgument(msg)
+
+        result = await profile(self.bot.invoke(new_ctx), mode=mode or "sample")
+
+        breakdown = ", ".join(
+            f"{category} {seconds / result.wall_time:.0%}"
+            for category, seconds in result.breakdown.items()
+        )
+        await ctx.reply(
+            f"`{new_ctx.command.qualified_name}` took {result.wall_time:.2f}s: "
+            f"{breakdown or 'nothing sampled'}",
+            file=discord.File(
+                io.BytesIO(result.data),
+                filename=f"{new_ctx.command.qualified_name.replace(' ', '-')}.{result.extension}",
+            ),
+            mention_author=False,
+        )
+
     @commands.hybrid_command("source", aliases=["src"])
     async def source(self, ctx: Context):
         """Get the source code for this bot."""
@@ -158,6 +295,58 @@ class MiscCog(commands.Cog, name="Miscellaneous"):
         embed.add_field(name="Total users", value=str(users))
         embed.add_field(name="\u200B", value="\u200B")
 
+        transport_stats = self.bot.chuninet_transport.stats
+        reauthentications = self.bot.chuninet_reauthentications
+        if (breaker := self.bot.chuninet_transport.breaker) is not None:
+            breaker_state = (
+                f"{breaker.state.replace('_', '-')}, opened {breaker.stats.opened} "
+                f"times, {breaker.stats.rejected} requests turned away"
+            )
+        else:
+            breaker_state = "disabled"
+        embed.add_field(
+            name="CHUNITHM-NET connections",
+            value=(
+                f"{transport_stats.requests} requests, "
+                f"{transport_stats.reused_connections} on reused connections "
+                f"({transport_stats.reuse_ratio:.0%}), "
+                f"{transport_stats.new_connections} new connections, "
+                f"{transport_stats.http2_requests} over HTTP/2\n"
+                f"Circuit breaker {breaker_state}\n"
+                f"{reauthentications.total()} re-logins for "
+                f"{len(reauthentications)} users"
+            ),
+            inline=False,
+        )
+
+        cache_stats = self.bot.chuninet_cache.stats
+        cookie_stats = self.utils.cookie_store.stats
+        embed.add_field(
+            name="CHUNITHM-NET cache",
+            value=(
+                f"{cache_stats.hits} hits, {cache_stats.misses} misses "
+                f"({cache_stats.hit_ratio:.0%} hit ratio)\n"
+                f"{cache_stats.entries} entries, {cache_stats.size / 1024 / 1024:.1f} MiB\n"
+                f"Cookie jars: {cookie_stats.hits} hits, "
+                f"{cookie_stats.unchanged} sessions left them unchanged, "
+                f"{cookie_stats.writes} saved in {cookie_stats.flushes} batches"
+            ),
+            inline=False,
+        )
+
+        if (pool := self.bot.parser_pool) is not None:
+            stats = pool.stats
+            embed.add_field(
+                name=f"Parser pool ({pool.kind})",
+                value=(
+                    f"{stats.jobs} jobs, {stats.in_flight} in flight, {stats.failed} failed\n"
+                    f"Queue wait: {stats.mean_queue_wait * 1000:.1f}ms avg, "
+                    f"{stats.max_queue_wait * 1000:.1f}ms max\n"
+                    f"Parse time: {stats.mean_parse_time * 1000:.1f}ms avg"
+                ),
+                inline=False,
+            )
+
         await ctx.reply(embed=embed, mention_author=False)
 
     @commands.hybrid_command("ping")
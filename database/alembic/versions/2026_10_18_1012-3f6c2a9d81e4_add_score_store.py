@@ -0,0 +1,45 @@
+"""Add score store
+
+Revision ID: 3f6c2a9d81e4
+Revises: d701d4d0c04b
+Create Date: 2026-10-18 10:12:41.208315
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f6c2a9d81e4"
+down_revision: Union[str, None] = "d701d4d0c04b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "score_snapshots",
+        sa.Column("discord_id", sa.BigInteger, primary_key=True),
+        sa.Column("song_id", sa.Integer, primary_key=True),
+        sa.Column("difficulty", sa.String, primary_key=True),
+        sa.Column("title", sa.String, nullable=False),
+        sa.Column("score", sa.Integer, nullable=False),
+        sa.Column("rank", sa.Integer, nullable=False),
+        sa.Column("clear_lamp", sa.Integer, nullable=False),
+        sa.Column("combo_lamp", sa.Integer, nullable=False),
+        sa.Column("play_count", sa.Integer, nullable=True),
+        sa.Column("fetched_at", sa.DateTime, nullable=False),
+    )
+    op.create_table(
+        "score_sync_state",
+        sa.Column("discord_id", sa.BigInteger, primary_key=True),
+        sa.Column("last_play_date", sa.DateTime, nullable=False),
+        sa.Column("synced_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("score_sync_state")
+    op.drop_table("score_snapshots")
@@ -0,0 +1,36 @@
+"""Add Kamaitachi imports
+
+Revision ID: b8e05d7c2f19
+Revises: 3f6c2a9d81e4
+Create Date: 2026-10-18 14:31:07.640129
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e05d7c2f19"
+down_revision: Union[str, None] = "3f6c2a9d81e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "kamaitachi_imports",
+        sa.Column("discord_id", sa.BigInteger, primary_key=True),
+        sa.Column("poll_url", sa.String, nullable=False),
+        sa.Column("channel_id", sa.BigInteger, nullable=False),
+        sa.Column("message_id", sa.BigInteger, nullable=False),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("progress", sa.String, nullable=True),
+        sa.Column("started_at", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("kamaitachi_imports")
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from discord.ext import commands
@@ -191,3 +192,54 @@ class GuessScore(Base):
 
     discord_id: Mapped[int] = mapped_column(BigInteger(), primary_key=True)
     score: Mapped[int] = mapped_column(nullable=False)
+
+
+class ScoreSnapshot(Base):
+    __tablename__ = "score_snapshots"
+
+    discord_id: Mapped[int] = mapped_column(BigInteger(), primary_key=True)
+    song_id: Mapped[int] = mapped_column(primary_key=True)
+    # Short form of the difficulty, e.g. "MAS".
+    difficulty: Mapped[str] = mapped_column(primary_key=True)
+
+    title: Mapped[str] = mapped_column(nullable=False)
+    score: Mapped[int] = mapped_column(nullable=False)
+    rank: Mapped[int] = mapped_column(nullable=False)
+    clear_lamp: Mapped[int] = mapped_column(nullable=False)
+    combo_lamp: Mapped[int] = mapped_column(nullable=False)
+    # Only shown on the song's own page, so it is unknown until that is fetched.
+    play_count: Mapped[Optional[int]] = mapped_column(nullable=True)
+
+    # In UTC.
+    fetched_at: Mapped[datetime] = mapped_column(nullable=False)
+
+
+class ScoreSyncState(Base):
+    __tablename__ = "score_sync_state"
+
+    discord_id: Mapped[int] = mapped_column(BigInteger(), primary_key=True)
+
+    # Both in UTC.
+    last_play_date: Mapped[datetime] = mapped_column(nullable=False)
+    synced_at: Mapped[datetime] = mapped_column(nullable=False)
+
+
+class KamaitachiImport(Base):
+    __tablename__ = "kamaitachi_imports"
+
+    # Only the latest import of every user is kept.
+    discord_id: Mapped[int] = mapped_column(BigInteger(), primary_key=True)
+
+    poll_url: Mapped[str] = mapped_column(nullable=False)
+    # The message that progress is reported to.
+    channel_id: Mapped[int] = mapped_column(BigInteger(), nullable=False)
+    message_id: Mapped[int] = mapped_column(BigInteger(), nullable=False)
+
+    # "ongoing", "completed" or "failed".
+    status: Mapped[str] = mapped_column(nullable=False)
+    # Latest progress reported by Kamaitachi, or the result once finished.
+    progress: Mapped[Optional[str]] = mapped_column(nullable=True)
+
+    # Both in UTC.
+    started_at: Mapped[datetime] = mapped_column(nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(nullable=False)
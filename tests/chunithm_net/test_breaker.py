@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+from zoneinfo import ZoneInfo
+
+from chunithm_net.breaker import CircuitBreaker, in_scheduled_maintenance
+from chunithm_net.exceptions import MaintenanceException
+
+JST = ZoneInfo("Asia/Tokyo")
+DAYTIME = datetime(2024, 7, 1, 15, 0, tzinfo=JST)
+MAINTENANCE = datetime(2024, 7, 1, 3, 0, tzinfo=JST)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def make_breaker(clock: FakeClock, now: datetime = DAYTIME) -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=3,
+        cooldown=30,
+        maintenance_cooldown=120,
+        clock=clock,
+        now=lambda: now,
+    )
+
+
+def test_in_scheduled_maintenance():
+    assert in_scheduled_maintenance(MAINTENANCE)
+    assert in_scheduled_maintenance(
+        datetime(2024, 6, 30, 17, 0, tzinfo=ZoneInfo("UTC"))
+    )
+    assert not in_scheduled_maintenance(DAYTIME)
+    assert not in_scheduled_maintenance(datetime(2024, 7, 1, 7, 0, tzinfo=JST))
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    for _ in range(2):
+        breaker.acquire()
+        breaker.record_failure()
+
+    # A success in between resets the count.
+    breaker.acquire()
+    breaker.record_success()
+
+    for _ in range(2):
+        breaker.acquire()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    with pytest.raises(MaintenanceException):
+        breaker.acquire()
+
+    assert breaker.stats.opened == 1
+    assert breaker.stats.rejected == 1
+
+
+def test_breaker_lets_a_single_probe_through():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    breaker.acquire()
+    breaker.record_maintenance()
+
+    clock.time = 29
+    with pytest.raises(MaintenanceException):
+        breaker.acquire()
+
+    clock.time = 30
+    breaker.acquire()
+    assert breaker.state == "half_open"
+
+    # Everyone else waits for the probe.
+    with pytest.raises(MaintenanceException):
+        breaker.acquire()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.stats.opened == 2
+
+    clock.time = 60
+    breaker.acquire()
+    breaker.record_success()
+
+    assert breaker.state == "closed"
+    breaker.acquire()
+
+
+def test_breaker_hands_probe_over_when_released():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    breaker.acquire()
+    breaker.record_maintenance()
+
+    clock.time = 30
+    breaker.acquire()
+    breaker.release()
+
+    # The probe was cancelled, so the next request gets to probe.
+    breaker.acquire()
+    assert breaker.state == "half_open"
+
+
+def test_breaker_during_scheduled_maintenance():
+    clock = FakeClock()
+    breaker = make_breaker(clock, MAINTENANCE)
+
+    breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.time = 30
+    with pytest.raises(MaintenanceException):
+        breaker.acquire()
+
+    clock.time = 120
+    breaker.acquire()
+    assert breaker.state == "half_open"
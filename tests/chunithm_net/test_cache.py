@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta, timezone
+from http.cookiejar import LWPCookieJar
+from pathlib import Path
+
+import pytest
+from pytest_httpx import HTTPXMock
+
+from chunithm_net import ChuniNet, cache
+from chunithm_net.cache import MISSING, ResponseCache
+from chunithm_net.consts import KEY_SONG_ID
+
+BASE_DIR = Path(__file__).parent
+
+
+@pytest.fixture
+def response_cache() -> ResponseCache:
+    return ResponseCache({"best30": 60, "player_data": 60})
+
+
+def test_cache_returns_copies(response_cache: ResponseCache):
+    response_cache.put(1, ("best30",), [{"score": 1_000_000}])
+
+    first = response_cache.get(1, ("best30",))
+    first[0]["score"] = 0
+
+    assert response_cache.get(1, ("best30",)) == [{"score": 1_000_000}]
+    assert response_cache.stats.hits == 2
+
+
+def test_cache_is_partitioned_by_user(response_cache: ResponseCache):
+    response_cache.put(1, ("best30",), "alice")
+
+    assert response_cache.get(2, ("best30",)) is MISSING
+    assert response_cache.stats.misses == 1
+
+
+def test_cache_skips_endpoints_without_ttl(response_cache: ResponseCache):
+    response_cache.put(1, ("recent10",), [])
+
+    assert response_cache.get(1, ("recent10",)) is MISSING
+    assert response_cache.stats.entries == 0
+
+
+def test_cache_expires_entries(
+    response_cache: ResponseCache, monkeypatch: pytest.MonkeyPatch
+):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    response_cache.put(1, ("best30",), [])
+
+    now += 59
+    assert response_cache.get(1, ("best30",)) == []
+
+    now += 1
+    assert response_cache.get(1, ("best30",)) is MISSING
+    assert response_cache.stats.entries == 0
+    assert response_cache.stats.size == 0
+
+
+def test_cache_evicts_least_recently_used():
+    response_cache = ResponseCache({"music_record": 60}, max_entries=2)
+
+    response_cache.put(1, ("music_record", 1), [])
+    response_cache.put(1, ("music_record", 2), [])
+    response_cache.get(1, ("music_record", 1))
+    response_cache.put(1, ("music_record", 3), [])
+
+    assert response_cache.get(1, ("music_record", 1)) == []
+    assert response_cache.get(1, ("music_record", 2)) is MISSING
+    assert response_cache.stats.evictions == 1
+
+
+def test_cache_respects_size_limit():
+    response_cache = ResponseCache({"music_record": 60}, max_size=1024)
+
+    for idx in range(10):
+        response_cache.put(1, ("music_record", idx), "x" * 300)
+
+    assert response_cache.stats.size <= 1024
+    assert response_cache.get(1, ("music_record", 9)) is not MISSING
+
+
+def test_cache_invalidates_on_newer_last_play_date(response_cache: ResponseCache):
+    played_at = datetime(2024, 1, 1, 12, 0)  # noqa: DTZ001
+
+    response_cache.observe_last_play_date(1, played_at)
+    response_cache.put(1, ("best30",), [])
+    response_cache.put(2, ("best30",), [])
+
+    response_cache.observe_last_play_date(1, played_at)
+    assert response_cache.get(1, ("best30",)) == []
+
+    response_cache.observe_last_play_date(1, played_at + timedelta(minutes=10))
+    assert response_cache.get(1, ("best30",)) is MISSING
+    assert response_cache.get(2, ("best30",)) == []
+
+
+def test_cache_invalidates_entries_from_before_first_last_play_date(
+    response_cache: ResponseCache,
+):
+    response_cache.put(1, ("best30",), [])
+    assert response_cache.has(1, ("best30",))
+
+    response_cache.observe_last_play_date(1, datetime(2024, 1, 1, 12, 0))  # noqa: DTZ001
+    assert not response_cache.has(1, ("best30",))
+
+
+@pytest.mark.asyncio
+async def test_client_serves_cached_responses(httpx_mock: HTTPXMock):
+    with (BASE_DIR / "assets" / "best30.html").open("rb") as f:
+        httpx_mock.add_response(
+            method="GET",
+            url="https://chunithm-net-eng.com/mobile/home/playerData/ratingDetailBest/",
+            status_code=200,
+            content=f.read(),
+        )
+
+    response_cache = ResponseCache({"best30": 60})
+
+    async with ChuniNet(LWPCookieJar(), cache=response_cache.for_user(1)) as client:
+        fresh = await client.best30()
+        fresh[0].score = 0
+
+        cached = await client.best30()
+
+    assert len(httpx_mock.get_requests()) == 1
+    assert cached[0].title == "Aleph-0"
+    assert cached[0].score == 1005037
+    assert cached[0].extras.get(KEY_SONG_ID) == fresh[0].extras.get(KEY_SONG_ID)
+    assert response_cache.stats.hits == 1
+    assert response_cache.stats.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_client_invalidates_cache_after_new_play(httpx_mock: HTTPXMock):
+    with (BASE_DIR / "assets" / "logged_in_homepage.html").open("rb") as f:
+        httpx_mock.add_response(
+            method="GET",
+            url="https://chunithm-net-eng.com/mobile/home/",
+            status_code=200,
+            content=f.read(),
+        )
+
+    response_cache = ResponseCache({"best30": 60})
+    response_cache.observe_last_play_date(1, datetime(2000, 1, 1, tzinfo=timezone.utc))
+    response_cache.put(1, ("best30",), [])
+
+    async with ChuniNet(LWPCookieJar(), cache=response_cache.for_user(1)) as client:
+        await client.authenticate()
+
+    assert response_cache.get(1, ("best30",)) is MISSING
+    assert response_cache.stats.invalidations == 1
+
+
+@pytest.mark.asyncio
+async def test_client_checks_last_play_date_before_serving_cache(
+    httpx_mock: HTTPXMock,
+):
+    with (BASE_DIR / "assets" / "logged_in_homepage.html").open("rb") as f:
+        httpx_mock.add_response(
+            method="GET",
+            url="https://chunithm-net-eng.com/mobile/home/",
+            status_code=200,
+            content=f.read(),
+        )
+    with (BASE_DIR / "assets" / "best30.html").open("rb") as f:
+        httpx_mock.add_response(
+            method="GET",
+            url="https://chunithm-net-eng.com/mobile/home/playerData/ratingDetailBest/",
+            status_code=200,
+            content=f.read(),
+        )
+
+    response_cache = ResponseCache({"best30": 60})
+    response_cache.observe_last_play_date(1, datetime(2000, 1, 1, tzinfo=timezone.utc))
+    response_cache.put(1, ("best30",), [])
+
+    # A command that never authenticates, like c>b30.
+    async with ChuniNet(LWPCookieJar(), cache=response_cache.for_user(1)) as client:
+        records = await client.best30()
+
+    assert [r.url.path for r in httpx_mock.get_requests()] == [
+        "/mobile/home/",
+        "/mobile/home/playerData/ratingDetailBest/",
+    ]
+    assert records[0].title == "Aleph-0"
+    assert response_cache.stats.invalidations == 1
@@ -1,9 +1,12 @@
+import asyncio
+import re
 import string
 from datetime import timedelta
 from http.cookiejar import Cookie, LWPCookieJar
 from pathlib import Path
 from random import choices
 
+import httpx
 import pytest
 from pytest_httpx import HTTPXMock
 
@@ -796,3 +799,69 @@ async def test_client_can_rename(
 
     async with ChuniNet(jar) as client:
         assert await client.change_player_name("new name") is True
+
+
+@pytest.mark.asyncio
+async def test_client_reauthenticates_once_for_concurrent_requests(
+    httpx_mock: HTTPXMock,
+    jar: LWPCookieJar,
+):
+    logins = 0
+    logged_in = False
+
+    with (BASE_DIR / "assets" / "200004.html").open("rb") as f:
+        error_page = f.read()
+    with (BASE_DIR / "assets" / "best30.html").open("rb") as f:
+        best30_page = f.read()
+    with (BASE_DIR / "assets" / "logged_in_homepage.html").open("rb") as f:
+        homepage = f.read()
+
+    def rating_detail(request: httpx.Request) -> httpx.Response:
+        if not logged_in:
+            return httpx.Response(
+                302, headers={"Location": "https://chunithm-net-eng.com/mobile/error/"}
+            )
+
+        return httpx.Response(200, content=best30_page)
+
+    async def login(request: httpx.Request) -> httpx.Response:
+        nonlocal logins, logged_in
+
+        logins += 1
+        # Give the other requests time to find out that the session expired.
+        await asyncio.sleep(0.05)
+        logged_in = True
+
+        return httpx.Response(
+            302, headers={"Location": "https://chunithm-net-eng.com/mobile/home/"}
+        )
+
+    httpx_mock.add_callback(
+        rating_detail,
+        url=re.compile(r"https://chunithm-net-eng\.com/mobile/home/playerData/.*"),
+        is_reusable=True,
+    )
+    httpx_mock.add_response(
+        url="https://chunithm-net-eng.com/mobile/error/",
+        content=error_page,
+        is_reusable=True,
+    )
+    httpx_mock.add_callback(
+        login,
+        url=re.compile(r"https://lng-tgk-aime-gw\.am-all\.net/common_auth/login.*"),
+        is_reusable=True,
+    )
+    httpx_mock.add_response(
+        url="https://chunithm-net-eng.com/mobile/home/",
+        content=homepage,
+        is_reusable=True,
+    )
+
+    async with ChuniNet(jar) as client:
+        results = await asyncio.gather(
+            client.best30(), client.recent10(), client.best30()
+        )
+
+        assert logins == 1
+        assert client.reauthentications == 1
+        assert all(len(records) > 0 for records in results)
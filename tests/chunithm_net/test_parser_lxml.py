@@ -0,0 +1,71 @@
+from http.cookiejar import LWPCookieJar
+from pathlib import Path
+
+import pytest
+from pytest_httpx import HTTPXMock
+
+from chunithm_net import ChuniNet, parser
+from chunithm_net.consts import KEY_SONG_ID
+
+parser_lxml = pytest.importorskip("chunithm_net.parser_lxml")
+
+BASE_DIR = Path(__file__).parent
+
+
+@pytest.fixture
+def jar() -> LWPCookieJar:
+    return LWPCookieJar()
+
+
+# Which parser (and extra arguments) each fixture is meant to go through.
+FIXTURE_PARSERS = {
+    "100001.html": ("parse_error_page", ()),
+    "200004.html": ("parse_error_page", ()),
+    "best30.html": ("parse_music_for_rating", ()),
+    "logged_in_homepage.html": ("parse_player_card_and_avatar", ()),
+    "music_record.html": ("parse_music_record", (428,)),
+    "music_record_by_level_folder.html": ("parse_music_for_rating", ()),
+    "player_data.html": ("parse_player_data", ()),
+    "playlog.html": ("parse_recent_records", ()),
+    "playlog_detail.html": ("parse_detailed_recent_record", ()),
+    "recent10.html": ("parse_music_for_rating", ()),
+    "stupid_way_to_redirect.html": ("parse_music_for_rating", ()),
+    "worlds_end_music_record.html": ("parse_music_record", (8218,)),
+}
+
+
+def test_every_fixture_is_covered():
+    fixtures = {p.name for p in (BASE_DIR / "assets").glob("*.html")}
+
+    assert fixtures == set(FIXTURE_PARSERS)
+
+
+@pytest.mark.parametrize(("fixture", "parser_spec"), FIXTURE_PARSERS.items())
+def test_lxml_parser_matches_bs4_parser(fixture: str, parser_spec):
+    name, args = parser_spec
+    text = (BASE_DIR / "assets" / fixture).read_text(encoding="utf-8")
+
+    expected = getattr(parser, name)(parser.document_fromstring(text), *args)
+    actual = getattr(parser_lxml, name)(parser_lxml.document_fromstring(text), *args)
+
+    assert actual == expected
+
+
+@pytest.mark.asyncio
+async def test_client_uses_selected_parser(httpx_mock: HTTPXMock, jar: LWPCookieJar):
+    with (BASE_DIR / "assets" / "music_record_by_level_folder.html").open("rb") as f:
+        httpx_mock.add_response(
+            method="POST",
+            url="https://chunithm-net-eng.com/mobile/record/musicLevel/sendSearch/",
+            status_code=200,
+            content=f.read(),
+        )
+
+    async with ChuniNet(jar, parser="lxml") as client:
+        assert client._parser is parser_lxml
+
+        records = await client.music_record_by_folder(level="14")
+
+    assert len(records) == 34
+    assert records[0].extras.get(KEY_SONG_ID) == 2184
+    assert records[0].title == "ENDYMION"
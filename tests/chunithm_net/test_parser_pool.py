@@ -0,0 +1,84 @@
+import pickle
+from http.cookiejar import LWPCookieJar
+from pathlib import Path
+
+import pytest
+from pytest_httpx import HTTPXMock
+
+from chunithm_net import ChuniNet
+from chunithm_net._parsing import parse_content
+from chunithm_net.consts import KEY_SONG_ID
+from chunithm_net.parser_pool import ParserPool
+
+BASE_DIR = Path(__file__).parent
+
+
+def test_named_keys_survive_pickling():
+    records = parse_content(
+        "bs4",
+        "parse_music_for_rating",
+        (BASE_DIR / "assets" / "best30.html").read_bytes(),
+        "utf-8",
+    )
+
+    unpickled = pickle.loads(pickle.dumps(records))
+
+    assert unpickled == records
+    assert unpickled[0].extras.get(KEY_SONG_ID) == records[0].extras.get(KEY_SONG_ID)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["thread", "process"])
+async def test_pool_matches_inline_parsing(kind):
+    content = (BASE_DIR / "assets" / "music_record_by_level_folder.html").read_bytes()
+    expected = parse_content("bs4", "parse_music_for_rating", content, "utf-8")
+
+    pool = ParserPool(kind, max_workers=2, max_queue_size=1)
+    try:
+        results = [
+            await pool.parse("bs4", "parse_music_for_rating", content, "utf-8")
+            for _ in range(3)
+        ]
+    finally:
+        pool.shutdown()
+
+    assert all(result == expected for result in results)
+    assert results[0][0].extras.get(KEY_SONG_ID) == 2184
+    assert pool.stats.jobs == 3
+    assert pool.stats.in_flight == 0
+    assert pool.stats.max_queue_wait >= pool.stats.mean_queue_wait >= 0
+
+
+@pytest.mark.asyncio
+async def test_pool_propagates_errors():
+    pool = ParserPool("thread", max_workers=1)
+    try:
+        with pytest.raises(AttributeError):
+            await pool.parse("bs4", "parse_nothing", b"<html></html>", "utf-8")
+    finally:
+        pool.shutdown()
+
+    assert pool.stats.failed == 1
+    assert pool.stats.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_client_parses_in_pool(httpx_mock: HTTPXMock):
+    with (BASE_DIR / "assets" / "music_record.html").open("rb") as f:
+        httpx_mock.add_response(
+            method="POST",
+            url="https://chunithm-net-eng.com/mobile/record/musicGenre/sendMusicDetail/",
+            status_code=200,
+            content=f.read(),
+        )
+
+    pool = ParserPool("thread", max_workers=1)
+    try:
+        async with ChuniNet(LWPCookieJar(), pool=pool) as client:
+            records = await client.music_record(428)
+    finally:
+        pool.shutdown()
+
+    assert len(records) == 2
+    assert records[0].title == records[1].title == "Aleph-0"
+    assert pool.stats.jobs == 1
@@ -0,0 +1,99 @@
+from http.cookiejar import LWPCookieJar
+from pathlib import Path
+
+import pytest
+from pytest_httpx import HTTPXMock
+
+from chunithm_net import ChuniNet, parser
+from chunithm_net._streaming import RecordStream
+from chunithm_net.cache import ResponseCache
+from chunithm_net.consts import KEY_SONG_ID
+from chunithm_net.models.enums import Difficulty
+
+pytest.importorskip("lxml")
+
+BASE_DIR = Path(__file__).parent
+
+
+@pytest.fixture
+def jar() -> LWPCookieJar:
+    return LWPCookieJar()
+
+
+@pytest.mark.parametrize(
+    ("fixture", "page"),
+    [
+        ("playlog.html", "recent_records"),
+        ("best30.html", "music_for_rating"),
+        ("recent10.html", "music_for_rating"),
+        ("music_record_by_level_folder.html", "music_for_rating"),
+        ("stupid_way_to_redirect.html", "music_for_rating"),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 100, 1_000_000])
+def test_record_stream_matches_full_parse(fixture: str, page, chunk_size: int):
+    text = (BASE_DIR / "assets" / fixture).read_text(encoding="utf-8")
+    expected = getattr(parser, f"parse_{page}")(parser.document_fromstring(text))
+
+    stream = RecordStream(page)
+    records = []
+    for i in range(0, len(text), chunk_size):
+        records.extend(stream.feed(text[i : i + chunk_size]))
+    records.extend(stream.close())
+
+    assert records == expected
+
+
+def test_record_stream_yields_records_before_the_page_ends():
+    text = (BASE_DIR / "assets" / "playlog.html").read_text(encoding="utf-8")
+
+    stream = RecordStream("recent_records")
+    first_half = stream.feed(text[: len(text) // 2])
+
+    assert 0 < len(first_half) < 50
+
+
+@pytest.mark.asyncio
+async def test_client_streams_folder(httpx_mock: HTTPXMock, jar: LWPCookieJar):
+    httpx_mock.add_response(
+        method="POST",
+        url="https://chunithm-net-eng.com/mobile/record/musicGenre/sendMaster",
+        content=(
+            BASE_DIR / "assets" / "music_record_by_level_folder.html"
+        ).read_bytes(),
+    )
+    cache = ResponseCache({"music_record_by_folder": 60})
+
+    async with ChuniNet(jar, cache=cache.for_user(1)) as client:
+        records = [
+            r
+            async for r in client.iter_music_record_by_folder(
+                difficulty=Difficulty.MASTER
+            )
+        ]
+        # Served from the cache, which was filled once the page was read.
+        cached = [
+            r
+            async for r in client.iter_music_record_by_folder(
+                difficulty=Difficulty.MASTER
+            )
+        ]
+
+    assert len(records) == 34
+    assert records[0].extras.get(KEY_SONG_ID) == 2184
+    assert cached == records
+
+
+@pytest.mark.asyncio
+async def test_client_streams_recent_record(httpx_mock: HTTPXMock, jar: LWPCookieJar):
+    httpx_mock.add_response(
+        method="GET",
+        url="https://chunithm-net-eng.com/mobile/record/playlog",
+        content=(BASE_DIR / "assets" / "playlog.html").read_bytes(),
+    )
+
+    async with ChuniNet(jar) as client:
+        recents = [r async for r in client.iter_recent_record()]
+
+    text = (BASE_DIR / "assets" / "playlog.html").read_text(encoding="utf-8")
+    assert recents == parser.parse_recent_records(parser.document_fromstring(text))
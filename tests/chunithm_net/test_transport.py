@@ -0,0 +1,100 @@
+import httpx
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from chunithm_net.breaker import CircuitBreaker
+from chunithm_net.exceptions import MaintenanceException
+from chunithm_net.transport import SharedTransport
+
+
+async def maintenance(request: web.Request) -> web.Response:
+    request.app["hits"] += 1
+    return web.Response(status=503)
+
+
+async def whoami(request: web.Request) -> web.Response:
+    response = web.Response(text=request.cookies.get("user", "nobody"))
+
+    if "login" in request.query:
+        response.set_cookie("user", request.query["login"])
+
+    return response
+
+
+@pytest_asyncio.fixture
+async def server():
+    app = web.Application()
+    app["hits"] = 0
+    app.router.add_get("/", whoami)
+    app.router.add_get("/maintenance", maintenance)
+
+    async with TestServer(app) as server:
+        yield server
+
+
+@pytest.mark.asyncio
+async def test_shared_transport_reuses_connections_and_isolates_cookies(
+    server: TestServer,
+):
+    transport = SharedTransport()
+    url = str(server.make_url("/"))
+
+    try:
+        async with httpx.AsyncClient(transport=transport) as alice:
+            assert (await alice.get(url, params={"login": "alice"})).text == "nobody"
+            assert (await alice.get(url)).text == "alice"
+
+        # Closing a client must not close the shared pool.
+        async with httpx.AsyncClient(transport=transport) as bob:
+            assert (await bob.get(url)).text == "nobody"
+    finally:
+        await transport.close()
+
+    assert transport.stats.requests == 3
+    assert transport.stats.new_connections == 1
+    assert transport.stats.reused_connections == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_transport_stops_sending_during_maintenance(server: TestServer):
+    breaker = CircuitBreaker(cooldown=60)
+    transport = SharedTransport(breaker=breaker)
+
+    try:
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get(str(server.make_url("/maintenance")))
+            assert response.status_code == 503
+
+            for path in ("/maintenance", "/"):
+                with pytest.raises(MaintenanceException):
+                    await client.get(str(server.make_url(path)))
+    finally:
+        await transport.close()
+
+    assert server.app["hits"] == 1
+    assert breaker.stats.rejected == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_transport_reports_responses(server: TestServer):
+    responses = []
+    transport = SharedTransport(
+        on_response=lambda *args: responses.append(args),
+    )
+
+    try:
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get(str(server.make_url("/")))
+            await client.get(str(server.make_url("/maintenance")))
+    finally:
+        await transport.close()
+
+    assert [
+        (method, path, status, size) for method, path, status, _, size in responses
+    ] == [
+        ("GET", "/", 200, len("nobody")),
+        ("GET", "/maintenance", 503, 0),
+    ]
+    assert all(elapsed > 0 for _, _, _, elapsed, _ in responses)
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from utils.calculation.batch import (
+    calculate_overpower_bases,
+    calculate_overpower_bases_decimal,
+    calculate_overpower_maxes,
+    calculate_overpower_maxes_decimal,
+    calculate_ratings,
+    calculate_ratings_decimal,
+)
+from utils.calculation.overpower import (
+    calculate_overpower_base,
+    calculate_overpower_max,
+)
+from utils.calculation.rating import calculate_rating
+
+BORDERS = [
+    500_000,
+    800_000,
+    900_000,
+    975_000,
+    1_000_000,
+    1_005_000,
+    1_007_500,
+    1_009_000,
+    1_010_000,
+]
+
+# Every internal level a chart can have, plus a few with 2 decimal places.
+INTERNAL_LEVELS = [x / 10 for x in range(161)] + [13.85, 14.25, 14.95]
+
+# Every border and its neighbours, and scores spread over the whole range.
+SCORES = sorted(
+    {s + d for s in BORDERS for d in range(-3, 4) if 0 <= s + d <= 1_010_000}
+    | set(range(0, 1_010_001, 1_999))
+)
+
+
+def assert_identical(batch_floats, batch_decimals, expected: list[Decimal]):
+    assert batch_decimals == expected
+    # Bit-identical to converting the Decimal result.
+    assert batch_floats.tolist() == [float(x) for x in expected]
+
+
+@pytest.mark.parametrize("internal_level", INTERNAL_LEVELS)
+def test_ratings_match_decimal(internal_level: float):
+    levels = [internal_level] * len(SCORES)
+
+    assert_identical(
+        calculate_ratings(SCORES, levels),
+        calculate_ratings_decimal(SCORES, levels),
+        [calculate_rating(s, internal_level) for s in SCORES],
+    )
+
+
+@pytest.mark.parametrize("internal_level", INTERNAL_LEVELS)
+def test_overpower_bases_match_decimal(internal_level: float):
+    levels = [internal_level] * len(SCORES)
+
+    assert_identical(
+        calculate_overpower_bases(SCORES, levels),
+        calculate_overpower_bases_decimal(SCORES, levels),
+        [calculate_overpower_base(s, internal_level) for s in SCORES],
+    )
+
+
+@pytest.mark.parametrize("internal_level", [0.5, 3.7, 4.9, 12.5])
+def test_ratings_match_decimal_between_900k_and_975k(internal_level: float):
+    # The level and the 2/3 term cancel out here for low levels, which is where
+    # rounding is most likely to differ.
+    scores = list(range(900_000, 975_000, 7))
+    levels = [internal_level] * len(scores)
+
+    assert_identical(
+        calculate_ratings(scores, levels),
+        calculate_ratings_decimal(scores, levels),
+        [calculate_rating(s, internal_level) for s in scores],
+    )
+
+
+def test_ratings_unknown_internal_level():
+    assert_identical(
+        calculate_ratings(SCORES, [np.nan] * len(SCORES)),
+        calculate_ratings_decimal(SCORES, [None] * len(SCORES)),
+        [calculate_rating(s, None) for s in SCORES],
+    )
+
+
+def test_overpower_maxes_match_decimal():
+    assert_identical(
+        calculate_overpower_maxes(INTERNAL_LEVELS),
+        calculate_overpower_maxes_decimal(INTERNAL_LEVELS),
+        [calculate_overpower_max(x) for x in INTERNAL_LEVELS],
+    )
+
+
+def test_mixed_batch():
+    rng = np.random.default_rng(12)
+    scores = rng.integers(0, 1_010_001, 5_000)
+    levels = rng.choice(INTERNAL_LEVELS, 5_000)
+
+    assert calculate_ratings_decimal(scores.tolist(), levels.tolist()) == [
+        calculate_rating(s, x) for s, x in zip(scores.tolist(), levels.tolist())
+    ]
@@ -0,0 +1,73 @@
+import math
+import random
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from utils.calculation.batch import RATING_DENOMINATOR, rating_numerators
+from utils.calculation.rating import calculate_rating, calculate_score_for_rating
+from utils.calculation.rating_table import rating_table
+
+ALL_SCORES = np.arange(0, 1_010_001, dtype=np.int64)
+
+
+@pytest.mark.parametrize("internal_level", [1.0, 3.7, 4.9, 5.0, 12.5, 13.85, 15.4])
+def test_min_score_matches_linear_search(internal_level: float):
+    ratings = rating_numerators(ALL_SCORES, np.full(len(ALL_SCORES), internal_level))
+    table = rating_table(internal_level)
+    rng = random.Random(13)
+
+    targets = [Decimal(x) / 100 for x in range(1800)]
+    targets.extend(
+        Decimal(int(x)) / RATING_DENOMINATOR
+        for x in ratings[rng.sample(range(len(ratings)), 500)]
+    )
+
+    for target in targets:
+        # The 28 digit Decimals of exact ratings round up, so allow for that.
+        exact = math.ceil(target * RATING_DENOMINATOR - Decimal("1e-6"))
+        index = int(np.searchsorted(ratings, exact))
+        expected = None if index == len(ratings) else index
+
+        assert table.min_score(target) == expected, target
+
+
+@pytest.mark.parametrize(
+    ("rating", "chart_constant", "expected"),
+    [
+        (16.15, 14.0, 1_009_000),
+        (16.16, 14.0, None),
+        (16.0, 14.0, 1_007_500),
+        (15.0, 14.0, 1_000_000),
+        # Between borders, the lowest score that reaches the rating.
+        (15.5001, 14.0, 1_005_001),
+        (14.0, 14.0, 975_000),
+        (13.0, 14.0, 960_000),
+        (9.0, 14.0, 900_000),
+        (4.5, 14.0, 800_000),
+        (1.0, 14.0, 566_667),
+        (0, 14.0, 0),
+        (0.01, 3.5, 922_650),
+    ],
+)
+def test_calculate_score_for_rating(rating, chart_constant, expected):
+    score = calculate_score_for_rating(rating, chart_constant)
+
+    assert score == expected
+
+    if score is not None:
+        assert calculate_rating(score, chart_constant) >= Decimal(str(rating))
+        if score > 0:
+            assert calculate_rating(score - 1, chart_constant) < Decimal(str(rating))
+
+
+@pytest.mark.parametrize("internal_level", [3.7, 14.8])
+def test_min_score_round_trips_calculate_rating(internal_level: float):
+    table = rating_table(internal_level)
+
+    for score in range(900_000, 1_010_000, 997):
+        rating = calculate_rating(score, internal_level)
+        if rating > 0:
+            assert table.min_score(rating) <= score
+            assert calculate_rating(table.min_score(rating), internal_level) == rating  # type: ignore[reportArgumentType]
@@ -0,0 +1,30 @@
+import random
+
+from utils.backoff import Backoff
+
+
+def test_backoff_grows_up_to_maximum():
+    backoff = Backoff(2, 30, factor=2, rng=random.Random(17))
+    intervals = [2, 4, 8, 16, 30, 30, 30]
+
+    for interval in intervals:
+        assert interval / 2 <= backoff.next_delay() <= interval
+
+
+def test_backoff_reset():
+    backoff = Backoff(1, 60, rng=random.Random(17))
+    for _ in range(5):
+        backoff.next_delay()
+
+    backoff.reset()
+
+    assert backoff.next_delay() <= 1
+
+
+def test_backoff_jitter_spreads_delays():
+    delays = {
+        Backoff(10, 10, rng=random.Random(seed)).next_delay() for seed in range(20)
+    }
+
+    assert len(delays) == 20
+    assert all(5 <= delay <= 10 for delay in delays)
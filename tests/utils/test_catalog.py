@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.models import Base, Chart, Song
+from utils.catalog import ChartCatalog
+
+
+def make_song(id: int, jacket: str, genre: str = "POPS & ANIME") -> Song:
+    return Song(
+        id=id,
+        title="Ultimate Force",
+        chunithm_catcode=0,
+        genre=genre,
+        artist="Artist",
+        version="CHUNITHM",
+        jacket=jacket,
+        available=True,
+        removed=False,
+    )
+
+
+@pytest_asyncio.fixture
+async def catalog(tmp_path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    normal = make_song(2, "uf.jpg")
+    normal.charts = [
+        Chart(song_id=2, difficulty="MAS", level="14+", const=14.8, maxcombo=2000),
+        Chart(song_id=2, difficulty="EXP", level="12", const=None, maxcombo=None),
+    ]
+    worlds_end = make_song(8000, "uf.jpg", "WORLD'S END")
+    worlds_end.charts = [
+        Chart(song_id=8000, difficulty="WE", level="☆5", const=None, maxcombo=1500)
+    ]
+
+    async with session_factory() as session, session.begin():
+        session.add_all([worlds_end, normal])
+
+    async with session_factory() as session:
+        yield await ChartCatalog.load(session)
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_catalog_lookups(catalog: ChartCatalog):
+    assert len(catalog) == 2
+
+    song = catalog.song(2)
+    assert song is not None
+    assert song.genre == "POPS & ANIME"
+    assert set(song.charts) == {"MAS", "EXP"}
+
+    chart = catalog.chart(2, "MAS")
+    assert chart is not None
+    assert (chart.level, chart.const, chart.maxcombo) == ("14+", 14.8, 2000)
+    assert catalog.chart(2, "ULT") is None
+    assert catalog.chart(3, "MAS") is None
+
+    # The song ID takes priority over the jacket.
+    assert catalog.song(3, "uf.jpg") is None
+
+
+@pytest.mark.asyncio
+async def test_catalog_shared_jacket_resolves_to_highest_id(catalog: ChartCatalog):
+    song = catalog.song(jacket="https://example.com/jacket/uf.jpg")
+
+    assert song is not None
+    assert song.id == 8000
+
+
+@pytest.mark.asyncio
+async def test_catalog_is_read_only(catalog: ChartCatalog):
+    song = catalog.song(2)
+    assert song is not None
+
+    with pytest.raises(TypeError):
+        song.charts["ULT"] = song.charts["MAS"]  # type: ignore[reportIndexIssue]
+
+    with pytest.raises(AttributeError):
+        song.title = "Ouroboros"  # type: ignore[reportAttributeAccessIssue]
@@ -0,0 +1,161 @@
+from http.cookiejar import Cookie as HTTPCookie
+from http.cookiejar import LWPCookieJar
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.models import Base, Cookie
+from utils.cookie_store import CookieStore, dump_jar, load_jar
+
+
+def make_cookie(name: str, value: str) -> HTTPCookie:
+    return HTTPCookie(
+        version=0,
+        name=name,
+        value=value,
+        port=None,
+        port_specified=False,
+        domain="chunithm-net-eng.com",
+        domain_specified=True,
+        domain_initial_dot=False,
+        path="/",
+        path_specified=True,
+        secure=False,
+        expires=3856586927,
+        discard=False,
+        comment=None,
+        comment_url=None,
+        rest={},
+    )
+
+
+def make_jar(**cookies: str) -> LWPCookieJar:
+    jar = LWPCookieJar()
+    for name, value in cookies.items():
+        jar.set_cookie(make_cookie(name, value))
+
+    return jar
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_factory() as session, session.begin():
+        for discord_id in (1, 2):
+            session.add(
+                Cookie(discord_id=discord_id, cookie=dump_jar(make_jar(clal="a")))
+            )
+
+    yield session_factory
+
+    await engine.dispose()
+
+
+async def stored_cookies(session_factory: async_sessionmaker) -> dict[int, dict]:
+    async with session_factory() as session:
+        rows = await session.execute(Cookie.__table__.select())
+
+        return {
+            row.discord_id: {c.name: c.value for c in load_jar(row.cookie)}
+            for row in rows
+        }
+
+
+@pytest.mark.asyncio
+async def test_cookie_store_only_writes_changed_jars(
+    session_factory: async_sessionmaker,
+):
+    store = CookieStore(session_factory)
+
+    assert await store.get(3) is None
+
+    jar = await store.get(1)
+    assert jar is not None
+    assert {c.name: c.value for c in jar} == {"clal": "a"}
+
+    # Jars are handed out as copies.
+    jar.set_cookie(make_cookie("_t", "token"))
+    assert [c.name for c in await store.get(1)] == ["clal"]  # type: ignore[reportOptionalIterable]
+    assert store.stats.misses == 2
+    assert store.stats.hits == 1
+
+    assert not store.put(2, await store.get(2))  # type: ignore[reportArgumentType]
+    assert await store.flush() == 0
+
+    # Only the last jar of each player is written.
+    first = await store.get(1)
+    first.set_cookie(make_cookie("_t", "first"))  # type: ignore[reportOptionalMemberAccess]
+    assert store.put(1, first)  # type: ignore[reportArgumentType]
+    assert store.put(1, jar)
+    assert await store.flush() == 1
+
+    assert await stored_cookies(session_factory) == {
+        1: {"clal": "a", "_t": "token"},
+        2: {"clal": "a"},
+    }
+    assert store.stats.writes == 1
+    assert store.stats.flushes == 1
+
+
+@pytest.mark.asyncio
+async def test_cookie_store_keeps_queued_jars_when_evicted(
+    session_factory: async_sessionmaker,
+):
+    store = CookieStore(session_factory, max_entries=1)
+
+    jar = await store.get(1)
+    jar.set_cookie(make_cookie("_t", "token"))  # type: ignore[reportOptionalMemberAccess]
+    store.put(1, jar)  # type: ignore[reportArgumentType]
+    await store.get(2)
+
+    jar = await store.get(1)
+    assert {c.name: c.value for c in jar} == {"clal": "a", "_t": "token"}  # type: ignore[reportOptionalIterable]
+
+
+@pytest.mark.asyncio
+async def test_cookie_store_forget_drops_queued_jar(
+    session_factory: async_sessionmaker,
+):
+    store = CookieStore(session_factory)
+
+    jar = await store.get(1)
+    jar.set_cookie(make_cookie("_t", "token"))  # type: ignore[reportOptionalMemberAccess]
+    store.put(1, jar)  # type: ignore[reportArgumentType]
+    await store.forget(1)
+
+    assert await store.flush() == 0
+    assert await store.get(1) is not None
+    assert (await stored_cookies(session_factory))[1] == {"clal": "a"}
+
+
+@pytest.mark.asyncio
+async def test_cookie_store_drops_jars_from_before_forget(
+    session_factory: async_sessionmaker,
+):
+    store = CookieStore(session_factory)
+
+    # A session that was running while the player logged out.
+    jar = await store.get(1)
+    await store.forget(1)
+
+    jar.set_cookie(make_cookie("_t", "token"))  # type: ignore[reportOptionalMemberAccess]
+    assert not store.put(1, jar)  # type: ignore[reportArgumentType]
+    assert not store.put(1, make_jar(clal="b"))
+    assert store.stats.stale == 2
+    assert await store.flush() == 0
+
+    # Jars handed out since are saved again, once.
+    jar = await store.get(1)
+    jar.set_cookie(make_cookie("_t", "token"))  # type: ignore[reportOptionalMemberAccess]
+    assert store.put(1, jar)  # type: ignore[reportArgumentType]
+    assert not store.put(1, jar)  # type: ignore[reportArgumentType]
+    assert await store.flush() == 1
+    assert (await stored_cookies(session_factory))[1] == {"clal": "a", "_t": "token"}
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.loop_watchdog import LoopWatchdog, Stall, _task_commands, running_command
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_loop_watchdog_captures_stalled_stack():
+    caught: list[Stall] = []
+    watchdog = LoopWatchdog(interval=0.02, threshold=0.1, on_stall=caught.append)
+
+    async def command():
+        with running_command("c>top"):
+            block_the_loop(0.3)
+
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(command(), name="command")
+        await asyncio.sleep(0.05)
+    finally:
+        watchdog.stop()
+
+    assert caught == list(watchdog.stalls)
+    assert len(caught) == 1
+
+    stall = caught[0]
+    assert stall.finished
+    assert stall.duration >= 0.25
+    assert stall.command == "c>top"
+    assert stall.task is not None
+    assert stall.task.startswith("command")
+    assert "block_the_loop" in stall.stack[-1]
+    assert not _task_commands
+
+    assert watchdog.stats.stalls == 1
+    assert watchdog.stats.max_lag >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_loop_watchdog_measures_lag_without_threshold():
+    lags: list[float] = []
+    watchdog = LoopWatchdog(interval=0.01, threshold=None, on_lag=lags.append)
+
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.1)
+        block_the_loop(0.2)
+        await asyncio.sleep(0.05)
+    finally:
+        watchdog.stop()
+
+    assert len(lags) == watchdog.stats.samples > 2
+    assert max(lags) >= 0.15
+    assert not watchdog.stalls
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from utils.metrics import BotMetrics, Counter, Histogram, MetricsRegistry
+
+
+def test_registry_renders_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests", 'Requests, by "path".', ["path"]))
+    latency = registry.register(
+        Histogram("latency_seconds", "Latency.", buckets=[0.1, 1])
+    )
+
+    requests.inc("/")
+    requests.inc("/", amount=2)
+    requests.inc('/a"b\\c')
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value)
+
+    assert registry.render() == (
+        '# HELP requests Requests, by "path".\n'
+        "# TYPE requests counter\n"
+        'requests_total{path="/"} 3\n'
+        'requests_total{path="/a\\"b\\\\c"} 1\n'
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 2\n'
+        'latency_seconds_bucket{le="1"} 3\n'
+        'latency_seconds_bucket{le="+Inf"} 4\n'
+        "latency_seconds_sum 3.65\n"
+        "latency_seconds_count 4\n"
+    )
+
+
+def test_registry_runs_collectors_before_rendering():
+    metrics = BotMetrics()
+    hits = 0
+
+    def collect():
+        metrics.observe_cache("test", hits, 1)
+
+    metrics.add_collector("test", collect)
+    hits = 3
+    rendered = metrics.render()
+
+    assert 'chuninewbot_cache_hits_total{cache="test"} 3\n' in rendered
+    assert 'chuninewbot_cache_hit_ratio{cache="test"} 0.75\n' in rendered
+
+
+def test_metrics_reject_wrong_labels():
+    with pytest.raises(ValueError):
+        Counter("requests", "Requests.", ["path"]).inc()
+
+    with pytest.raises(ValueError):
+        Histogram("latency_seconds", "Latency.").observe(1, "extra")
+
+
+@pytest.mark.asyncio
+async def test_metrics_time_database_sessions(tmp_path: Path):
+    metrics = BotMetrics()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    metrics.instrument_engine(engine)
+
+    try:
+        for _ in range(2):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+    assert metrics.db_session_duration.count() == 2
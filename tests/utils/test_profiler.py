@@ -0,0 +1,62 @@
+import asyncio
+import marshal
+import time
+
+import httpx
+import pytest
+
+from utils.profiler import profile
+
+
+def crunch(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def slow_handler(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(0.2)
+    return httpx.Response(200, text="ok")
+
+
+async def command() -> None:
+    crunch(0.2)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(slow_handler)) as client:
+        # In a child task, which is profiled along with its parent.
+        await asyncio.create_task(client.get("https://chunithm-net-eng.com/"))
+
+
+@pytest.mark.asyncio
+async def test_profile_samples_running_and_waiting_time():
+    loop = asyncio.get_running_loop()
+    factory = loop.get_task_factory()
+
+    result = await profile(command(), interval=0.005)
+
+    assert loop.get_task_factory() is factory
+    assert result.wall_time >= 0.4
+    assert result.breakdown.keys() >= {"cpu", "network"}
+    assert result.breakdown["cpu"] == pytest.approx(0.2, abs=0.1)
+    assert result.breakdown["network"] == pytest.approx(0.2, abs=0.1)
+    assert sum(result.breakdown.values()) == pytest.approx(result.wall_time)
+
+    stacks = result.data.decode().splitlines()
+    assert any(
+        line.startswith("cpu;") and "crunch (tests/utils/test_profiler.py)" in line
+        for line in stacks
+    )
+    assert any(
+        line.startswith("network;") and "slow_handler" in line for line in stacks
+    )
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+
+
+@pytest.mark.asyncio
+async def test_profile_traces_calls():
+    result = await profile(command(), mode="trace")
+
+    assert result.extension == "prof"
+    assert result.breakdown["cpu"] >= 0.2
+    assert result.breakdown.get("waiting", 0) >= 0.15
+
+    stats = marshal.loads(result.data)
+    assert any(name == "crunch" for _, _, name in stats)
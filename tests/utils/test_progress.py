@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from utils.progress import ThrottledProgress
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self._sleepers: asyncio.Queue[asyncio.Future] = asyncio.Queue()
+
+    async def sleep(self, _: float) -> None:
+        wake = asyncio.get_running_loop().create_future()
+        self._sleepers.put_nowait(wake)
+        await wake
+
+    async def tick(self) -> None:
+        """Lets one interval pass, and lets the progress report what it has."""
+        (await self._sleepers.get()).set_result(None)
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_progress_is_coalesced():
+    clock = FakeClock()
+    reports = []
+
+    async def report(completed: int):
+        reports.append(completed)
+
+    async with ThrottledProgress(report, sleep=clock.sleep) as progress:
+        for _ in range(3):
+            progress.advance(10)
+
+        # Reported once, and not again while nothing changes.
+        await clock.tick()
+        await clock.tick()
+        await clock.tick()
+        assert reports == [30]
+
+        progress.advance()
+        await clock.tick()
+
+    assert reports == [30, 31]
+
+
+@pytest.mark.asyncio
+async def test_progress_stops_on_exit():
+    clock = FakeClock()
+    reports = []
+
+    async def report(completed: int):
+        reports.append(completed)
+
+    async with ThrottledProgress(report, sleep=clock.sleep) as progress:
+        progress.advance()
+
+    assert reports == []
+
+
+@pytest.mark.asyncio
+async def test_progress_survives_report_errors():
+    clock = FakeClock()
+    errors: list[Exception] = []
+
+    async def report(_: int):
+        msg = "Unknown Message"
+        raise RuntimeError(msg)
+
+    async with ThrottledProgress(
+        report, sleep=clock.sleep, on_error=errors.append
+    ) as progress:
+        progress.advance()
+        await clock.tick()
+
+        # No more reports once one failed.
+        progress.advance()
+
+    assert [str(e) for e in errors] == ["Unknown Message"]
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.render_pool import RenderPool
+from utils.types import RenderExpired, RenderQueueFull
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(1, max_queue_size=1)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_render_pool_runs_jobs(pool: RenderPool):
+    assert await pool.run(sum, [1, 2, 3]) == 6
+    assert pool.stats.completed == 1
+
+
+@pytest.mark.asyncio
+async def test_render_pool_expires_jobs(pool: RenderPool):
+    with pytest.raises(RenderExpired):
+        await pool.run(time.sleep, 1, deadline=time.time() + 0.1)
+
+    # The worker stays busy until the abandoned job finishes, and the next job
+    # waits for it instead of piling up in the executor.
+    assert await pool.run(sum, [1]) == 1
+    assert pool.stats.expired == 1
+
+
+@pytest.mark.asyncio
+async def test_render_pool_rejects_when_queue_is_full(pool: RenderPool):
+    results = await asyncio.gather(
+        *(pool.run(time.sleep, 0.2) for _ in range(3)), return_exceptions=True
+    )
+
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], RenderQueueFull)
+    assert pool.stats.rejected == 1
@@ -0,0 +1,134 @@
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from pytest_httpx import HTTPXMock
+
+from utils.rendering import JACKET_SIZE, JacketCache, encode_image
+
+JACKET_URL = "https://chunithm-net-eng.com/mobile/img/jacket.jpg"
+
+
+def make_jacket() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 300), "red").save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_jacket_cache_hits_memory_then_disk(
+    httpx_mock: HTTPXMock, tmp_path: Path
+):
+    httpx_mock.add_response(url=JACKET_URL, content=make_jacket())
+
+    cache = JacketCache(tmp_path)
+    await cache.load()
+    try:
+        tile = await cache.get(JACKET_URL)
+        assert tile is not None
+        assert tile.size == JACKET_SIZE
+        assert await cache.get(JACKET_URL) is tile
+    finally:
+        await cache.close()
+
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    # A fresh cache (e.g. after a restart) finds the tile on disk instead of
+    # downloading it again.
+    restarted = JacketCache(tmp_path)
+    await restarted.load()
+    try:
+        tile = await restarted.get(JACKET_URL)
+    finally:
+        await restarted.close()
+
+    assert tile is not None
+    assert tile.size == JACKET_SIZE
+    assert restarted.disk_hits == 1
+    assert len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.asyncio
+async def test_jacket_cache_evicts_from_disk(httpx_mock: HTTPXMock, tmp_path: Path):
+    urls = [f"https://chunithm-net-eng.com/mobile/img/{i}.jpg" for i in range(3)]
+    for url in urls:
+        httpx_mock.add_response(url=url, content=make_jacket())
+
+    cache = JacketCache(tmp_path, max_memory_items=1, max_disk_size=1)
+    await cache.load()
+    try:
+        for url in urls:
+            assert await cache.get(url) is not None
+    finally:
+        await cache.close()
+
+    assert len(list(tmp_path.glob("*.png"))) == 1  # noqa: ASYNC240
+
+
+@pytest.mark.asyncio
+async def test_jacket_cache_refetches_corrupt_tiles(
+    httpx_mock: HTTPXMock, tmp_path: Path
+):
+    for _ in range(2):
+        httpx_mock.add_response(url=JACKET_URL, content=make_jacket())
+
+    cache = JacketCache(tmp_path)
+    await cache.load()
+    try:
+        await cache.get(JACKET_URL)
+    finally:
+        await cache.close()
+
+    (tile_path,) = tmp_path.glob("*.png")  # noqa: ASYNC240
+    tile_path.write_bytes(b"not a png")
+
+    restarted = JacketCache(tmp_path)
+    await restarted.load()
+    try:
+        tile = await restarted.get(JACKET_URL)
+    finally:
+        await restarted.close()
+
+    assert tile is not None
+    assert tile.size == JACKET_SIZE
+    assert (restarted.disk_hits, restarted.misses) == (0, 1)
+    assert len(httpx_mock.get_requests()) == 2
+    assert restarted._disk_size == tile_path.stat().st_size
+
+
+@pytest.mark.asyncio
+async def test_jacket_cache_returns_none_on_failure(
+    httpx_mock: HTTPXMock, tmp_path: Path
+):
+    httpx_mock.add_response(url=JACKET_URL, status_code=404)
+
+    cache = JacketCache(tmp_path)
+    try:
+        assert await cache.get(JACKET_URL) is None
+    finally:
+        await cache.close()
+
+
+@pytest.mark.parametrize(
+    ("format", "quality"), [("png", 90), ("png", 100), ("webp", 100)]
+)
+def test_encode_image_lossless(format: str, quality: int):
+    image = Image.effect_noise((64, 64), 64).convert("RGBA")
+
+    encoded = encode_image(image, format, quality=quality)  # type: ignore[reportArgumentType]
+
+    assert encoded.format == format
+    assert encoded.filename_extension == format
+    with Image.open(io.BytesIO(encoded.data)) as decoded:
+        assert decoded.format == format.upper()
+        assert decoded.convert("RGBA").tobytes() == image.tobytes()
+
+
+def test_encode_image_lossy_webp_is_smaller():
+    image = Image.effect_noise((128, 128), 64).convert("RGBA")
+
+    lossless = encode_image(image, "webp", quality=100)
+    lossy = encode_image(image, "webp", quality=50)
+
+    assert len(lossy.data) < len(lossless.data)
@@ -0,0 +1,284 @@
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from zoneinfo import ZoneInfo
+
+from chunithm_net.consts import KEY_SONG_ID
+from chunithm_net.models.enums import ClearType, ComboType, Difficulty, Genres, Rank
+from chunithm_net.models.record import MusicRecord, RecentRecord, Record
+from database.models import Base
+from utils.catalog import CatalogChart, CatalogSong, ChartCatalog
+from utils.score_store import (
+    ALL_FOLDERS,
+    PLAYLOG_SIZE,
+    filter_folder,
+    load_scores,
+    plan_sync,
+    store_music_records,
+    sync_scores,
+)
+
+DISCORD_ID = 1
+START = datetime(2024, 7, 1, 12, 0, tzinfo=ZoneInfo("Asia/Tokyo"))
+
+
+def make_record(song_id: int, difficulty: Difficulty, score: int, title: str = ""):
+    record = Record(
+        title=title or f"Song {song_id}",
+        difficulty=difficulty,
+        score=score,
+        rank=Rank.from_score(score),
+        clear_lamp=ClearType.CLEAR,
+        combo_lamp=ComboType.NONE,
+    )
+    record.extras[KEY_SONG_ID] = song_id
+    return record
+
+
+def make_play(title: str, difficulty: Difficulty, date: datetime) -> RecentRecord:
+    return RecentRecord(
+        title=title,
+        difficulty=difficulty,
+        score=1_000_000,
+        track=1,
+        date=date,
+        new_record=False,
+    )
+
+
+class FakeChuniNet:
+    def __init__(self) -> None:
+        self.folders: dict[Difficulty, list[Record]] = {d: [] for d in Difficulty}
+        self.recent: list[RecentRecord] = []
+        self.requests: list[object] = []
+
+    async def recent_record(self) -> list[RecentRecord]:
+        self.requests.append("recent_record")
+        return self.recent
+
+    async def music_record_by_folder(self, *, difficulty: Difficulty) -> list[Record]:
+        self.requests.append(difficulty)
+        return self.folders[difficulty]
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False)
+
+    await engine.dispose()
+
+
+def test_plan_sync():
+    assert plan_sync(None, []).full
+
+    recent = [
+        make_play("A", Difficulty.MASTER, START + timedelta(minutes=5)),
+        make_play("B", Difficulty.EXPERT, START),
+        make_play("C", Difficulty.BASIC, START - timedelta(minutes=5)),
+    ]
+    plan = plan_sync(START, recent)
+
+    # Plays in the same minute as the last sync may not have been seen.
+    assert plan.folders == {Difficulty.MASTER, Difficulty.EXPERT}
+    assert [p.title for p in plan.new_plays] == ["A", "B"]
+
+    assert plan_sync(START + timedelta(minutes=5), recent[2:]).folders == set()
+
+
+def test_plan_sync_full_playlog():
+    recent = [
+        make_play("A", Difficulty.MASTER, START + timedelta(minutes=i + 1))
+        for i in range(PLAYLOG_SIZE)
+    ]
+
+    # Older plays may have been pushed out of the playlog.
+    assert plan_sync(START, recent).full
+
+    recent[-1].date = START
+    assert plan_sync(START, recent).folders == {Difficulty.MASTER}
+
+
+@pytest.mark.asyncio
+async def test_sync_scores_incremental(session_factory: async_sessionmaker):
+    client = FakeChuniNet()
+    client.folders[Difficulty.MASTER] = [
+        make_record(1, Difficulty.MASTER, 1_000_000),
+        make_record(2, Difficulty.MASTER, 990_000),
+    ]
+    client.folders[Difficulty.EXPERT] = [make_record(1, Difficulty.EXPERT, 1_009_000)]
+
+    plan = await sync_scores(session_factory, client, DISCORD_ID, START)  # type: ignore[reportArgumentType]
+
+    assert plan.folders == ALL_FOLDERS
+    assert client.requests == sorted(Difficulty, key=lambda d: d.value)
+
+    # Song pages fill in play counts, which are kept across syncs.
+    music_record = MusicRecord(
+        title="Song 2", difficulty=Difficulty.MASTER, score=990_000, play_count=3
+    )
+    music_record.extras[KEY_SONG_ID] = 2
+    async with session_factory() as session:
+        await store_music_records(session, DISCORD_ID, [music_record])
+
+    # Nothing is fetched while the last play date stays the same.
+    client.requests.clear()
+    plan = await sync_scores(session_factory, client, DISCORD_ID, START)  # type: ignore[reportArgumentType]
+
+    assert plan.folders == set()
+    assert client.requests == []
+
+    # Only the played difficulty is fetched again.
+    played_at = START + timedelta(hours=1)
+    client.recent = [make_play("Song 1", Difficulty.MASTER, played_at)]
+    client.folders[Difficulty.MASTER] = [
+        make_record(1, Difficulty.MASTER, 1_007_500),
+        make_record(2, Difficulty.MASTER, 990_000),
+    ]
+    await sync_scores(session_factory, client, DISCORD_ID, played_at)  # type: ignore[reportArgumentType]
+
+    assert client.requests == ["recent_record", Difficulty.MASTER]
+
+    async with session_factory() as session:
+        snapshots = await load_scores(session, DISCORD_ID)
+
+    assert [(s.song_id, s.difficulty, s.score, s.play_count) for s in snapshots] == [
+        # Played since the last sync, so the play count is out of date.
+        (1, "EXP", 1_009_000, None),
+        (1, "MAS", 1_007_500, None),
+        (2, "MAS", 990_000, 3),
+    ]
+    assert snapshots[1].rank == Rank.SSS.value
+
+
+@pytest.mark.asyncio
+async def test_filter_folder(session_factory: async_sessionmaker):
+    client = FakeChuniNet()
+    client.folders[Difficulty.MASTER] = [
+        make_record(1, Difficulty.MASTER, 1_000_000),
+        make_record(2, Difficulty.MASTER, 990_000),
+    ]
+    client.folders[Difficulty.EXPERT] = [make_record(1, Difficulty.EXPERT, 1_009_000)]
+    client.folders[Difficulty.WORLDS_END] = [
+        make_record(8000, Difficulty.WORLDS_END, 1_000_000)
+    ]
+
+    await sync_scores(session_factory, client, DISCORD_ID, START)  # type: ignore[reportArgumentType]
+
+    async with session_factory() as session:
+        snapshots = await load_scores(session, DISCORD_ID)
+
+    def make_song(id: int, genre: str, levels: dict[str, str]) -> CatalogSong:
+        return CatalogSong(
+            id=id,
+            title=f"Song {id}",
+            genre=genre,
+            jacket=f"{id}.jpg",
+            available=True,
+            removed=False,
+            charts={
+                d: CatalogChart(id, d, level, None, None) for d, level in levels.items()
+            },
+        )
+
+    catalog = ChartCatalog(
+        [
+            make_song(1, "ORIGINAL", {"EXP": "12+", "MAS": "14"}),
+            make_song(2, "niconico", {"MAS": "12+"}),
+            make_song(8000, "WORLD'S END", {"WE": "☆5"}),
+        ]
+    )
+
+    def keys(**kwargs):
+        return [
+            (s.song_id, s.difficulty)
+            for s in filter_folder(snapshots, catalog, **kwargs)
+        ]
+
+    assert keys(level="12+") == [(1, "EXP"), (2, "MAS")]
+    # Like on CHUNITHM-NET, the level takes priority over the difficulty.
+    assert keys(level="14", difficulty=Difficulty.EXPERT) == [(1, "MAS")]
+    assert keys(difficulty=Difficulty.MASTER) == [(1, "MAS"), (2, "MAS")]
+    assert keys(difficulty=Difficulty.MASTER, genre=Genres.NICONICO) == [(2, "MAS")]
+    assert keys(difficulty=Difficulty.MASTER, genre=Genres.ALL) == [
+        (1, "MAS"),
+        (2, "MAS"),
+    ]
+    assert keys(difficulty=Difficulty.WORLDS_END, level="14") == [(8000, "WE")]
+
+    with pytest.raises(ValueError, match="Difficulty cannot be None"):
+        keys(genre=Genres.ORIGINAL)
+
+
+@pytest.mark.asyncio
+async def test_sync_scores_fetches_folders_concurrently(
+    session_factory: async_sessionmaker,
+):
+    in_flight = 0
+    max_in_flight = 0
+
+    class SlowChuniNet(FakeChuniNet):
+        async def music_record_by_folder(self, *, difficulty: Difficulty):
+            nonlocal in_flight, max_in_flight
+
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+            return await super().music_record_by_folder(difficulty=difficulty)
+
+    client = SlowChuniNet()
+    client.folders[Difficulty.BASIC] = [make_record(1, Difficulty.BASIC, 1_000_000)]
+    client.folders[Difficulty.ULTIMA] = [make_record(1, Difficulty.ULTIMA, 900_000)]
+
+    await sync_scores(
+        session_factory,
+        client,  # type: ignore[reportArgumentType]
+        DISCORD_ID,
+        START,
+        limiter=asyncio.Semaphore(3),
+    )
+
+    async with session_factory() as session:
+        snapshots = await load_scores(session, DISCORD_ID)
+
+    assert max_in_flight == 3
+    assert [(s.difficulty, s.score) for s in snapshots] == [
+        ("BAS", 1_000_000),
+        ("ULT", 900_000),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sync_scores_holds_no_connection_while_fetching(
+    session_factory: async_sessionmaker,
+):
+    pool = session_factory.kw["bind"].sync_engine.pool
+    checked_out: list[int] = []
+
+    class WatchingChuniNet(FakeChuniNet):
+        async def recent_record(self) -> list[RecentRecord]:
+            checked_out.append(pool.checkedout())
+            return await super().recent_record()
+
+        async def music_record_by_folder(self, *, difficulty: Difficulty):
+            checked_out.append(pool.checkedout())
+            return await super().music_record_by_folder(difficulty=difficulty)
+
+    client = WatchingChuniNet()
+    await sync_scores(session_factory, client, DISCORD_ID, START)  # type: ignore[reportArgumentType]
+
+    client.recent = [make_play("Song 1", Difficulty.MASTER, START + timedelta(hours=1))]
+    await sync_scores(session_factory, client, DISCORD_ID, START + timedelta(hours=1))  # type: ignore[reportArgumentType]
+
+    assert len(checked_out) == len(Difficulty) + 2
+    assert set(checked_out) == {0}
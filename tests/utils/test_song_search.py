@@ -0,0 +1,95 @@
+import random
+from typing import Optional
+
+import pytest
+from rapidfuzz import fuzz, process
+
+from utils.song_search import CachedAlias, SongSearchIndex
+
+ALPHABET = "abcdefghij klmnoPQRSTUVあいうえおÄİ!'"
+
+
+def make_aliases(rng: random.Random) -> list[CachedAlias]:
+    aliases = []
+
+    for song_id in range(300):
+        title = "".join(rng.choices(ALPHABET, k=rng.randint(1, 25)))
+        aliases.append(CachedAlias(None, title, title, song_id, -1))
+
+        for _ in range(rng.randint(0, 2)):
+            alias = "".join(rng.choices(ALPHABET, k=rng.randint(1, 10)))
+            aliases.append(
+                CachedAlias(1, alias, title, song_id, rng.choice([-1, -1, 5, 7]))
+            )
+
+    # Duplicate choices, so that ties have to be broken by order.
+    aliases.append(CachedAlias(2, aliases[3].alias, "dupe", 1000, 5))
+    aliases.append(CachedAlias(3, aliases[10].alias, "dupe", 1001, -1))
+
+    return aliases
+
+
+def visible(aliases: list[CachedAlias], guild_id: Optional[int]):
+    return [a for a in aliases if a.guild_id in {-1, guild_id}]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_linear_search(seed: int):
+    rng = random.Random(seed)
+    aliases = make_aliases(rng)
+    index = SongSearchIndex(aliases)
+
+    for i in range(200):
+        guild_id = rng.choice([None, 5, 7, 9])
+        if i % 2:
+            query = "".join(rng.choices(ALPHABET, k=rng.randint(0, 20)))
+        else:
+            query = rng.choice(aliases).alias[: rng.randint(0, 12)]
+
+        choices = visible(aliases, guild_id)
+        strings = [a.alias for a in choices]
+
+        expected = process.extractOne(
+            query, strings, scorer=fuzz.QRatio, processor=str.lower
+        )
+        match = index.extract_one(query, guild_id)
+        assert match is not None
+        assert (match.alias, match.similarity) == (choices[expected[2]], expected[1])
+
+        expected_many = process.extract(
+            query,
+            strings,
+            scorer=fuzz.QRatio,
+            processor=str.lower,
+            limit=50,
+            score_cutoff=70,
+        )
+        matches = index.extract(query, guild_id, limit=50, score_cutoff=70)
+        assert [(m.alias, m.similarity) for m in matches] == [
+            (choices[r[2]], r[1]) for r in expected_many
+        ]
+
+
+def test_guild_aliases_are_partitioned():
+    aliases = [
+        CachedAlias(None, "Ultimate Force", "Ultimate Force", 1, -1),
+        CachedAlias(1, "uf", "Ultimate Force", 1, 100),
+        CachedAlias(None, "Ouroboros", "Ouroboros", 2, -1),
+        CachedAlias(2, "uf", "Ouroboros", 2, 200),
+    ]
+    index = SongSearchIndex(aliases)
+
+    assert index.extract_one("uf", 100).alias.title == "Ultimate Force"  # type: ignore[reportOptionalMemberAccess]
+    assert index.extract_one("uf", 200).alias.title == "Ouroboros"  # type: ignore[reportOptionalMemberAccess]
+    assert index.extract_one("uf").similarity < 100  # type: ignore[reportOptionalMemberAccess]
+    assert {
+        m.alias.guild_id
+        for m in index.extract("uf", all_guilds=True, limit=None, score_cutoff=100)
+    } == {100, 200}
+
+
+def test_empty_index():
+    index = SongSearchIndex([])
+
+    assert index.extract_one("anything") is None
+    assert index.extract("anything") == []
@@ -14,6 +14,7 @@ if TYPE_CHECKING:
     from typing import TypeVar
 
     from database.models import Alias, SdvxinChartView, Song
+    from utils.catalog import CatalogSong
 
     T = TypeVar("T", float | decimal.Decimal, decimal.Decimal, float, str, int)
 
@@ -126,7 +127,7 @@ def sdvxin_link(view: "SdvxinChartView") -> str:
     return f"https://sdvx.in/chunithm/{difficulty[:3]}/{id}{difficulty}{view.end_index or ''}.htm"
 
 
-def get_jacket_url(song: "Song") -> str:
+def get_jacket_url(song: "Song | CatalogSong") -> str:
     if song.available:
         return f"{INTERNATIONAL_JACKET_BASE}/{song.jacket}"
 
@@ -0,0 +1,37 @@
+import random
+from typing import Optional
+
+__all__ = ["Backoff"]
+
+
+class Backoff:
+    def __init__(
+        self,
+        initial: float,
+        maximum: float,
+        *,
+        factor: float = 2.0,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        """Exponential backoff with jitter.
+
+        Each delay is picked at random between half and all of the current
+        interval, so that jobs started at the same time spread out instead of
+        retrying in lockstep. The interval then grows by `factor`, up to
+        `maximum`.
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+
+        self._interval = initial
+        self._rng = rng or random.Random()
+
+    def next_delay(self) -> float:
+        delay = self._interval / 2 + self._rng.uniform(0, self._interval / 2)
+        self._interval = min(self._interval * self.factor, self.maximum)
+
+        return delay
+
+    def reset(self) -> None:
+        self._interval = self.initial
@@ -0,0 +1,188 @@
+"""Array versions of `calculate_rating`, `calculate_overpower_base` and
+`calculate_overpower_max`, for computing many plays at once.
+
+Everything is computed exactly in integers over a fixed denominator, so the
+results are the same as those of the `Decimal` functions: the float arrays are
+the nearest floats to them, and the `*_decimal` variants return equal `Decimal`s.
+
+Internal levels must have at most 4 decimal places, which holds for every chart
+constant.
+"""
+
+from decimal import Decimal
+from typing import Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+# rating100 (rating * 10000) can have denominators of 2 * 100_000 and 3 *
+# 100_000 in the 800,000-975,000 range, so it is kept multiplied by this.
+_RATING100_SCALE = 600_000
+
+# Denominator of the exact rating.
+RATING_DENOMINATOR = _RATING100_SCALE * 10_000
+# Denominator of overpower base, which is floored to 2 decimal places.
+OVERPOWER_BASE_DENOMINATOR = 100
+# Denominator of overpower max.
+OVERPOWER_MAX_DENOMINATOR = 10_000
+
+
+def _level_bases(internal_levels: npt.ArrayLike) -> npt.NDArray[np.int64]:
+    """`Decimal(str(internal_level)) * 10000`, as integers."""
+    levels = np.asarray(internal_levels, dtype=np.float64)
+    return np.rint(np.nan_to_num(levels) * 10_000).astype(np.int64)
+
+
+def _below_sss_numerators(
+    scores: npt.NDArray[np.int64], level_bases: npt.NDArray[np.int64]
+) -> npt.NDArray[np.int64]:
+    """rating100 * _RATING100_SCALE for scores below 1,000,000, where rating and
+    overpower use the same formula."""
+    lb = level_bases
+    minus_5 = lb - 50_000
+
+    return np.select(
+        [scores >= 975_000, scores >= 900_000, scores >= 800_000, scores >= 500_000],
+        [
+            lb * _RATING100_SCALE + (scores - 975_000) * 240_000,
+            minus_5 * _RATING100_SCALE + (scores - 900_000) * 400_000,
+            minus_5 * (_RATING100_SCALE // 2) + (scores - 800_000) * minus_5 * 3,
+            minus_5 * (scores - 500_000),
+        ],
+        0,
+    )
+
+
+def rating_numerators(
+    scores: npt.ArrayLike, internal_levels: npt.ArrayLike, *, clamp: bool = True
+) -> npt.NDArray[np.int64]:
+    """Exact play ratings, multiplied by `RATING_DENOMINATOR`.
+
+    Unknown internal levels can be passed as NaN, which behaves like passing
+    None to `calculate_rating`. With `clamp=False`, negative ratings are kept
+    even for known internal levels, so that every score band is linear.
+    """
+    s = np.asarray(scores, dtype=np.int64)
+    levels = np.asarray(internal_levels, dtype=np.float64)
+    lb = _level_bases(levels)
+
+    rating100 = np.select(
+        [s >= 1_009_000, s >= 1_007_500, s >= 1_005_000, s >= 1_000_000],
+        [
+            lb + 21_500,
+            lb + 20_000 + (s - 1_007_500),
+            lb + 15_000 + (s - 1_005_000) * 2,
+            lb + 10_000 + (s - 1_000_000),
+        ],
+        0,
+    )
+    numerators = np.where(
+        s >= 1_000_000, rating100 * _RATING100_SCALE, _below_sss_numerators(s, lb)
+    )
+
+    if not clamp:
+        return numerators
+
+    # NaN > 0 is False, like None.
+    return np.where((numerators < 0) & (levels > 0), 0, numerators)
+
+
+def overpower_base_numerators(
+    scores: npt.ArrayLike, internal_levels: npt.ArrayLike
+) -> npt.NDArray[np.int64]:
+    """Overpower bases, multiplied by `OVERPOWER_BASE_DENOMINATOR`."""
+    s = np.asarray(scores, dtype=np.int64)
+    lb = _level_bases(internal_levels)
+
+    rating100 = np.select(
+        [s >= 1_007_500, s >= 1_005_000, s >= 1_000_000],
+        [
+            lb + 20_000 + (s - 1_007_500) * 3,
+            lb + 15_000 + (s - 1_005_000) * 2,
+            lb + 10_000 + (s - 1_000_000),
+        ],
+        0,
+    )
+    numerators = np.where(
+        s >= 1_000_000, rating100 * _RATING100_SCALE, _below_sss_numerators(s, lb)
+    )
+    numerators = np.maximum(numerators, 0)
+
+    # rating100 / 2000, floored to 2 decimal places.
+    return numerators // (_RATING100_SCALE * 20)
+
+
+def overpower_max_numerators(
+    internal_levels: npt.ArrayLike,
+) -> npt.NDArray[np.int64]:
+    """Overpower maxes, multiplied by `OVERPOWER_MAX_DENOMINATOR`."""
+    return _level_bases(internal_levels) * 5 + 150_000
+
+
+def calculate_ratings(
+    scores: npt.ArrayLike, internal_levels: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    return rating_numerators(scores, internal_levels) / RATING_DENOMINATOR
+
+
+def calculate_overpower_bases(
+    scores: npt.ArrayLike, internal_levels: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    return (
+        overpower_base_numerators(scores, internal_levels) / OVERPOWER_BASE_DENOMINATOR
+    )
+
+
+def calculate_overpower_maxes(
+    internal_levels: npt.ArrayLike,
+) -> npt.NDArray[np.float64]:
+    return overpower_max_numerators(internal_levels) / OVERPOWER_MAX_DENOMINATOR
+
+
+def to_decimals(numerators: npt.NDArray[np.int64], denominator: int) -> list[Decimal]:
+    """Turns exact numerators back into `Decimal`s, rounded the way the `Decimal`
+    functions round them."""
+    d = Decimal(denominator)
+    return [Decimal(n) / d for n in numerators.tolist()]
+
+
+def calculate_ratings_decimal(
+    scores: Sequence[int], internal_levels: Sequence[Optional[float]]
+) -> list[Decimal]:
+    s = np.asarray(scores, dtype=np.int64)
+    lb = _level_bases(_with_nan(internal_levels))
+    numerators = rating_numerators(s, _with_nan(internal_levels))
+    ratings = to_decimals(numerators, RATING_DENOMINATOR)
+
+    # Between 900,000 and 975,000, `calculate_rating` rounds the 2/3 term to 28
+    # significant digits before adding it to the level. When the two nearly
+    # cancel out, fewer digits are left than when rounding the exact result, so
+    # do the same here.
+    for i in np.flatnonzero(
+        (s >= 900_000) & (s < 975_000) & (numerators != 0)
+    ).tolist():
+        rating100 = Decimal(int(lb[i]) - 50_000) + Decimal(int(s[i]) - 900_000) * 2 / 3
+        ratings[i] = rating100 / 10000
+
+    return ratings
+
+
+def calculate_overpower_bases_decimal(
+    scores: Sequence[int], internal_levels: Sequence[float]
+) -> list[Decimal]:
+    return to_decimals(
+        overpower_base_numerators(scores, internal_levels),
+        OVERPOWER_BASE_DENOMINATOR,
+    )
+
+
+def calculate_overpower_maxes_decimal(
+    internal_levels: Sequence[float],
+) -> list[Decimal]:
+    return to_decimals(
+        overpower_max_numerators(internal_levels), OVERPOWER_MAX_DENOMINATOR
+    )
+
+
+def _with_nan(internal_levels: Sequence[Optional[float]]) -> list[float]:
+    return [np.nan if x is None else x for x in internal_levels]
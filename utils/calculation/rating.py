@@ -1,6 +1,8 @@
 from decimal import Decimal
 from typing import Optional
 
+from utils.calculation.rating_table import rating_table
+
 
 def calculate_rating(score: int, internal_level: Optional[float]) -> Decimal:
     level_base = Decimal(str(internal_level or 0)) * 10000
@@ -33,21 +35,6 @@ def calculate_rating(score: int, internal_level: Optional[float]) -> Decimal:
 
 
 def calculate_score_for_rating(rating: float, internal_level: float) -> Optional[int]:
-    diff = Decimal(str(rating)) * 10000 - Decimal(str(internal_level)) * 10000
-
-    req = None
-    if diff >= 21_501:
-        req = None
-    elif diff >= 20_000:
-        req = 1_007_500 + diff - 20_000
-    elif diff >= 15_000:
-        req = 1_005_000 + (diff - 15_000) / 2
-    elif diff >= 10_000:
-        req = 1_000_000 + (diff - 10_000)
-    else:
-        req = 975_000 + diff * 5 / 2
-
-    # Calculation for scores below 975,000 is very complex so it is skipped for now
-    # (If your score is below 975,000 you should just git gud)
-
-    return int(req) if req is not None else None
+    """The lowest score that gives at least `rating` on a chart, or None if the
+    rating can't be reached."""
+    return rating_table(internal_level).min_score(rating)
@@ -0,0 +1,103 @@
+import functools
+import math
+from decimal import Decimal
+from typing import Optional, Sequence
+
+import numpy as np
+
+from utils.calculation.batch import (
+    RATING_DENOMINATOR,
+    calculate_overpower_bases_decimal,
+    calculate_ratings_decimal,
+    rating_numerators,
+)
+
+# Scores where the rating formula changes. Within each band, rating is linear in
+# score.
+BORDERS = (
+    0,
+    500_000,
+    800_000,
+    900_000,
+    975_000,
+    1_000_000,
+    1_005_000,
+    1_007_500,
+    1_009_000,
+    1_010_000,
+)
+
+
+# In units of 1 / RATING_DENOMINATOR.
+_ROUNDING_TOLERANCE = Decimal("1e-6")
+
+
+class RatingTable:
+    def __init__(self, internal_level: float) -> None:
+        """Rating as a function of score, for a single chart constant.
+
+        Stores the exact rating at every band border and its slope inside the
+        band, which is enough to find the lowest score reaching a rating with a
+        binary search over the borders, for every score from 0 to 1,010,000.
+
+        Use `rating_table` to get a cached instance.
+        """
+        self.internal_level = internal_level
+
+        borders = np.array(BORDERS, dtype=np.int64)
+        levels = np.full(len(borders), internal_level, dtype=np.float64)
+
+        self._borders = borders
+        self._numerators = rating_numerators(borders, levels, clamp=False)
+        self._slopes = (
+            rating_numerators(borders + 1, levels, clamp=False) - self._numerators
+        )
+
+        # Once positive, rating never goes down as score goes up, so this is
+        # sorted and agrees with the real ratings wherever they are positive.
+        self._searchable = np.maximum.accumulate(
+            np.maximum(rating_numerators(borders, levels), 0)
+        )
+
+    @property
+    def max_rating(self) -> Decimal:
+        return Decimal(int(self._searchable[-1])) / RATING_DENOMINATOR
+
+    def min_score(self, rating: "float | Decimal") -> Optional[int]:
+        """The lowest score that gives at least `rating`, or None if no score
+        does."""
+        # Ratings returned by `calculate_rating` are rounded to 28 significant
+        # digits, so they can be a hair above the exact rating of their score.
+        target = math.ceil(
+            Decimal(str(rating)) * RATING_DENOMINATOR - _ROUNDING_TOLERANCE
+        )
+
+        if target <= 0:
+            return 0
+
+        index = int(np.searchsorted(self._searchable, target))
+        if index == len(BORDERS):
+            return None
+
+        band_start = int(self._borders[index - 1])
+        band_end = int(self._borders[index])
+        slope = int(self._slopes[index - 1])
+
+        if slope <= 0:
+            return band_end
+
+        needed = target - int(self._numerators[index - 1])
+        return min(band_start + -(-needed // slope), band_end)
+
+    def ratings(self, scores: Sequence[int]) -> list[Decimal]:
+        return calculate_ratings_decimal(scores, [self.internal_level] * len(scores))
+
+    def overpower_bases(self, scores: Sequence[int]) -> list[Decimal]:
+        return calculate_overpower_bases_decimal(
+            scores, [self.internal_level] * len(scores)
+        )
+
+
+@functools.lru_cache(maxsize=512)
+def rating_table(internal_level: float) -> RatingTable:
+    return RatingTable(internal_level)
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from database.models import Song
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogChart:
+    song_id: int
+    difficulty: str
+    level: str
+    const: Optional[float]
+    maxcombo: Optional[int]
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSong:
+    id: int
+    title: str
+    genre: str
+    jacket: str
+    available: bool
+    removed: bool
+
+    # Keyed by the short form of the difficulty, e.g. "MAS".
+    charts: Mapping[str, CatalogChart]
+
+
+class ChartCatalog:
+    def __init__(self, songs: list[CatalogSong]) -> None:
+        """A read-only snapshot of the song and chart tables, for looking up
+        chart data without touching the database.
+
+        The catalog is never modified after being built. To pick up changes to
+        the database, build a new one and replace the old one.
+        """
+        by_id: dict[int, CatalogSong] = {}
+        by_jacket: dict[str, CatalogSong] = {}
+
+        # If multiple songs share a jacket (e.g. WORLD'S END charts), the one
+        # with the highest ID wins.
+        for song in sorted(songs, key=lambda s: s.id):
+            by_id[song.id] = song
+            by_jacket[song.jacket] = song
+
+        self.songs: Mapping[int, CatalogSong] = MappingProxyType(by_id)
+        self.songs_by_jacket: Mapping[str, CatalogSong] = MappingProxyType(by_jacket)
+
+    @classmethod
+    async def load(cls, session: "AsyncSession") -> "ChartCatalog":
+        stmt = select(Song).options(joinedload(Song.charts))
+        songs = (await session.execute(stmt)).scalars().unique()
+
+        return cls(
+            [
+                CatalogSong(
+                    id=song.id,
+                    title=song.title,
+                    genre=song.genre,
+                    jacket=song.jacket,
+                    available=song.available,
+                    removed=song.removed,
+                    charts=MappingProxyType(
+                        {
+                            chart.difficulty: CatalogChart(
+                                song_id=chart.song_id,
+                                difficulty=chart.difficulty,
+                                level=chart.level,
+                                const=chart.const,
+                                maxcombo=chart.maxcombo,
+                            )
+                            for chart in song.charts
+                        }
+                    ),
+                )
+                for song in songs
+            ]
+        )
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    def song(
+        self, song_id: Optional[int] = None, jacket: Optional[str] = None
+    ) -> Optional[CatalogSong]:
+        """Finds a song by ID, or failing that, by jacket URL or filename."""
+        if song_id is not None:
+            return self.songs.get(song_id)
+
+        if jacket is not None:
+            return self.songs_by_jacket.get(jacket.split("/")[-1])
+
+        return None
+
+    def chart(self, song_id: int, difficulty: str) -> Optional[CatalogChart]:
+        if (song := self.songs.get(song_id)) is None:
+            return None
+
+        return song.charts.get(difficulty)
@@ -1,6 +1,7 @@
+import os
 from configparser import ConfigParser
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Literal, Optional
 
 if TYPE_CHECKING:
     from configparser import SectionProxy
@@ -37,6 +38,11 @@ class BotConfig:
 
         return [int(x) for x in raw.split(",")]
 
+    @property
+    def loop_stall_threshold(self) -> Optional[float]:
+        threshold = self.__section.getfloat("loop_stall_threshold", fallback=0.5)
+        return threshold if threshold > 0 else None
+
 
 class WebConfig:
     def __init__(self, section: "SectionProxy") -> None:
@@ -62,6 +68,157 @@ class WebConfig:
     def goatcounter(self) -> Optional[str]:
         return self.__section.get("goatcounter")
 
+    @property
+    def metrics(self) -> bool:
+        return self.__section.getboolean("metrics", fallback=False)
+
+    @property
+    def metrics_token(self) -> Optional[str]:
+        return self.__section.get("metrics_token") or None
+
+
+class ChuniNetConfig:
+    def __init__(self, section: "SectionProxy") -> None:
+        self.__section = section
+
+    @property
+    def parser_pool(self) -> Optional[Literal["thread", "process"]]:
+        value = self.__section.get("parser_pool", fallback="none").strip().lower()
+
+        if value == "none":
+            return None
+
+        if value not in {"thread", "process"}:
+            msg = f"Invalid chunithm_net.parser_pool value {value!r}, must be one of none, thread or process."
+            raise ValueError(msg)
+
+        return value  # type: ignore[reportReturnType]
+
+    @property
+    def parser_pool_workers(self) -> Optional[int]:
+        return self.__section.getint("parser_pool_workers", fallback=None)
+
+    @property
+    def parser_pool_queue_size(self) -> int:
+        return self.__section.getint("parser_pool_queue_size", fallback=32)
+
+    def cache_ttl(self, endpoint: str) -> float:
+        return self.__section.getfloat(
+            f"cache_ttl_{endpoint}",
+            fallback=self.__section.getfloat("cache_ttl", fallback=300.0),
+        )
+
+    @property
+    def cache_max_entries(self) -> int:
+        return self.__section.getint("cache_max_entries", fallback=1024)
+
+    @property
+    def cache_max_size(self) -> int:
+        return self.__section.getint("cache_max_size_mb", fallback=64) * 1024 * 1024
+
+    @property
+    def max_concurrent_requests(self) -> int:
+        return self.__section.getint("max_concurrent_requests", fallback=4)
+
+    @property
+    def max_connections(self) -> int:
+        return self.__section.getint("max_connections", fallback=100)
+
+    @property
+    def max_keepalive_connections(self) -> int:
+        return self.__section.getint("max_keepalive_connections", fallback=20)
+
+    @property
+    def keepalive_expiry(self) -> float:
+        return self.__section.getfloat("keepalive_expiry", fallback=30.0)
+
+    @property
+    def http2(self) -> bool:
+        return self.__section.getboolean("http2", fallback=True)
+
+    @property
+    def cookie_flush_interval(self) -> float:
+        return self.__section.getfloat("cookie_flush_interval", fallback=5.0)
+
+    @property
+    def breaker_failure_threshold(self) -> int:
+        return self.__section.getint("breaker_failure_threshold", fallback=5)
+
+    @property
+    def breaker_cooldown(self) -> float:
+        return self.__section.getfloat("breaker_cooldown", fallback=30.0)
+
+    @property
+    def breaker_maintenance_cooldown(self) -> float:
+        return self.__section.getfloat("breaker_maintenance_cooldown", fallback=120.0)
+
+
+class RenderConfig:
+    def __init__(self, section: "SectionProxy") -> None:
+        self.__section = section
+
+    @property
+    def pool_workers(self) -> int:
+        return self.__section.getint(
+            "pool_workers", fallback=min(2, os.cpu_count() or 1)
+        )
+
+    @property
+    def pool_queue_size(self) -> int:
+        return self.__section.getint("pool_queue_size", fallback=8)
+
+    @property
+    def image_format(self) -> Literal["png", "webp"]:
+        value = self.__section.get("image_format", fallback="png").strip().lower()
+
+        if value not in {"png", "webp"}:
+            msg = f"Invalid render.image_format value {value!r}, must be png or webp."
+            raise ValueError(msg)
+
+        return value  # type: ignore[reportReturnType]
+
+    @property
+    def image_quality(self) -> int:
+        return self.__section.getint("image_quality", fallback=90)
+
+    @property
+    def png_optimize(self) -> bool:
+        return self.__section.getboolean("png_optimize", fallback=False)
+
+    @property
+    def jacket_cache_dir(self) -> Optional[Path]:
+        value = self.__section.get("jacket_cache_dir", fallback="cache/jackets")
+        return Path(value) if value else None
+
+    @property
+    def jacket_cache_memory_items(self) -> int:
+        return self.__section.getint("jacket_cache_memory_items", fallback=512)
+
+    @property
+    def jacket_cache_size(self) -> int:
+        return self.__section.getint("jacket_cache_size_mb", fallback=256) * 1024 * 1024
+
+
+class KamaitachiConfig:
+    def __init__(self, section: "SectionProxy") -> None:
+        self.__section = section
+
+    @property
+    def max_concurrent_polls(self) -> int:
+        return self.__section.getint("max_concurrent_polls", fallback=8)
+
+    @property
+    def poll_max_interval(self) -> float:
+        return self.__section.getfloat("poll_max_interval", fallback=30.0)
+
+    @property
+    def poll_max_failures(self) -> int:
+        return self.__section.getint("poll_max_failures", fallback=10)
+
+    @property
+    def import_timeout(self) -> float:
+        return self.__section.getfloat("import_timeout", fallback=3600.0)
+
 
 class CredentialsConfig:
     def __init__(self, section: "SectionProxy") -> None:
@@ -139,8 +296,17 @@ class DangerousConfig:
 class Config:
     def __init__(self, config: "ConfigParser") -> None:
         self.__config = config
+
+        # Sections added after release, so that existing configs keep working.
+        for section in ["chunithm_net", "render", "kamaitachi"]:
+            if not self.__config.has_section(section):
+                self.__config.add_section(section)
+
         self.bot = BotConfig(self.__config["bot"])
         self.web = WebConfig(self.__config["web"])
+        self.chunithm_net = ChuniNetConfig(self.__config["chunithm_net"])
+        self.render = RenderConfig(self.__config["render"])
+        self.kamaitachi = KamaitachiConfig(self.__config["kamaitachi"])
         self.credentials = CredentialsConfig(self.__config["credentials"])
         self.icons = IconsConfig(self.__config["icons"])
         self.legal = LegalConfig(self.__config["legal"])
@@ -0,0 +1,238 @@
+"""Cookie jars of logged in players, cached in memory and written back lazily.
+
+Every CHUNITHM-NET session starts from the player's cookie jar and may come
+back with new cookies, but most sessions end with the same cookies they started
+with. Jars are kept decoded in memory, and only jars whose cookies actually
+changed are queued for writing. Queued writes are flushed together by calling
+`flush()` periodically, and only the latest jar of each player is written.
+
+Logging in or out calls `forget()`, after which jars handed out before are no
+longer accepted, so that sessions still running cannot bring the old cookies
+back.
+"""
+
+import asyncio
+import copy
+import io
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.cookiejar import Cookie as HTTPCookie
+from http.cookiejar import LWPCookieJar
+from typing import TYPE_CHECKING, Optional
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import bindparam, select, update
+
+from database.models import Cookie
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+__all__ = ["CookieStore", "CookieStoreStats"]
+
+_LWP_HEADER = "#LWP-Cookies-2.0\n"
+
+_Signature = frozenset[tuple]
+
+
+def dump_jar(jar: LWPCookieJar) -> str:
+    """Serializes a jar the way it is stored in the database."""
+    return f"{_LWP_HEADER}{jar.as_lwp_str()}"
+
+
+def load_jar(text: str) -> LWPCookieJar:
+    jar = LWPCookieJar()
+    jar._really_load(  # type: ignore[reportAttributeAccessIssue]
+        io.StringIO(text), "?", ignore_discard=False, ignore_expires=False
+    )
+
+    return jar
+
+
+def _signature(jar: LWPCookieJar) -> _Signature:
+    return frozenset(
+        (c.domain, c.path, c.name, c.value, c.expires, c.discard) for c in jar
+    )
+
+
+@dataclass
+class CookieStoreStats:
+    hits: int = 0
+    misses: int = 0
+    # Jars that came back changed and were queued for writing.
+    changed: int = 0
+    # Jars that came back unchanged, so nothing was written.
+    unchanged: int = 0
+    # Jars that came back after the player logged in or out again, or that were
+    # not handed out by the store, and were dropped.
+    stale: int = 0
+    # Rows written, and the number of transactions they were written in.
+    writes: int = 0
+    flushes: int = 0
+
+
+@dataclass
+class _Entry:
+    cookies: list[HTTPCookie]
+    signature: _Signature
+
+
+class CookieStore:
+    def __init__(
+        self,
+        begin_db_session: "async_sessionmaker[AsyncSession]",
+        *,
+        max_entries: int = 4096,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        begin_db_session: async_sessionmaker[AsyncSession]
+            Where cookie jars are loaded from and written to.
+        max_entries: int
+            Maximum number of decoded jars kept in memory. Jars waiting to be
+            written are kept regardless.
+        """
+        self.max_entries = max_entries
+        self.stats = CookieStoreStats()
+
+        self._begin_db_session = begin_db_session
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._dirty: dict[int, str] = {}
+        self._flush_lock = asyncio.Lock()
+        # Bumped by `forget()` for every player, so that reads racing with it
+        # are not cached, and jars handed out before it are not saved.
+        self._generations: dict[int, int] = {}
+        # The player and generation each jar was handed out for.
+        self._handed_out: WeakKeyDictionary[LWPCookieJar, tuple[int, int]] = (
+            WeakKeyDictionary()
+        )
+
+    async def get(self, discord_id: int) -> Optional[LWPCookieJar]:
+        """A fresh copy of the player's cookie jar, or None if they are not
+        logged in. Changes to the copy are only saved by `put()`."""
+        if (entry := self._entries.get(discord_id)) is not None:
+            self._entries.move_to_end(discord_id)
+            self.stats.hits += 1
+
+            return self._hand_out(discord_id, entry.cookies)
+
+        self.stats.misses += 1
+
+        if (text := self._dirty.get(discord_id)) is None:
+            generation = self._generations.get(discord_id, 0)
+
+            async with self._begin_db_session() as session:
+                stmt = select(Cookie.cookie).where(Cookie.discord_id == discord_id)
+                text = (await session.execute(stmt)).scalar_one_or_none()
+
+            if text is None:
+                return None
+
+            # Another session may have saved a newer jar while the database was
+            # read, or the player may have logged out.
+            if (entry := self._entries.get(discord_id)) is not None:
+                return self._hand_out(discord_id, entry.cookies)
+            if generation != self._generations.get(discord_id, 0):
+                return await self.get(discord_id)
+
+        jar = load_jar(text)
+        self._remember(discord_id, jar)
+
+        return self._hand_out(discord_id, list(jar))
+
+    def put(self, discord_id: int, jar: LWPCookieJar) -> bool:
+        """Queues `jar`, which must have come from `get()`, for writing if its
+        cookies differ from the ones last seen for this player. Returns whether
+        it was queued.
+
+        Jars handed out before the player's last `forget()` are dropped.
+        """
+        if self._handed_out.pop(jar, None) != (
+            discord_id,
+            self._generations.get(discord_id, 0),
+        ):
+            self.stats.stale += 1
+            return False
+
+        signature = _signature(jar)
+        entry = self._entries.get(discord_id)
+
+        if entry is not None and entry.signature == signature:
+            self.stats.unchanged += 1
+            return False
+
+        self.stats.changed += 1
+        self._remember(discord_id, jar, signature)
+        self._dirty[discord_id] = dump_jar(jar)
+
+        return True
+
+    async def forget(self, discord_id: int) -> None:
+        """Drops the cached jar and any queued write for a player, e.g. before
+        their row is deleted or replaced.
+
+        Waits for a flush in progress, so that it cannot overwrite whatever
+        the caller writes next."""
+        async with self._flush_lock:
+            self._generations[discord_id] = self._generations.get(discord_id, 0) + 1
+            self._entries.pop(discord_id, None)
+            self._dirty.pop(discord_id, None)
+
+    async def flush(self) -> int:
+        """Writes all queued jars in a single transaction. Returns how many were
+        written."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+
+            pending, self._dirty = self._dirty, {}
+
+            table = Cookie.__table__
+            stmt = (
+                update(table)
+                .where(table.c.discord_id == bindparam("b_discord_id"))
+                .values(cookie=bindparam("b_cookie"))
+            )
+
+            try:
+                async with self._begin_db_session() as session, session.begin():
+                    await session.execute(
+                        stmt,
+                        [
+                            {"b_discord_id": discord_id, "b_cookie": cookie}
+                            for discord_id, cookie in pending.items()
+                        ],
+                    )
+            except BaseException:
+                # Jars queued since are newer, so keep those.
+                self._dirty = {**pending, **self._dirty}
+                raise
+
+            self.stats.writes += len(pending)
+            self.stats.flushes += 1
+
+            return len(pending)
+
+    def _remember(
+        self,
+        discord_id: int,
+        jar: LWPCookieJar,
+        signature: Optional[_Signature] = None,
+    ) -> None:
+        self._entries[discord_id] = _Entry(
+            [copy.copy(c) for c in jar], signature or _signature(jar)
+        )
+        self._entries.move_to_end(discord_id)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _hand_out(self, discord_id: int, cookies: list[HTTPCookie]) -> LWPCookieJar:
+        jar = LWPCookieJar()
+        for cookie in cookies:
+            jar.set_cookie(copy.copy(cookie))
+
+        self._handed_out[jar] = (discord_id, self._generations.get(discord_id, 0))
+
+        return jar
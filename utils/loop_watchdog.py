@@ -0,0 +1,267 @@
+"""Watches the event loop for code that holds it up.
+
+Parsing, rendering and fuzzy searching all run on the event loop, and while one
+of them runs nothing else does, including Discord heartbeats. A heartbeat task
+on the loop measures how late it wakes up from short sleeps, which is the loop's
+lag. A separate thread checks that the heartbeat keeps coming. If it stops for
+longer than the threshold, something is running without yielding, and the
+thread captures that code's stack while it is still running.
+"""
+
+import asyncio
+import contextlib
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, Optional
+from weakref import WeakKeyDictionary
+
+__all__ = [
+    "LoopWatchdog",
+    "LoopWatchdogStats",
+    "Stall",
+    "current_command",
+    "running_command",
+]
+
+# Set for the duration of every command, so that stalls can be traced back to
+# the command that caused them.
+current_command: ContextVar[Optional[str]] = ContextVar("current_command", default=None)
+
+# Frames kept from the innermost end of a stalled stack.
+STACK_LIMIT = 30
+
+# The command each task is running. Tasks only expose their context from
+# Python 3.12, so until then, this is how the watchdog thread finds the
+# command of the task that stalled. Tasks the command starts itself are only
+# found through their context.
+_task_commands: WeakKeyDictionary[asyncio.Task, str] = WeakKeyDictionary()
+
+
+@contextlib.contextmanager
+def running_command(command: str) -> Iterator[None]:
+    """Marks the current task as running `command` until the block exits."""
+    token = current_command.set(command)
+    task = asyncio.current_task()
+    previous = _task_commands.get(task) if task is not None else None
+
+    if task is not None:
+        _task_commands[task] = command
+
+    try:
+        yield
+    finally:
+        current_command.reset(token)
+
+        if task is not None:
+            if previous is None:
+                _task_commands.pop(task, None)
+            else:
+                _task_commands[task] = previous
+
+
+@dataclass
+class Stall:
+    started_at: datetime
+    # How long the loop was blocked. Until the loop recovers, this is how long
+    # it had been blocked when the stack was captured.
+    duration: float
+    # Formatted frames, outermost first.
+    stack: list[str]
+    task: Optional[str] = None
+    command: Optional[str] = None
+    finished: bool = False
+
+
+@dataclass
+class LoopWatchdogStats:
+    samples: int = 0
+    total_lag: float = 0.0
+    max_lag: float = 0.0
+    stalls: int = 0
+    stalled_time: float = 0.0
+    # Lag of the most recent heartbeats, oldest first.
+    recent_lags: deque[float] = field(default_factory=lambda: deque(maxlen=2400))
+
+    @property
+    def mean_lag(self) -> float:
+        return self.total_lag / self.samples if self.samples > 0 else 0
+
+    def recent_quantiles(self) -> Optional[tuple[float, float, float]]:
+        """The median, 99th percentile and maximum of recent lags."""
+        if len(self.recent_lags) < 2:
+            return None
+
+        lags = sorted(self.recent_lags)
+        return (
+            statistics.median(lags),
+            lags[int(len(lags) * 0.99)],
+            lags[-1],
+        )
+
+
+class LoopWatchdog:
+    def __init__(
+        self,
+        *,
+        interval: float = 0.25,
+        threshold: Optional[float] = 0.5,
+        history: int = 20,
+        on_lag: Optional[Callable[[float], None]] = None,
+        on_stall: Optional[Callable[[Stall], None]] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        interval: float
+            Time between heartbeats, in seconds.
+        threshold: Optional[float]
+            How long the loop must be blocked for its stack to be captured, in
+            seconds. If None, only lag is measured.
+        history: int
+            Number of stalls kept in `stalls`.
+        on_lag: Optional[Callable[[float], None]]
+            Called on the loop with the lag measured by every heartbeat.
+        on_stall: Optional[Callable[[Stall], None]]
+            Called with every stall as soon as it is caught, from the watchdog
+            thread, while the loop is still blocked. It must be thread-safe, and
+            must not wait for the loop.
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self.on_stall = on_stall
+        self.stats = LoopWatchdogStats()
+        # Most recent stalls, oldest first.
+        self.stalls: deque[Stall] = deque(maxlen=history)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        # Guards the stall in progress, which both threads update.
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._current_stall: Optional[Stall] = None
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat is not None and not self._heartbeat.done()
+
+    def start(self) -> None:
+        """Starts watching the running event loop."""
+        if self.running:
+            msg = "The watchdog is already running"
+            raise RuntimeError(msg)
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = self._loop.create_task(self._beat())
+
+        if self.threshold is not None:
+            self._thread = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _beat(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0)
+
+            with self._lock:
+                self._last_beat = time.monotonic()
+
+                if (stall := self._current_stall) is not None:
+                    self._current_stall = None
+                    stall.duration = lag
+                    stall.finished = True
+                    self.stats.stalled_time += lag
+
+            self.stats.samples += 1
+            self.stats.total_lag += lag
+            self.stats.max_lag = max(self.stats.max_lag, lag)
+            self.stats.recent_lags.append(lag)
+
+            if self.on_lag is not None:
+                self.on_lag(lag)
+
+    def _watch(self) -> None:
+        assert self.threshold is not None
+
+        poll = min(self.interval, self.threshold) / 2
+
+        while not self._stopped.wait(poll):
+            with self._lock:
+                # Heartbeats are expected every `interval`, anything past that
+                # is the loop being blocked.
+                blocked_for = time.monotonic() - self._last_beat - self.interval
+
+                if self._current_stall is not None or blocked_for < self.threshold:
+                    continue
+
+                stall = self._capture(blocked_for)
+                if stall is None:
+                    continue
+
+                self._current_stall = stall
+                self.stalls.append(stall)
+                self.stats.stalls += 1
+
+            if self.on_stall is not None:
+                self.on_stall(stall)
+
+    def _capture(self, blocked_for: float) -> Optional[Stall]:
+        assert self._loop_thread_id is not None
+
+        if (frame := sys._current_frames().get(self._loop_thread_id)) is None:
+            return None
+
+        stall = Stall(
+            started_at=datetime.now(timezone.utc) - timedelta(seconds=blocked_for),
+            duration=blocked_for,
+            stack=traceback.format_stack(frame, limit=STACK_LIMIT),
+        )
+        del frame
+
+        # Not every event loop can tell which task is running from another
+        # thread.
+        task = None
+        with contextlib.suppress(RuntimeError):
+            task = asyncio.current_task(self._loop)
+
+        if task is not None:
+            stall.task = f"{task.get_name()} ({task.get_coro().__qualname__})"  # type: ignore[reportOptionalMemberAccess]
+
+            stall.command = _task_commands.get(task)
+
+            if (
+                stall.command is None
+                and (get_context := getattr(task, "get_context", None)) is not None
+            ):
+                stall.command = get_context().get(current_command)
+
+        return stall
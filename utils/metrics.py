@@ -0,0 +1,316 @@
+"""Operational metrics, in the Prometheus text exposition format.
+
+Metrics are plain in-process counters and histograms, cheap enough to update
+from hot paths like the CHUNITHM-NET transport. Values that are already counted
+elsewhere, like cache hits, are copied in by collectors right before the
+metrics are rendered instead of being counted twice.
+"""
+
+import bisect
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Sequence, TypeVar
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+__all__ = [
+    "BotMetrics",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LabelValues = tuple[str, ...]
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _check(self, labelvalues: _LabelValues) -> None:
+        if len(labelvalues) != len(self.labelnames):
+            msg = f"{self.name} takes labels {self.labelnames}, got {labelvalues}"
+            raise ValueError(msg)
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.documentation)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+
+        for suffix, labels, value in self._samples():
+            label_str = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+            lines.append(
+                f"{self.name}{suffix}{{{label_str}}} {_format_value(value)}"
+                if label_str
+                else f"{self.name}{suffix} {_format_value(value)}"
+            )
+
+        return "\n".join(lines)
+
+
+_MetricT = TypeVar("_MetricT", bound=_Metric)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[_LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._check(labelvalues)
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        """Sets the total directly, for things that are counted elsewhere."""
+        self._check(labelvalues)
+        self._values[labelvalues] = value
+
+    def get(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for labelvalues, value in self._values.items():
+            yield "_total", dict(zip(self.labelnames, labelvalues)), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for labelvalues, value in self._values.items():
+            yield "", dict(zip(self.labelnames, labelvalues)), value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count in each bucket (not cumulative, the last one is
+        # +Inf), and the sum of all observations.
+        self._counts: dict[_LabelValues, list[int]] = {}
+        self._sums: dict[_LabelValues, float] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if (counts := self._counts.get(labelvalues)) is None:
+            self._check(labelvalues)
+            counts = self._counts[labelvalues] = [0] * (len(self.buckets) + 1)
+            self._sums[labelvalues] = 0
+
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labelvalues] += value
+
+    def count(self, *labelvalues: str) -> int:
+        return sum(self._counts.get(labelvalues, ()))
+
+    def sum(self, *labelvalues: str) -> float:
+        return self._sums.get(labelvalues, 0)
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for labelvalues, counts in self._counts.items():
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+
+            yield "_sum", labels, self._sums[labelvalues]
+            yield "_count", labels, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: dict[str, Callable[[], None]] = {}
+
+    def register(self, metric: _MetricT) -> _MetricT:
+        if metric.name in self._metrics:
+            msg = f"Metric {metric.name} is already registered"
+            raise ValueError(msg)
+
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, name: str, collector: Callable[[], None]) -> None:
+        """Runs `collector` before every render, to copy values from elsewhere
+        into metrics. Adding a collector under the same name replaces it, so
+        reloaded extensions can add theirs again."""
+        self._collectors[name] = collector
+
+    def remove_collector(self, name: str) -> None:
+        self._collectors.pop(name, None)
+
+    def render(self) -> str:
+        for collector in self._collectors.values():
+            collector()
+
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+# Commands like c>generate can take a while.
+COMMAND_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Parsers and event loop lag are expected to be fast.
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class BotMetrics(MetricsRegistry):
+    def __init__(self) -> None:
+        """The bot's metrics, and the hooks that update them."""
+        super().__init__()
+
+        self.commands = self.register(
+            Counter(
+                "chuninewbot_commands",
+                "Commands invoked, by outcome.",
+                ["command", "status"],
+            )
+        )
+        self.command_duration = self.register(
+            Histogram(
+                "chuninewbot_command_duration_seconds",
+                "Time taken to run a command.",
+                ["command"],
+                buckets=COMMAND_BUCKETS,
+            )
+        )
+
+        self.chunithm_net_request_duration = self.register(
+            Histogram(
+                "chuninewbot_chunithm_net_request_duration_seconds",
+                "Time until CHUNITHM-NET answered a request, not counting reading "
+                "the body.",
+                ["method", "endpoint"],
+            )
+        )
+        self.chunithm_net_response_bytes = self.register(
+            Counter(
+                "chuninewbot_chunithm_net_response_bytes",
+                "Bytes of response bodies received from CHUNITHM-NET.",
+                ["method", "endpoint"],
+            )
+        )
+        self.chunithm_net_responses = self.register(
+            Counter(
+                "chuninewbot_chunithm_net_responses",
+                "Responses received from CHUNITHM-NET, by status code.",
+                ["status"],
+            )
+        )
+        self.parse_duration = self.register(
+            Histogram(
+                "chuninewbot_parse_duration_seconds",
+                "Time taken to parse a CHUNITHM-NET page, including waiting for "
+                "the parser pool.",
+                ["parser"],
+                buckets=FAST_BUCKETS,
+            )
+        )
+
+        self.db_session_duration = self.register(
+            Histogram(
+                "chuninewbot_db_session_duration_seconds",
+                "Time database sessions held on to a connection.",
+                buckets=FAST_BUCKETS,
+            )
+        )
+
+        self.cache_hits = self.register(
+            Counter("chuninewbot_cache_hits", "Cache hits.", ["cache"])
+        )
+        self.cache_misses = self.register(
+            Counter("chuninewbot_cache_misses", "Cache misses.", ["cache"])
+        )
+        self.cache_hit_ratio = self.register(
+            Gauge(
+                "chuninewbot_cache_hit_ratio",
+                "Share of cache lookups that were hits.",
+                ["cache"],
+            )
+        )
+
+        self.event_loop_lag = self.register(
+            Histogram(
+                "chuninewbot_event_loop_lag_seconds",
+                "How late the event loop ran a callback scheduled for a given time.",
+                buckets=FAST_BUCKETS,
+            )
+        )
+
+    def observe_chunithm_net_response(
+        self, method: str, path: str, status: int, elapsed: float, size: int
+    ) -> None:
+        """Hook for `SharedTransport(on_response=...)`."""
+        self.chunithm_net_request_duration.observe(elapsed, method, path)
+        self.chunithm_net_response_bytes.inc(method, path, amount=size)
+        self.chunithm_net_responses.inc(str(status))
+
+    def observe_parse(self, parser_name: str, elapsed: float) -> None:
+        """Hook for `ChuniNet(on_parse=...)`."""
+        self.parse_duration.observe(elapsed, parser_name)
+
+    def observe_cache(self, cache: str, hits: int, misses: int) -> None:
+        self.cache_hits.set(hits, cache)
+        self.cache_misses.set(misses, cache)
+        self.cache_hit_ratio.set(
+            hits / (hits + misses) if hits + misses > 0 else 0, cache
+        )
+
+    def instrument_engine(self, engine: "AsyncEngine") -> None:
+        """Times how long connections of `engine` are checked out, which is
+        roughly how long each database session lasts."""
+        from sqlalchemy import event
+
+        def on_checkout(_, record: Any, __) -> None:
+            record.info["checked_out_at"] = time.perf_counter()
+
+        def on_checkin(_, record: Any) -> None:
+            if (checked_out_at := record.info.pop("checked_out_at", None)) is not None:
+                self.db_session_duration.observe(time.perf_counter() - checked_out_at)
+
+        event.listen(engine.sync_engine, "checkout", on_checkout)
+        event.listen(engine.sync_engine, "checkin", on_checkin)
@@ -0,0 +1,347 @@
+"""Profiles a single run of a coroutine, like a command invocation.
+
+The sampling profiler looks at the event loop from another thread at a fixed
+interval. When one of the profiled tasks is running, the loop thread's stack is
+recorded. When they are all waiting, the chain of coroutines each of them is
+suspended in is recorded instead, which shows what is being waited on. Every
+sample is put in a category (network, parsing, database, ...) by the innermost
+frame that belongs to one.
+
+The deterministic profiler runs `cProfile` on the loop thread instead. It
+counts every function call exactly, but cannot see what is being waited on,
+and counts everything else that runs on the loop meanwhile.
+
+Nothing is installed while no profile is running.
+"""
+
+import asyncio
+import contextlib
+import cProfile
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Coroutine, Literal, Optional
+
+__all__ = ["Profile", "ProfileMode", "profile"]
+
+ProfileMode = Literal["sample", "trace"]
+
+BOT_DIR = Path(__file__).parent.parent
+
+# Matched against frame file names, with forward slashes. The innermost frame
+# matching any of these decides the category of a sample.
+CATEGORIES = (
+    (
+        "parsing",
+        (
+            "chunithm_net/parser",
+            "chunithm_net/_parsing",
+            "chunithm_net/_streaming",
+            "/bs4/",
+            "/lxml/",
+            "/soupsieve/",
+        ),
+    ),
+    (
+        "network",
+        (
+            "chunithm_net/transport",
+            "/httpx/",
+            "/httpcore/",
+            "/h11/",
+            "/h2/",
+            "/anyio/",
+            "/ssl.py",
+        ),
+    ),
+    ("database", ("/sqlalchemy/", "/aiosqlite/")),
+    ("rendering", ("utils/rendering", "utils/render_pool", "/PIL/")),
+    ("discord", ("/discord/", "/aiohttp/")),
+)
+# Where the event loop sits while it has nothing to run, as cProfile names
+# them.
+IDLE_BUILTINS = frozenset(
+    {
+        "<method 'poll' of 'select.epoll' objects>",
+        "<method 'poll' of 'select.poll' objects>",
+        "<method 'control' of 'select.kqueue' objects>",
+        "<built-in method select.select>",
+        "<built-in method _overlapped.GetQueuedCompletionStatus>",
+    }
+)
+# Samples outside of the categories above.
+OTHER_CPU = "cpu"
+OTHER_WAIT = "waiting"
+
+# The profile the current task belongs to.
+_current_profile: ContextVar[Optional["_Sampler"]] = ContextVar(
+    "_current_profile", default=None
+)
+
+
+@dataclass
+class Profile:
+    mode: ProfileMode
+    # Wall time of the profiled coroutine, in seconds.
+    wall_time: float
+    # Seconds attributed to each category.
+    breakdown: dict[str, float]
+    # Collapsed stacks for flame graph tools (`sample`), or `pstats` data
+    # (`trace`).
+    data: bytes
+
+    @property
+    def extension(self) -> str:
+        return "folded" if self.mode == "sample" else "prof"
+
+
+def _filename(code: CodeType) -> str:
+    return code.co_filename.replace("\\", "/")
+
+
+def _categorize(filenames: list[str], fallback: str) -> str:
+    """`filenames` are innermost first."""
+    for filename in filenames:
+        for category, patterns in CATEGORIES:
+            if any(p in filename for p in patterns):
+                return category
+
+    return fallback
+
+
+def _label(code: CodeType) -> str:
+    filename = Path(code.co_filename)
+
+    with contextlib.suppress(ValueError):
+        filename = filename.relative_to(BOT_DIR)
+
+    parts = filename.parts
+    if "site-packages" in parts:
+        parts = parts[parts.index("site-packages") + 1 :]
+
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({'/'.join(parts)})".replace(";", ",")
+
+
+def _thread_stack(frame: Optional[FrameType]) -> list[CodeType]:
+    """Code objects of a thread's stack, innermost first, up to where the event
+    loop ran the current callback."""
+    codes = []
+
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "_run" and _filename(code).endswith("asyncio/events.py"):
+            break
+
+        codes.append(code)
+        frame = frame.f_back
+
+    return codes
+
+
+def _await_stack(task: asyncio.Task) -> list[CodeType]:
+    """Code objects of the coroutines a suspended task is waiting in, innermost
+    first. Awaited tasks are followed into."""
+    codes = []
+    awaitable: Any = task.get_coro()
+
+    while awaitable is not None:
+        if isinstance(awaitable, asyncio.Task):
+            awaitable = awaitable.get_coro()
+            continue
+
+        frame = (
+            getattr(awaitable, "cr_frame", None)
+            or getattr(awaitable, "gi_frame", None)
+            or getattr(awaitable, "ag_frame", None)
+        )
+        if frame is None:
+            break
+
+        codes.append(frame.f_code)
+        awaitable = (
+            getattr(awaitable, "cr_await", None)
+            or getattr(awaitable, "gi_yieldfrom", None)
+            or getattr(awaitable, "ag_await", None)
+        )
+
+    codes.reverse()
+    return codes
+
+
+class _Sampler:
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float) -> None:
+        self.loop = loop
+        self.interval = interval
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.categories: Counter[str] = Counter()
+        self.ticks = 0
+
+        self._loop_thread_id = threading.get_ident()
+        self._tasks: list[asyncio.Task] = []
+        self._tasks_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="command-profiler", daemon=True
+        )
+
+    def add_task(self, task: asyncio.Task) -> None:
+        with self._tasks_lock:
+            self._tasks.append(task)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with contextlib.suppress(AttributeError, RuntimeError, ValueError):
+                self._sample()
+
+    def _record(self, category: str, codes: list[CodeType]) -> None:
+        self.stacks[(category, *(_label(c) for c in reversed(codes)))] += 1
+
+    def _sample(self) -> None:
+        with self._tasks_lock:
+            self._tasks = [t for t in self._tasks if not t.done()]
+            tasks = list(self._tasks)
+
+        if not tasks:
+            return
+
+        running = asyncio.current_task(self.loop)
+        self.ticks += 1
+
+        if running is not None and running in tasks:
+            frame = sys._current_frames().get(self._loop_thread_id)
+            codes = _thread_stack(frame)
+            del frame
+
+            category = _categorize([_filename(c) for c in codes], OTHER_CPU)
+            self.categories[category] += 1
+            self._record(category, codes)
+            return
+
+        # Parents waiting on their children say nothing about where the time
+        # goes, so the tick goes to the most common specific wait.
+        waits: Counter[str] = Counter()
+        for task in tasks:
+            codes = _await_stack(task)
+            category = _categorize([_filename(c) for c in codes], OTHER_WAIT)
+            waits[category] += 1
+            self._record(category, codes)
+
+        specific = [c for c, _ in waits.most_common() if c != OTHER_WAIT]
+        self.categories[specific[0] if specific else OTHER_WAIT] += 1
+
+
+def _task_factory(previous: Any):
+    def factory(loop: asyncio.AbstractEventLoop, coro: Coroutine, **kwargs: Any):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+
+        # Runs in the creating task's context, so children of a profiled task
+        # are profiled too.
+        if (sampler := _current_profile.get()) is not None:
+            sampler.add_task(task)
+
+        return task
+
+    return factory
+
+
+async def _sample(coro: Coroutine, interval: float) -> Profile:
+    loop = asyncio.get_running_loop()
+    sampler = _Sampler(loop, interval)
+
+    previous_factory = loop.get_task_factory()
+    loop.set_task_factory(_task_factory(previous_factory))
+    token = _current_profile.set(sampler)
+    started = time.perf_counter()
+    sampler.start()
+
+    try:
+        await loop.create_task(coro)
+    finally:
+        wall_time = time.perf_counter() - started
+        sampler.stop()
+        _current_profile.reset(token)
+        loop.set_task_factory(previous_factory)
+
+    ticks = max(sampler.ticks, 1)
+    return Profile(
+        mode="sample",
+        wall_time=wall_time,
+        breakdown={
+            category: wall_time * count / ticks
+            for category, count in sampler.categories.most_common()
+        },
+        data="".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in sampler.stacks.items()
+        ).encode(),
+    )
+
+
+async def _trace(coro: Coroutine) -> Profile:
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+
+    try:
+        await coro
+    finally:
+        profiler.disable()
+        wall_time = time.perf_counter() - started
+
+    profiler.create_stats()
+    stats: dict = profiler.stats  # type: ignore[reportAttributeAccessIssue]
+
+    breakdown: Counter[str] = Counter()
+    for (filename, _, name), (_, _, own_time, _, _) in stats.items():
+        if filename == "~" and name in IDLE_BUILTINS:
+            category = OTHER_WAIT
+        else:
+            category = _categorize([filename.replace("\\", "/")], OTHER_CPU)
+
+        breakdown[category] += own_time
+
+    # Time not spent in any function, like between the profiler's hooks.
+    breakdown[OTHER_WAIT] += max(wall_time - sum(breakdown.values()), 0)
+
+    return Profile(
+        mode="trace",
+        wall_time=wall_time,
+        breakdown=dict(breakdown.most_common()),
+        data=marshal.dumps(stats),
+    )
+
+
+async def profile(
+    coro: Coroutine, *, mode: ProfileMode = "sample", interval: float = 0.002
+) -> Profile:
+    """Runs `coro` to completion under a profiler.
+
+    Parameters
+    ----------
+    mode: ProfileMode
+        `"sample"` for the sampling profiler, which produces collapsed stacks
+        for flame graph tools. `"trace"` for `cProfile`, which produces data
+        for `pstats`, and can only run one at a time.
+    interval: float
+        Time between samples, in seconds.
+    """
+    if mode == "sample":
+        return await _sample(coro, interval)
+
+    return await _trace(coro)
@@ -0,0 +1,78 @@
+import asyncio
+import contextlib
+from typing import Any, Awaitable, Callable, Optional
+
+__all__ = ["ThrottledProgress"]
+
+
+class ThrottledProgress:
+    def __init__(
+        self,
+        report: Callable[[int], Awaitable[Any]],
+        *,
+        interval: float = 2.0,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ) -> None:
+        """Reports how many items are done at most once every `interval` seconds,
+        however quickly they complete.
+
+        Meant for progress messages on Discord, where editing the message after
+        every item would run into rate limits when items complete concurrently.
+
+        Parameters
+        ----------
+        report: Callable[[int], Awaitable[Any]]
+            Called with the number of completed items. Only called when that
+            number changed since the last report.
+        interval: float
+            Minimum time between reports, in seconds.
+        on_error: Optional[Callable[[Exception], None]]
+            Called if `report` raises, e.g. because the progress message was
+            deleted. Reporting stops, but the work being reported on goes on.
+        sleep: Callable[[float], Awaitable[Any]]
+            Waits between reports. Replaced in tests.
+        """
+        self.completed = 0
+
+        self._report = report
+        self._interval = interval
+        self._on_error = on_error
+        self._sleep = sleep
+        self._task: Optional[asyncio.Task] = None
+
+    def advance(self, count: int = 1) -> None:
+        self.completed += count
+
+    async def __aenter__(self) -> "ThrottledProgress":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._task is None:
+            return
+
+        if not self._task.done():
+            self._task.cancel()
+
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+    async def _run(self) -> None:
+        reported = 0
+
+        while True:
+            await self._sleep(self._interval)
+
+            if self.completed == reported:
+                continue
+
+            reported = self.completed
+
+            try:
+                await self._report(reported)
+            except Exception as e:  # noqa: BLE001
+                if self._on_error is not None:
+                    self._on_error(e)
+
+                return
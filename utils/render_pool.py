@@ -0,0 +1,142 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
+
+from utils.types.errors import RenderExpired, RenderQueueFull
+
+if TYPE_CHECKING:
+    from discord.ext.commands import Context
+
+T = TypeVar("T")
+
+# Interaction tokens can be used to send followups for this long.
+INTERACTION_LIFETIME = timedelta(minutes=15)
+
+
+def interaction_deadline(ctx: "Context") -> Optional[float]:
+    """UNIX timestamp after which there is no point finishing a render for `ctx`,
+    because the interaction can no longer be responded to."""
+    if ctx.interaction is None:
+        return None
+
+    return (ctx.interaction.created_at + INTERACTION_LIFETIME).timestamp()
+
+
+@dataclass
+class RenderPoolStats:
+    completed: int = 0
+    failed: int = 0
+    expired: int = 0
+    rejected: int = 0
+
+    # In seconds.
+    total_queue_wait: float = 0
+    total_render_time: float = 0
+
+
+class RenderPool:
+    def __init__(
+        self,
+        max_workers: int,
+        *,
+        max_queue_size: int = 8,
+        initializer: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """A process pool for CPU-heavy image rendering, so that renders run on
+        all cores and never block the event loop.
+
+        Parameters
+        ----------
+        max_workers: int
+            Number of worker processes, which is also the number of renders
+            that can run at once.
+        max_queue_size: int
+            How many renders can wait for a free worker. Further renders are
+            rejected with `RenderQueueFull`.
+        initializer: Optional[Callable[[], Any]]
+            Called once in every worker process when it starts, e.g. to load
+            assets shared by all renders.
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.stats = RenderPoolStats()
+
+        self._executor = ProcessPoolExecutor(
+            max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+        )
+        self._slots = asyncio.Semaphore(max_workers)
+        self._waiting = 0
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """Run `fn(*args)` in a worker process.
+
+        If `deadline` (a UNIX timestamp) passes before the render finishes, it is
+        cancelled and `RenderExpired` is raised. A render that has already
+        started can't be interrupted, but its result is thrown away. The same
+        happens if the awaiting task is cancelled.
+        """
+        if self._waiting >= self.max_queue_size:
+            self.stats.rejected += 1
+            raise RenderQueueFull
+
+        submitted = time.monotonic()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), _remaining(deadline))
+        except TimeoutError:
+            self.stats.expired += 1
+            raise RenderExpired from None
+        finally:
+            self._waiting -= 1
+
+        started = time.monotonic()
+        self.stats.total_queue_wait += started - submitted
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(fn, *args)
+
+        # Hold the slot until the worker is actually free again, even if we stop
+        # waiting for the result early.
+        def release(_: Future) -> None:
+            loop.call_soon_threadsafe(self._slots.release)
+
+        future.add_done_callback(release)
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), _remaining(deadline)
+            )
+        except TimeoutError:
+            self.stats.expired += 1
+            raise RenderExpired from None
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats.failed += 1
+            raise
+
+        self.stats.completed += 1
+        self.stats.total_render_time += time.monotonic() - started
+
+        return result
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+
+    return max(0, deadline - time.time())
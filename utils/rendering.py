@@ -0,0 +1,557 @@
+"""Image rendering for `c>generate` and `c>avatar`.
+
+Everything CPU-bound in here is meant to run in the render pool (see
+`utils.render_pool`), so it takes and returns picklable values.
+"""
+
+import asyncio
+import hashlib
+import io
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, Optional, Sequence
+
+import httpx
+from PIL import Image, ImageDraw, ImageFont
+
+from chunithm_net.consts import KEY_INTERNAL_LEVEL, KEY_PLAY_RATING
+from chunithm_net.models.enums import ClearType, ComboType, Difficulty, Rank
+
+if TYPE_CHECKING:
+    from chunithm_net.models.player_data import Rating
+    from chunithm_net.models.record import Record
+
+BOT_DIR = Path(__file__).parent.parent
+PHOTO_DIR = BOT_DIR / "photo"
+FONT_DIR = BOT_DIR / "fonts"
+
+JACKET_SIZE = (135, 135)
+ICON_SIZE = (96, 27)
+
+RANK_ICONS = {
+    Rank.SSSp: "icon_rank_13.png",
+    Rank.SSS: "icon_rank_12.png",
+    Rank.SSp: "icon_rank_11.png",
+    Rank.SS: "icon_rank_10.png",
+    Rank.Sp: "icon_rank_9.png",
+    Rank.S: "icon_rank_8.png",
+    Rank.AAA: "icon_rank_7.png",
+    Rank.AA: "icon_rank_6.png",
+    Rank.A: "icon_rank_5.png",
+    Rank.BBB: "icon_rank_4.png",
+    Rank.BB: "icon_rank_3.png",
+    Rank.B: "icon_rank_2.png",
+    Rank.C: "icon_rank_1.png",
+    Rank.D: "icon_rank_0.png",
+}
+
+CLEAR_ICONS = {
+    ClearType.CLEAR: "icon_clear.png",
+    ClearType.HARD: "icon_hard.png",
+    ClearType.ABSOLUTE: "icon_absolute.png",
+    ClearType.ABSOLUTE_PLUS: "icon_absolutep.png",
+    ClearType.CATASTROPHY: "icon_catastrophy.png",
+}
+
+COMBO_ICONS = {
+    ComboType.FULL_COMBO: "icon_fullcombo.png",
+    ComboType.ALL_JUSTICE: "icon_alljustice.png",
+    ComboType.ALL_JUSTICE_CRITICAL: "icon_alljusticecritical.png",
+}
+
+DIFFICULTY_FRAMES = {
+    Difficulty.BASIC: "basic.png",
+    Difficulty.ADVANCED: "advanced.png",
+    Difficulty.EXPERT: "expert.png",
+    Difficulty.MASTER: "master.png",
+    Difficulty.ULTIMA: "ultima.png",
+}
+
+# Font name -> (file, size)
+FONTS = {
+    "info": ("ArialUnicodeBold.ttf", 50),
+    "score": ("ArialUnicodeBold.ttf", 45),
+    "name": ("ArialUnicodeBold.ttf", 22),
+    "const": ("ArialUnicodeBold.ttf", 20),
+    "place": ("ArialUnicodeBold.ttf", 16),
+}
+
+
+def _open_image(path: Path, size: Optional[tuple[int, int]] = None) -> Image.Image:
+    with Image.open(path) as image:
+        image.load()
+
+        return image.resize(size) if size is not None else image.copy()
+
+
+def _save_image(image: Image.Image, path: Path) -> int:
+    """Saves `image` and returns the file's size."""
+    image.save(path)
+
+    return path.stat().st_size
+
+
+def _unlink_all(paths: list[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+@dataclass
+class RenderAssets:
+    """Decoded static images and fonts, loaded once and reused for every render."""
+
+    background: Image.Image
+    error_frame: Image.Image
+    error_jacket: Image.Image
+    difficulty_frames: dict[Difficulty, Image.Image]
+    rank_icons: dict[Rank, Image.Image]
+    clear_icons: dict[ClearType, Image.Image]
+    combo_icons: dict[ComboType, Image.Image]
+    fonts: dict[str, ImageFont.FreeTypeFont | ImageFont.ImageFont]
+
+    @classmethod
+    def load(
+        cls, photo_dir: Path = PHOTO_DIR, font_dir: Path = FONT_DIR
+    ) -> "RenderAssets":
+        """Blocking, run this in a thread when called from the event loop."""
+        return cls(
+            background=_open_image(photo_dir / "BG.png"),
+            error_frame=_open_image(photo_dir / "ERROR.png"),
+            error_jacket=_open_image(photo_dir / "JACKETERROR.png", JACKET_SIZE),
+            difficulty_frames={
+                k: _open_image(photo_dir / v) for k, v in DIFFICULTY_FRAMES.items()
+            },
+            rank_icons={
+                k: _open_image(photo_dir / v, ICON_SIZE) for k, v in RANK_ICONS.items()
+            },
+            clear_icons={
+                k: _open_image(photo_dir / v, ICON_SIZE) for k, v in CLEAR_ICONS.items()
+            },
+            combo_icons={
+                k: _open_image(photo_dir / v, ICON_SIZE) for k, v in COMBO_ICONS.items()
+            },
+            fonts={
+                name: ImageFont.truetype(font_dir / file, size=size)
+                for name, (file, size) in FONTS.items()
+            },
+        )
+
+
+def decode_jacket(content: bytes) -> Image.Image:
+    with Image.open(io.BytesIO(content)) as image:
+        return image.resize(JACKET_SIZE)
+
+
+class JacketCache:
+    def __init__(
+        self,
+        cache_dir: Optional[Path],
+        *,
+        max_memory_items: int = 512,
+        max_disk_size: int = 256 * 1024 * 1024,
+    ) -> None:
+        """Size-bounded LRU caches of jacket tiles, already resized for rendering.
+
+        Tiles are kept decoded in memory, and as PNGs on disk so they survive
+        restarts. Both are keyed by jacket URL.
+
+        Parameters
+        ----------
+        cache_dir: Optional[Path]
+            Where to store tiles on disk. If `None`, tiles are only cached in memory.
+        max_memory_items: int
+            Maximum number of tiles kept in memory.
+        max_disk_size: int
+            Maximum total size of tiles on disk, in bytes.
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_size = max_disk_size
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory: OrderedDict[str, Image.Image] = OrderedDict()
+        # File name -> size, least recently used first.
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(timeout=30.0))
+
+    async def load(self) -> None:
+        if self.cache_dir is None:
+            return
+
+        def scan():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)  # type: ignore[reportOptionalMemberAccess]
+            files = [(p.stat(), p.name) for p in self.cache_dir.glob("*.png")]  # type: ignore[reportOptionalMemberAccess]
+
+            for stat, name in sorted(files, key=lambda x: x[0].st_mtime):
+                self._disk[name] = stat.st_size
+                self._disk_size += stat.st_size
+
+        await asyncio.to_thread(scan)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def get(self, url: str) -> Optional[Image.Image]:
+        """Returns the tile for a jacket URL, or `None` if it can't be downloaded.
+
+        The returned image is shared and must not be modified.
+        """
+        if (tile := self._memory.get(url)) is not None:
+            self._memory.move_to_end(url)
+            self.hits += 1
+            return tile
+
+        name = f"{hashlib.sha256(url.encode()).hexdigest()}.png"
+
+        tile = None
+
+        if self.cache_dir is not None and name in self._disk:
+            self._disk.move_to_end(name)
+
+            try:
+                tile = await asyncio.to_thread(_open_image, self.cache_dir / name)
+            except Exception:  # noqa: BLE001
+                # Corrupt, or evicted by a concurrent `_store` meanwhile.
+                self._forget(name)
+            else:
+                self.disk_hits += 1
+
+        if tile is None:
+            self.misses += 1
+
+            try:
+                response = await self._client.get(url)
+                response.raise_for_status()
+                tile = await asyncio.to_thread(decode_jacket, response.content)
+            except Exception:  # noqa: BLE001
+                return None
+
+            if self.cache_dir is not None:
+                await self._store(name, tile)
+
+        self._memory[url] = tile
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+        return tile
+
+    async def _store(self, name: str, tile: Image.Image) -> None:
+        """Writes a tile to disk and evicts old ones. The bookkeeping happens on
+        the event loop, only the file I/O runs in a thread."""
+        assert self.cache_dir is not None
+
+        try:
+            size = await asyncio.to_thread(_save_image, tile, self.cache_dir / name)
+        except OSError:
+            # The tile is still cached in memory.
+            return
+
+        self._forget(name)
+        self._disk[name] = size
+        self._disk_size += size
+
+        evicted = []
+        while self._disk_size > self.max_disk_size and len(self._disk) > 1:
+            evicted_name, evicted_size = self._disk.popitem(last=False)
+            self._disk_size -= evicted_size
+            evicted.append(self.cache_dir / evicted_name)
+
+        if evicted:
+            await asyncio.to_thread(_unlink_all, evicted)
+
+    def _forget(self, name: str) -> None:
+        if (size := self._disk.pop(name, None)) is not None:
+            self._disk_size -= size
+
+
+def _render_record(
+    assets: RenderAssets,
+    section: str,
+    record: "Record",
+    place: int,
+    jacket: Optional[Image.Image],
+) -> Image.Image:
+    internal_level = record.extras.get(KEY_INTERNAL_LEVEL)
+    rating = record.extras.get(KEY_PLAY_RATING)
+    rating_str = f"{rating:.3f}"[:5] if rating >= 10 else f"{rating:.3f}"[:4]
+
+    frame = assets.difficulty_frames.get(record.difficulty, assets.error_frame)
+    song_image = frame.copy()
+
+    song_draw = ImageDraw.Draw(song_image)
+    song_image.paste(jacket or assets.error_jacket, (17, 17))
+    song_draw.text((2, -4), f"#{place}", font=assets.fonts["place"], fill="white")
+    song_draw.text(
+        (166, 35), f"{record.title}", font=assets.fonts["name"], fill="white"
+    )
+    song_draw.text(
+        (166, 4), f"Const {internal_level}", font=assets.fonts["const"], fill="white"
+    )
+    song_draw.text(
+        (346, 4), f"Rating {rating_str}", font=assets.fonts["const"], fill="white"
+    )
+    song_draw.text(
+        (165, 55), f"{record.score:,}", font=assets.fonts["score"], fill="white"
+    )
+
+    rank_position = (264, 125) if section == "B30" else (166, 125)
+    song_image.paste(assets.rank_icons[record.rank], rank_position)
+
+    if record.combo_lamp != ComboType.NONE:
+        song_image.paste(assets.combo_icons[record.combo_lamp], (362, 125))
+
+    if record.clear_lamp != ClearType.FAILED:
+        song_image.paste(assets.clear_icons[record.clear_lamp], (166, 125))
+
+    return song_image
+
+
+def render_b30(
+    assets: RenderAssets,
+    player_name: str,
+    rating: "Rating",
+    best30: Sequence["Record"],
+    recent10: Sequence["Record"],
+    avg_rating: object,
+    jackets: dict[str, Image.Image],
+) -> Image.Image:
+    """Render the best 30/recent 10 image. CPU-bound, don't call this on the event loop.
+
+    `jackets` maps jacket URLs to tiles. Records whose jacket is missing get a
+    placeholder.
+    """
+    image = assets.background.copy()
+    draw = ImageDraw.Draw(image)
+    date_time_str = datetime.now(timezone(timedelta(hours=9))).strftime("%Y-%m-%d")
+
+    draw.text((602, 181), f"{player_name}", font=assets.fonts["info"], fill="black")
+    draw.text(
+        (1280, 181),
+        f"{rating.current:.2f} (MAX: {rating.max:.2f})",
+        font=assets.fonts["info"],
+        fill="black",
+    )
+    draw.text((602, 1892), f"{avg_rating:.2f}", font=assets.fonts["info"], fill="black")
+    draw.text(
+        (2150, 40),
+        f"Generated: {date_time_str}\nImage generated by \nchuninewbot",
+        font=assets.fonts["info"],
+        fill="black",
+    )
+
+    max_columns = 5
+    padding = 65
+    tile_width = 470
+    tile_height = 170
+
+    for section, records, x_offset, y_offset in [
+        ("B30", best30, 50, 386),
+        ("R10", recent10, 50, 2057),
+    ]:
+        for i, record in enumerate(records, start=1):
+            jacket = jackets.get(record.jacket) if record.jacket else None
+            song_image = _render_record(assets, section, record, i, jacket)
+
+            col = (i - 1) % max_columns
+            row = (i - 1) // max_columns
+            x = x_offset + col * (tile_width + padding)
+            y = y_offset + row * (tile_height + padding)
+
+            image.paste(song_image, (x, y))
+
+    return image
+
+
+_worker_assets: Optional[RenderAssets] = None
+
+
+def init_worker() -> None:
+    """Render pool initializer, loads assets once per worker process."""
+    global _worker_assets
+
+    try:
+        _worker_assets = RenderAssets.load()
+    except OSError:
+        # Raising here would break the whole pool, so leave it to the first
+        # render to raise instead.
+        _worker_assets = None
+
+
+ImageFormat = Literal["png", "webp"]
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    format: ImageFormat
+
+    # Time taken to encode the image, in seconds.
+    encode_time: float
+
+    @property
+    def filename_extension(self) -> str:
+        return self.format
+
+
+def encode_image(
+    image: Image.Image,
+    format: ImageFormat = "png",
+    *,
+    quality: int = 90,
+    optimize: bool = False,
+) -> EncodedImage:
+    """Encode an image in memory.
+
+    Parameters
+    ----------
+    format: ImageFormat
+        Output format.
+    quality: int
+        WebP quality between 1 and 100, where 100 means lossless. Ignored for PNG.
+    optimize: bool
+        Spend more time to produce smaller PNGs. Ignored for WebP.
+    """
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+
+    if format == "webp":
+        if quality >= 100:
+            image.save(buffer, "webp", lossless=True)
+        else:
+            image.save(buffer, "webp", quality=quality)
+    else:
+        image.save(buffer, "png", optimize=optimize)
+
+    return EncodedImage(buffer.getvalue(), format, time.perf_counter() - start)
+
+
+def render_b30_image(
+    player_name: str,
+    rating: "Rating",
+    best30: Sequence["Record"],
+    recent10: Sequence["Record"],
+    avg_rating: object,
+    jackets: dict[str, Image.Image],
+    *,
+    format: ImageFormat = "png",
+    quality: int = 90,
+    optimize: bool = False,
+) -> EncodedImage:
+    """`render_b30` with this process' assets, encoded with `encode_image`."""
+    global _worker_assets
+
+    if _worker_assets is None:
+        _worker_assets = RenderAssets.load()
+
+    image = render_b30(
+        _worker_assets, player_name, rating, best30, recent10, avg_rating, jackets
+    )
+
+    return encode_image(image, format, quality=quality, optimize=optimize)
+
+
+@dataclass
+class DrawCoordinates:
+    sx: int = 0
+    sy: int = 0
+    dx_offset: int = 0
+    dy: int = 0
+    width: int = 0
+    height: int = 0
+    rotate: int = 0
+
+
+AVATAR_COORDS = {
+    "skinfoot_r": DrawCoordinates(
+        sy=204,
+        dx_offset=84,
+        dy=260,
+        width=42,
+        height=52,
+    ),
+    "skinfoot_l": DrawCoordinates(
+        sx=42,
+        sy=204,
+        dx_offset=147,
+        dy=260,
+        width=42,
+        height=52,
+    ),
+    "skin": DrawCoordinates(
+        dx_offset=72,
+        dy=73,
+        width=128,
+        height=204,
+    ),
+    "wear": DrawCoordinates(
+        dx_offset=7,
+        dy=86,
+        width=258,
+        height=218,
+    ),
+    "face": DrawCoordinates(
+        dx_offset=107,
+        dy=80,
+        width=58,
+        height=64,
+    ),
+    "face_cover": DrawCoordinates(dx_offset=78, dy=76, width=116, height=104),
+    "head": DrawCoordinates(
+        width=200,
+        height=150,
+        dx_offset=37,
+        dy=8,
+    ),
+    "hand_r": DrawCoordinates(
+        width=36,
+        height=72,
+        dx_offset=52,
+        dy=158,
+    ),
+    "hand_l": DrawCoordinates(
+        width=36,
+        height=72,
+        dx_offset=184,
+        dy=158,
+    ),
+    "item_r": DrawCoordinates(width=100, height=272, dx_offset=9, dy=30, rotate=-5),
+    "item_l": DrawCoordinates(
+        sx=100, width=100, height=272, dx_offset=163, dy=30, rotate=5
+    ),
+}
+
+
+def render_avatar(items: dict[str, bytes]) -> io.BytesIO:
+    avatar = Image.open(io.BytesIO(items["base"]))
+
+    # crop out the USER AVATAR text at the top
+    avatar = avatar.crop((0, 20, avatar.width, avatar.height))
+
+    back = Image.open(io.BytesIO(items["back"]))
+
+    base_x = int((avatar.width - back.width) / 2)
+    avatar.paste(back, (base_x, 25), back)
+
+    for name, coords in AVATAR_COORDS.items():
+        image = Image.open(io.BytesIO(items[name]))
+        crop = image.crop(
+            (
+                coords.sx,
+                coords.sy,
+                coords.sx + coords.width,
+                coords.sy + coords.height,
+            )
+        ).rotate(coords.rotate, expand=True, resample=Image.Resampling.BICUBIC)
+        avatar.paste(crop, (base_x + coords.dx_offset, coords.dy), crop)
+
+    buffer = io.BytesIO()
+    avatar.save(buffer, "png", optimize=True)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,318 @@
+"""A local copy of every player's best scores, kept up to date incrementally.
+
+CHUNITHM-NET cannot list the scores that changed since a point in time, but its
+playlog has the last 50 plays along with their difficulties. After the first
+full sync, only the difficulty folders played since the previous sync are
+fetched again, and nothing is fetched while the last play date stays the same.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional, Sequence
+
+from sqlalchemy import delete, select
+
+from chunithm_net.consts import KEY_SONG_ID
+from chunithm_net.models.enums import ClearType, ComboType, Difficulty, Genres, Rank
+from chunithm_net.models.record import MusicRecord, RecentRecord, Record
+from database.models import ScoreSnapshot, ScoreSyncState
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    from chunithm_net import ChuniNet
+    from utils.catalog import ChartCatalog
+
+# Number of plays CHUNITHM-NET keeps in the playlog.
+PLAYLOG_SIZE = 50
+
+ALL_FOLDERS = frozenset(Difficulty)
+
+
+@dataclass(frozen=True, slots=True)
+class SyncPlan:
+    folders: frozenset[Difficulty]
+
+    # Plays made since the previous sync. Play counts of these charts are out
+    # of date.
+    new_plays: tuple[RecentRecord, ...] = ()
+
+    @property
+    def full(self) -> bool:
+        return self.folders == ALL_FOLDERS
+
+
+def plan_sync(
+    last_play_date: Optional[datetime], recent: Sequence[RecentRecord]
+) -> SyncPlan:
+    """Decides which difficulty folders have to be fetched again.
+
+    Parameters
+    ----------
+    last_play_date: Optional[datetime]
+        The last play date seen at the previous sync, or None if the player
+        was never synced.
+    recent: Sequence[RecentRecord]
+        The current playlog, newest first.
+    """
+    if last_play_date is None:
+        return SyncPlan(ALL_FOLDERS)
+
+    # Play dates only have minute precision, so plays from the same minute as
+    # the previous sync may or may not have been seen. Treat them as new.
+    new_plays = tuple(r for r in recent if r.date >= last_play_date)
+
+    # If the playlog is full and the previous sync is not in it, plays may
+    # have fallen off the end.
+    if len(recent) >= PLAYLOG_SIZE and all(r.date > last_play_date for r in recent):
+        return SyncPlan(ALL_FOLDERS, new_plays)
+
+    return SyncPlan(frozenset(r.difficulty for r in new_plays), new_plays)
+
+
+def _utc(date: datetime) -> datetime:
+    """Converts to naive UTC, which is how dates are stored."""
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def sync_scores(
+    begin_session: "async_sessionmaker[AsyncSession]",
+    client: "ChuniNet",
+    discord_id: int,
+    last_play_date: datetime,
+    *,
+    limiter: Optional[asyncio.Semaphore] = None,
+) -> SyncPlan:
+    """Brings the stored scores of a player up to date.
+
+    No database session is open while waiting on CHUNITHM-NET. The sync state
+    is read in one short session, everything is fetched, and then written in
+    another.
+
+    Parameters
+    ----------
+    begin_session: async_sessionmaker[AsyncSession]
+        Opens the sessions to read and write scores with.
+    last_play_date: datetime
+        The player's current last play date, from `ChuniNet.authenticate()` or
+        `ChuniNet.player_data()`.
+    limiter: Optional[asyncio.Semaphore]
+        Held while fetching each difficulty folder, to limit how many requests
+        are sent for the player at once. If None, 4 folders are fetched at once.
+
+    Returns
+    -------
+    SyncPlan
+        What was fetched. `folders` is empty if the scores were already fresh.
+    """
+    async with begin_session() as session:
+        state = await session.get(ScoreSyncState, discord_id)
+
+    if state is not None and state.last_play_date == _utc(last_play_date):
+        return SyncPlan(frozenset())
+
+    if state is None:
+        plan = plan_sync(None, [])
+    else:
+        plan = plan_sync(
+            state.last_play_date.replace(tzinfo=timezone.utc),
+            await client.recent_record(),
+        )
+
+    limiter = limiter or asyncio.Semaphore(4)
+
+    async def fetch_folder(difficulty: Difficulty) -> list[Record]:
+        async with limiter:
+            return await client.music_record_by_folder(difficulty=difficulty)
+
+    difficulties = sorted(plan.folders, key=lambda d: d.value)
+    folders = dict(
+        zip(
+            difficulties,
+            await asyncio.gather(*(fetch_folder(d) for d in difficulties)),
+        )
+    )
+
+    fetched_at = _utc(datetime.now(timezone.utc))
+
+    async with begin_session() as session:
+        existing = {
+            (s.song_id, s.difficulty): s for s in await load_scores(session, discord_id)
+        }
+
+        for difficulty, records in folders.items():
+            seen = set()
+
+            for record in records:
+                if (song_id := record.extras.get(KEY_SONG_ID)) is None:
+                    continue
+
+                key = (song_id, record.difficulty.short_form())
+                seen.add(key)
+
+                if (snapshot := existing.get(key)) is None:
+                    snapshot = existing[key] = ScoreSnapshot(
+                        discord_id=discord_id, song_id=key[0], difficulty=key[1]
+                    )
+                    session.add(snapshot)
+
+                _update_snapshot(snapshot, record, fetched_at)
+
+            short_form = difficulty.short_form()
+            for key in [k for k in existing if k[1] == short_form and k not in seen]:
+                await session.delete(existing.pop(key))
+
+        # Playlog entries have no song ID, so go by title. Songs sharing a title
+        # and difficulty all lose their play counts, which only costs a refetch.
+        played = {(r.title, r.difficulty.short_form()) for r in plan.new_plays}
+        for snapshot in existing.values():
+            if (snapshot.title, snapshot.difficulty) in played:
+                snapshot.play_count = None
+
+        await session.merge(
+            ScoreSyncState(
+                discord_id=discord_id,
+                last_play_date=_utc(last_play_date),
+                synced_at=fetched_at,
+            )
+        )
+        await session.commit()
+
+    return plan
+
+
+def _update_snapshot(
+    snapshot: ScoreSnapshot, record: Record, fetched_at: datetime
+) -> None:
+    snapshot.title = record.title
+    snapshot.score = record.score
+    snapshot.rank = record.rank.value
+    snapshot.clear_lamp = record.clear_lamp.value
+    snapshot.combo_lamp = record.combo_lamp.value
+    snapshot.fetched_at = fetched_at
+
+    if isinstance(record, MusicRecord) and record.play_count is not None:
+        snapshot.play_count = record.play_count
+
+
+async def store_music_records(
+    session: "AsyncSession", discord_id: int, records: Sequence[MusicRecord]
+) -> None:
+    """Saves the records of a song, including their play counts, and commits
+    the session."""
+    fetched_at = _utc(datetime.now(timezone.utc))
+
+    for record in records:
+        if (song_id := record.extras.get(KEY_SONG_ID)) is None:
+            continue
+
+        snapshot = ScoreSnapshot(
+            discord_id=discord_id,
+            song_id=song_id,
+            difficulty=record.difficulty.short_form(),
+        )
+        snapshot = await session.merge(snapshot)
+        _update_snapshot(snapshot, record, fetched_at)
+
+    await session.commit()
+
+
+async def load_scores(
+    session: "AsyncSession", discord_id: int, *, song_id: Optional[int] = None
+) -> list[ScoreSnapshot]:
+    """Stored scores of a player, optionally only for one song, in difficulty
+    order."""
+    stmt = select(ScoreSnapshot).where(ScoreSnapshot.discord_id == discord_id)
+
+    if song_id is not None:
+        stmt = stmt.where(ScoreSnapshot.song_id == song_id)
+
+    snapshots = (await session.execute(stmt)).scalars().all()
+
+    return sorted(
+        snapshots,
+        key=lambda s: (s.song_id, Difficulty.from_short_form(s.difficulty).value),
+    )
+
+
+async def clear_scores(session: "AsyncSession", discord_id: int) -> None:
+    """Forgets the stored scores of a player, e.g. when they log out or switch
+    accounts. Does not commit the session."""
+    await session.execute(
+        delete(ScoreSnapshot).where(ScoreSnapshot.discord_id == discord_id)
+    )
+    await session.execute(
+        delete(ScoreSyncState).where(ScoreSyncState.discord_id == discord_id)
+    )
+
+
+def filter_folder(
+    snapshots: Sequence[ScoreSnapshot],
+    catalog: "ChartCatalog",
+    *,
+    level: Optional[str] = None,
+    genre: Optional[Genres] = None,
+    difficulty: Optional[Difficulty] = None,
+) -> list[ScoreSnapshot]:
+    """Picks the scores `ChuniNet.music_record_by_folder` returns for the same
+    criteria, which are applied in the same order. Levels and genres are
+    looked up in `catalog`, so charts missing from it are left out.
+
+    Filtering by rank is not supported.
+    """
+    if difficulty == Difficulty.WORLDS_END:
+        return [s for s in snapshots if s.difficulty == "WE"]
+
+    if level is not None:
+        return [
+            s
+            for s in snapshots
+            if s.difficulty != "WE"
+            and (chart := catalog.chart(s.song_id, s.difficulty)) is not None
+            and chart.level == level
+        ]
+
+    if genre is not None and difficulty is None:
+        msg = "Difficulty cannot be None when genre is specified"
+        raise ValueError(msg)
+
+    if difficulty is None:
+        msg = "No search criteria specified"
+        raise ValueError(msg)
+
+    snapshots = [s for s in snapshots if s.difficulty == difficulty.short_form()]
+
+    if genre is None or genre == Genres.ALL:
+        return snapshots
+
+    return [
+        s
+        for s in snapshots
+        if (song := catalog.song(s.song_id)) is not None and song.genre == str(genre)
+    ]
+
+
+def to_record(snapshot: ScoreSnapshot) -> Record:
+    record = Record(**_record_fields(snapshot))
+    record.extras[KEY_SONG_ID] = snapshot.song_id
+
+    return record
+
+
+def to_music_record(snapshot: ScoreSnapshot) -> MusicRecord:
+    record = MusicRecord(**_record_fields(snapshot), play_count=snapshot.play_count)
+    record.extras[KEY_SONG_ID] = snapshot.song_id
+
+    return record
+
+
+def _record_fields(snapshot: ScoreSnapshot) -> dict:
+    return {
+        "title": snapshot.title,
+        "difficulty": Difficulty.from_short_form(snapshot.difficulty),
+        "score": snapshot.score,
+        "rank": Rank(snapshot.rank),
+        "clear_lamp": ClearType(snapshot.clear_lamp),
+        "combo_lamp": ComboType(snapshot.combo_lamp),
+    }
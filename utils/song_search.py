@@ -0,0 +1,251 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Guild ID of song titles and aliases usable in every guild.
+GLOBAL_GUILD_ID = -1
+
+# Leeway for comparing the upper bound of a score against actual scores, so that
+# floating point error never prunes a choice that would have tied.
+_EPSILON = 1e-6
+
+# Number of choices scored up front when looking for the single best match, to
+# get a lower bound for pruning the rest.
+_PROBE_SIZE = 32
+
+
+class CachedAlias:
+    id: Optional[int] = None
+    alias: str
+    title: str
+    song_id: int
+    guild_id: Optional[int] = None
+
+    def __init__(
+        self,
+        id: Optional[int],
+        alias: str,
+        title: str,
+        song_id: int,
+        guild_id: Optional[int],
+    ) -> None:
+        self.id = id
+        self.alias = alias
+        self.title = title
+        self.song_id = song_id
+        self.guild_id = guild_id
+
+
+@dataclass(frozen=True)
+class SearchMatch:
+    alias: CachedAlias
+    similarity: float
+
+
+class _Partition:
+    """The song titles and aliases of a single guild, lowercased once, with a
+    posting list of the choices containing each character."""
+
+    def __init__(self, entries: list[tuple[int, CachedAlias]]) -> None:
+        self.aliases = [alias for _, alias in entries]
+        self.order = [order for order, _ in entries]
+        self.choices = [alias.alias.lower() for alias in self.aliases]
+        self.lengths = np.array([len(c) for c in self.choices], dtype=np.int64)
+
+        # First choice equal to a given string, for exact matches.
+        self.exact: dict[str, int] = {}
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+
+        for i, choice in enumerate(self.choices):
+            self.exact.setdefault(choice, i)
+
+            for char, count in Counter(choice).items():
+                indices, counts = postings.setdefault(char, ([], []))
+                indices.append(i)
+                counts.append(count)
+
+        self.postings = {
+            char: (np.array(indices, dtype=np.intp), np.array(counts, dtype=np.int64))
+            for char, (indices, counts) in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def upper_bounds(self, query: str) -> np.ndarray:
+        """The highest `fuzz.QRatio` each choice could possibly have against
+        `query`.
+
+        QRatio is 200 * LCS / (len(a) + len(b)), and the longest common
+        subsequence can't be longer than the characters the strings have in
+        common, counting duplicates.
+        """
+        shared = np.zeros(len(self), dtype=np.int64)
+
+        for char, count in Counter(query).items():
+            if (posting := self.postings.get(char)) is None:
+                continue
+
+            indices, counts = posting
+            shared[indices] += np.minimum(counts, count)
+
+        return 200 * shared / (self.lengths + len(query))
+
+    def score(self, query: str, indices: np.ndarray, score_cutoff: float) -> np.ndarray:
+        if len(indices) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        return process.cdist(
+            [query],
+            [self.choices[i] for i in indices],
+            scorer=fuzz.QRatio,
+            score_cutoff=score_cutoff,
+            dtype=np.float64,
+        )[0]
+
+
+class SongSearchIndex:
+    def __init__(self, aliases: Iterable[CachedAlias]) -> None:
+        """Fuzzy search over song titles and aliases.
+
+        Matches are scored with `fuzz.QRatio` on lowercased strings and break
+        ties by the order of `aliases`, so results are the same as running
+        `rapidfuzz.process.extract` over every alias visible in a guild.
+        However, choices are split by guild, and choices that can't reach the
+        wanted score are skipped without running the scorer on them.
+
+        Parameters
+        ----------
+        aliases: Iterable[CachedAlias]
+            Song titles and aliases to search. Ones with a `guild_id` of
+            `GLOBAL_GUILD_ID` are visible in every guild.
+        """
+        entries: dict[int, list[tuple[int, CachedAlias]]] = {}
+
+        for order, alias in enumerate(aliases):
+            guild_id = GLOBAL_GUILD_ID if alias.guild_id is None else alias.guild_id
+            entries.setdefault(guild_id, []).append((order, alias))
+
+        self.partitions = {
+            guild_id: _Partition(guild_entries)
+            for guild_id, guild_entries in entries.items()
+        }
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.partitions.values())
+
+    def _partitions_for(
+        self, guild_id: Optional[int], *, all_guilds: bool
+    ) -> list[_Partition]:
+        if all_guilds:
+            return list(self.partitions.values())
+
+        guild_ids = [GLOBAL_GUILD_ID]
+        if guild_id is not None and guild_id != GLOBAL_GUILD_ID:
+            guild_ids.append(guild_id)
+
+        return [self.partitions[g] for g in guild_ids if g in self.partitions]
+
+    def extract(
+        self,
+        query: str,
+        guild_id: Optional[int] = None,
+        *,
+        all_guilds: bool = False,
+        limit: Optional[int] = 5,
+        score_cutoff: float = 0,
+    ) -> list[SearchMatch]:
+        """Finds the titles and aliases most similar to `query`.
+
+        Parameters
+        ----------
+        query: str
+            The query to search for.
+        guild_id: Optional[int]
+            The ID of the guild to also search for aliases in. If None, only
+            global aliases are searched.
+        all_guilds: bool
+            Search aliases from every guild instead.
+        limit: Optional[int]
+            Maximum number of matches to return. None returns every match.
+        score_cutoff: float
+            Only return matches with at least this similarity.
+
+        Returns
+        -------
+        list[SearchMatch]
+            The matches, most similar first.
+        """
+        query = query.lower()
+        matches: list[tuple[float, int, CachedAlias]] = []
+
+        for partition in self._partitions_for(guild_id, all_guilds=all_guilds):
+            candidates = np.flatnonzero(
+                partition.upper_bounds(query) >= score_cutoff - _EPSILON
+            )
+            scores = partition.score(query, candidates, score_cutoff)
+
+            matches.extend(
+                (score, partition.order[i], partition.aliases[i])
+                for i, score in zip(candidates.tolist(), scores.tolist())
+                if score >= score_cutoff
+            )
+
+        matches.sort(key=lambda m: (-m[0], m[1]))
+
+        return [SearchMatch(alias, score) for score, _, alias in matches[:limit]]
+
+    def extract_one(
+        self,
+        query: str,
+        guild_id: Optional[int] = None,
+        *,
+        all_guilds: bool = False,
+    ) -> Optional[SearchMatch]:
+        """Finds the title or alias most similar to `query`, no matter how
+        dissimilar it is. See `extract` for the parameters.
+
+        Returns None only if there is nothing to search.
+        """
+        query = query.lower()
+        partitions = self._partitions_for(guild_id, all_guilds=all_guilds)
+
+        # Only an identical string scores 100.
+        exact = [
+            (p.order[i], p.aliases[i])
+            for p in partitions
+            if (i := p.exact.get(query)) is not None
+        ]
+        if exact and query:
+            return SearchMatch(min(exact, key=lambda m: m[0])[1], 100.0)
+
+        bounds = [p.upper_bounds(query) for p in partitions]
+
+        # Score the most promising choices first. Nothing whose upper bound is
+        # below the best of those can win.
+        best = 0.0
+        for partition, partition_bounds in zip(partitions, bounds):
+            probe = np.argsort(-partition_bounds, kind="stable")[:_PROBE_SIZE]
+            scores = partition.score(query, probe, 0)
+            if len(scores) > 0:
+                best = max(best, float(scores.max()))
+
+        result: Optional[tuple[float, int, CachedAlias]] = None
+
+        for partition, partition_bounds in zip(partitions, bounds):
+            candidates = np.flatnonzero(partition_bounds >= best - _EPSILON)
+            scores = partition.score(query, candidates, 0)
+
+            for i, score in zip(candidates.tolist(), scores.tolist()):
+                match = (score, partition.order[i], partition.aliases[i])
+
+                if result is None or (match[0], -match[1]) > (result[0], -result[1]):
+                    result = match
+
+        if result is None:
+            return None
+
+        return SearchMatch(result[2], result[0])
@@ -1 +1,6 @@
-from .errors import ChuniBotError, MissingDetailedParams
+from .errors import (
+    ChuniBotError,
+    MissingDetailedParams,
+    RenderExpired,
+    RenderQueueFull,
+)
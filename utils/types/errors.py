@@ -14,3 +14,17 @@ class MissingConfiguration(ChuniBotError):
 
     def __init__(self, key: str) -> None:
         super().__init__(f"Configuration file is missing key {key!r}.")
+
+
+class RenderQueueFull(ChuniBotError):
+    """Raised when too many images are already waiting to be rendered."""
+
+    def __init__(self) -> None:
+        super().__init__("Too many images are being generated right now.")
+
+
+class RenderExpired(ChuniBotError):
+    """Raised when a render is abandoned because nobody is waiting for it anymore."""
+
+    def __init__(self) -> None:
+        super().__init__("The render was cancelled because the interaction expired.")
@@ -1,3 +1,4 @@
+import hmac
 import string
 import sys
 from html import escape
@@ -11,9 +12,11 @@ from sqlalchemy import select
 
 from database.models import Cookie
 from utils import json_loads
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 if TYPE_CHECKING:
     from bot import ChuniBot
+    from utils.metrics import MetricsRegistry
 
 
 __all__ = ("init_app",)
@@ -120,6 +123,24 @@ async def invite(request: web.Request) -> web.Response:
     raise web.HTTPFound(url)
 
 
+@router.get("/metrics")
+async def metrics(request: web.Request) -> web.Response:
+    registry: Optional[MetricsRegistry] = request.config_dict["metrics"]
+    if registry is None:
+        raise web.HTTPNotFound
+
+    token: Optional[str] = request.config_dict["metrics_token"]
+    if token is not None and not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        raise web.HTTPUnauthorized(headers={"WWW-Authenticate": "Bearer"})
+
+    return web.Response(
+        body=registry.render().encode(),
+        headers={"Content-Type": METRICS_CONTENT_TYPE},
+    )
+
+
 @router.post("/login")
 async def login(request: web.Request) -> web.Response:
     bot: ChuniBot = request.config_dict["bot"]
@@ -207,6 +228,8 @@ def init_app(
     goatcounter: Optional[str] = None,
     kamaitachi_client_id: Optional[str] = None,
     kamaitachi_client_secret: Optional[str] = None,
+    metrics: Optional["MetricsRegistry"] = None,
+    metrics_token: Optional[str] = None,
 ) -> web.Application:
     app = web.Application()
     app.on_response_prepare.append(on_response_prepare)
@@ -227,5 +250,7 @@ def init_app(
     app["goatcounter"] = goatcounter
     app["kamaitachi_client_id"] = kamaitachi_client_id
     app["kamaitachi_client_secret"] = kamaitachi_client_secret
+    app["metrics"] = metrics
+    app["metrics_token"] = metrics_token
 
     return app